@@ -1,6 +1,12 @@
 
+import copy
+import hashlib
+import subprocess
 from pythonds import Stack
 import pydot
+from dot_writer import DotWriter
+from svg_layout import write_svg
+from compiled_adf import CompiledADF, cyclic_components, strongly_connected_components
 
 class ADF:
     """
@@ -45,6 +51,18 @@ class ADF:
         checks the logical conditions for the acceptance condition, returning a boolean
     checkNonLeaf(node)
         checks if a node has children which need to be evaluated before it is evaluated
+    evaluateDependency(dependency_node_name, current_question, case)
+        evaluates only the nodes a dependency needs and adds it to the case if satisfied
+    compiledADF()
+        returns the compiled acceptance conditions, cached until the structure changes
+    stronglyConnectedComponents()
+        returns the strongly connected components of the nodes
+    nodeTable()
+        returns the kind, reject flag, parents, depth and statement count of every node
+    structureChanged()
+        discards the node table and compiled plan after the nodes change
+    cycles()
+        returns the components whose nodes depend on each other in a cycle
     questionAssignment()
         checks if any node requires a question to be assigned
     visualiseNetwork(case=None)
@@ -78,6 +96,32 @@ class ADF:
         # Initialize question_instantiators attribute
         self.question_instantiators = {}
         
+        #metadata of each node, built by nodeTable when first needed
+        self._nodeTable = None
+        #the compiled acceptance conditions, built by compiledADF when first needed
+        self._compiled = None
+        
+    def sessionView(self):
+        """
+        returns a lightweight copy of the ADF for a single assessment session
+        
+        the copy shares the nodes, question order and questions of this ADF, so a
+        model loaded once can serve many sessions, but it has its own case, facts
+        and evaluation state. The nodes hold no per-session state, e.g. a
+        SubADMBLF stores the results of its items as facts of the ADF questioned
+        """
+        view = copy.copy(self)
+        
+        # facts are per session - copied all the way down so nothing a session stores reaches the model
+        view.facts = copy.deepcopy(getattr(self, 'facts', {}))
+        
+        view.case = list(getattr(self, 'case', []) or [])
+        view.nonLeaf = {}
+        view.statements = []
+        view.reject = False
+        
+        return view
+
     def addNodes(self, name, acceptance = None, statement=None, question=None):
         """
         adds nodes to ADF
@@ -98,6 +142,7 @@ class ADF:
         node = Node(name, acceptance, statement, question)
         
         self.nodes[name] = node
+        self.structureChanged()
         
         self.question = question
         
@@ -164,6 +209,7 @@ class ADF:
         # Create a special node that handles sub-ADM evaluation
         node = SubADMBLF(name, sub_adf_creator, function, dependency_node, rejection_condition)
         self.nodes[name] = node
+        self.structureChanged()
         
         # Add to question order
         if name not in self.questionOrder:
@@ -188,6 +234,7 @@ class ADF:
         # Create a special node that handles result evaluation
         node = EvaluationBLF(name, source_blf, target_node, statements, rejection_condition)
         self.nodes[name] = node
+        self.structureChanged()
         
         # Add to question order
         if name not in self.questionOrder:
@@ -202,6 +249,8 @@ class ADF:
         #sets it back to an empty dictionary
         self.nonLeaf = {}
         
+        table = self.nodeTable()
+        
         #checks each node and determines if it is a non-leaf node (one with children)
         for name,node in zip(self.nodes,self.nodes.values()):
             
@@ -209,7 +258,7 @@ class ADF:
             if node.children != None and node.children != []:
                 self.nonLeaf[name] = node
             # Also include EvaluationBLF nodes even if they don't have children
-            elif hasattr(node, 'evaluateResults'):
+            elif table[name]['kind'] == 'evaluation':
                 self.nonLeaf[name] = node
             else:
                 pass
@@ -228,23 +277,24 @@ class ADF:
         self.statements = []
         #list of non-leaf nodes which have been evaluated
         self.nodeDone = []
+        #index of the statement given for each evaluated node
+        self.statementIndex = {}
         self.case = case
-        
-        # Initialize vis list for tracking attacking nodes
-        self.vis = []
 
         
         #generates the non-leaf nodes
         self.nonLeafGen()
+        table = self.nodeTable()
         #while there are nonLeaf nodes which have not been evaluated, evaluate a node in this list in ascending order  
         while self.nonLeaf != {}:
+            remaining = len(self.nonLeaf)
 
             # Create a copy to avoid "dictionary changed size during iteration" error
             for name,node in zip(list(self.nonLeaf.keys()), list(self.nonLeaf.values())):
                 #checks if the node's children are non-leaf nodes
                 if name == 'Decide' and len(self.nonLeaf) != 1:
                     pass     
-                elif hasattr(node, 'evaluateResults'):
+                elif table[name]['kind'] == 'evaluation':
                     # Special handling for EvaluationBLF nodes - handle them first
                     #adds to list of evaluated nodes
                     self.nodeDone.append(name) 
@@ -257,12 +307,15 @@ class ADF:
                             self.case.append(name)
                         if hasattr(node, 'statement') and node.statement and len(node.statement) > 0:
                             self.statements.append(node.statement[0])
+                            self.statementIndex[name] = 0
                     else:
                         # EvaluationBLF was rejected
                         if hasattr(node, 'statement') and node.statement and len(node.statement) > 1:
                             self.statements.append(node.statement[1])
+                            self.statementIndex[name] = 1
                         elif hasattr(node, 'statement') and node.statement and len(node.statement) > 0:
                             self.statements.append(node.statement[0])
+                            self.statementIndex[name] = 0
                     
                     # Remove from nonLeaf and continue
                     self.nonLeaf.pop(name)
@@ -298,6 +351,7 @@ class ADF:
                         #deletes node from nonLeaf nodes
                         self.nonLeaf.pop(name)
                         self.statements.append(node.statement[self.counter])
+                        self.statementIndex[name] = self.counter
                         self.reject = False
                         break
 
@@ -309,10 +363,17 @@ class ADF:
          
                         if self.reject: 
                             self.statements.append(node.statement[self.counter])
+                            self.statementIndex[name] = self.counter
                         else:
                             self.statements.append(node.statement[-1])
+                            self.statementIndex[name] = len(node.statement) - 1
                         self.reject = False
                         break
+            
+            #no node could be evaluated, so the rest wait on each other
+            if len(self.nonLeaf) == remaining:
+                raise ValueError(f"{', '.join(self.nonLeaf)} cannot be evaluated as they depend on the cycles "
+                                 f"{self.cycles()}; use GroundedADF to evaluate this ADF")
                 
         # Clean up any duplicates that might have slipped through
         if hasattr(self, 'case') and self.case:
@@ -342,13 +403,6 @@ class ADF:
         
         """
         
-        #for visualisation purposes - this tracks the attacking nodes
-        if not hasattr(self, 'vis'):
-            self.vis = []
-        
-        # Store the current vis list before evaluation
-        current_vis = getattr(self, 'vis', []).copy()
-        
         #counter to index the statements to be shown to the user
         self.counter = -1
         
@@ -360,23 +414,17 @@ class ADF:
             
             # If this is a reject condition and it's true, return False immediately
             if self.reject and x == True:
-                # Merge current vis with the stored vis
-                self.vis = list(set(current_vis + self.vis))
                 self.reject = True
                 return False
             
             # If this is an accept condition and it's true, return True immediately
             if not self.reject and x == True:
-                # Merge current vis with the stored vis
-                self.vis = list(set(current_vis + self.vis))
                 return True
 
             if x == 'accept':
                 return True
                 
         # If we get here, no conditions were satisfied
-        # Merge current vis with the stored vis
-        self.vis = list(set(current_vis + self.vis))
         return False
     
     def postfixEvaluation(self,acceptance):
@@ -402,8 +450,6 @@ class ADF:
             elif token == 'reject':
                 # Pop the operand (which should be a node name)
                 operand = operandStack.pop()
-                # Always add the operand to vis as it's a rejection condition
-                self.vis.append(operand)
                 # Check if the node name is in the case
                 if operand in self.case:
                     # Node is in case, so we should reject the parent node
@@ -417,7 +463,6 @@ class ADF:
                 operand1 = operandStack.pop()
                 result = self.checkCondition(token,operand1)
                 operandStack.push(result)
-                self.vis.append(operand1)
                 
             elif token == 'and' or token == 'or':
                 operand2 = operandStack.pop()
@@ -616,11 +661,103 @@ class ADF:
         # Create a special node that tracks dependencies
         node = DependentBLF(name, dependency_node, question_template, statements, factual_ascription)
         self.nodes[name] = node
+        self.structureChanged()
         
         # Add to question order
         if name not in self.questionOrder:
             self.questionOrder.append(name)
 
+    def evaluateDependency(self, dependency_node_name, current_question, case):
+        """
+        evaluates a dependency node against the case being built during questioning
+        and adds it to the case if it is satisfied
+        
+        only the nodes the dependency needs are evaluated, in the compiled plan
+        evaluateTree follows, so a dependency is satisfied exactly when the node
+        would be accepted by the final evaluation of the same case
+        
+        Parameters
+        ----------
+        dependency_node_name : str or list
+            the name(s) of the node(s) to evaluate
+        current_question : str
+            the question waiting on the dependency, used for reporting
+        case : list
+            the case being built, which satisfied nodes are appended to
+            
+        Returns:
+            bool: True if the dependency is satisfied, False otherwise
+        """
+        
+        # Handle multiple dependencies if passed as a list
+        if isinstance(dependency_node_name, list):
+            all_satisfied = True
+            for dep_node in dependency_node_name:
+                if not self.evaluateDependency(dep_node, current_question, case):
+                    all_satisfied = False
+            return all_satisfied
+        
+        print(f" Trying to evaluate dependency {dependency_node_name} for {current_question}")
+        
+        compiled = self.compiledADF()
+        if dependency_node_name not in compiled.conditions:
+            # Dependency node has no acceptance conditions, can't be evaluated
+            print(f"⚠️  Dependency {dependency_node_name} has no acceptance conditions for {current_question}")
+            return False
+        
+        try:
+            #only the nodes the dependency reads are evaluated, with the plan evaluateTree follows
+            values = compiled.evaluateTarget(dependency_node_name, case, adf=self)
+        except Exception as e:
+            print(f"⚠️  Error evaluating dependency {dependency_node_name} for {current_question}: {e}")
+            return False
+        
+        # Nodes accepted on the way are added to the case as evaluateTree would add them
+        for name, (accepted, _) in values.items():
+            if name == dependency_node_name or not accepted:
+                continue
+            if name not in case:
+                case.append(name)
+                print(f"✅ Added {name} to case")
+            print(f"✅ Dependency {name} now satisfied for child of {dependency_node_name}")
+        
+        if values[dependency_node_name][0]:
+            # Dependency node can be satisfied, add it to case
+            if dependency_node_name not in case:
+                case.append(dependency_node_name)
+                print(f"✅ Added {dependency_node_name} to case")
+            
+            print(f"✅ Dependency {dependency_node_name} now satisfied for {current_question}")
+            return True
+        
+        # Dependency node cannot be satisfied
+        print(f"⚠️  Dependency {dependency_node_name} cannot be satisfied for {current_question}")
+        return False
+
+    def stronglyConnectedComponents(self):
+        """
+        returns the strongly connected components of the nodes, each component
+        after every component it reads
+        """
+        return strongly_connected_components({name: node.children or [] for name, node in self.nodes.items()})
+    
+    def cycles(self):
+        """
+        returns the strongly connected components whose nodes depend on each other in a cycle
+        """
+        return cyclic_components({name: node.children or [] for name, node in self.nodes.items()})
+
+    def compiledADF(self):
+        """
+        returns the acceptance conditions of the ADF compiled, compiling them
+        again only after structureChanged has been called
+        """
+        compiled = getattr(self, '_compiled', None)
+        if compiled is None:
+            compiled = CompiledADF(self)
+            self._compiled = compiled
+        return compiled
+
     def visualiseNetwork(self,case=None):    
         """
         allows the ADF to be visualised as a graph
@@ -641,139 +778,570 @@ class ADF:
         
         # Set graph direction to top-to-bottom for better hierarchical layout
         G.set_rankdir('TB')
-
-        if case != None:
-            # Temporarily set the case for evaluation
-            original_case = getattr(self, 'case', None)
-            self.case = case
-            
-            # First, evaluate all nodes to build up self.vis (attacking nodes list)
-            self.evaluateTree(case)
-            
-            #checks each node
-            for i in self.nodes.values():
-                
-                #checks if node is already in the graph
-                if i not in G.get_node_list():
-                    
-                    #checks if the node was accepted in the case
-                    if i.name in case:
-                        a = pydot.Node(i.name,label=i.name,color='green')
-                    else:
-                        a = pydot.Node(i.name,label=i.name,color='red')
-                                        
-                    G.add_node(a)
-                
-                #creates edges between a node and its children
-                if i.children != None and i.children != []:
-
-                    for j in i.children:
-                        
-                                                
-                        if j not in G.get_node_list():
-                            
-                            if j in case:
-                                a = pydot.Node(j,label=j,color='green')
-                            else:
-                                a = pydot.Node(j,label=j,color='red')
-                            
-                            G.add_node(a)
-                        
-                        #self.vis is a list which tracks whether a node is an attacking or defending node
-                        if j in self.vis:
-                            if j in case:
-                                my_edge = pydot.Edge(i.name, j, color='green',label='-')
-                            else:
-                                my_edge = pydot.Edge(i.name, j, color='red',label='-')
-                        else:
-                            if j in case:
-                                my_edge = pydot.Edge(i.name, j, color='green',label='+')
-                            else:
-                                my_edge = pydot.Edge(i.name, j, color='red',label='+')
-
-                        G.add_edge(my_edge)
-            
-            # Restore original case if it existed
-            if original_case is not None:
-                self.case = original_case
+        
+        for kind, key, attrs in self._graphElements(case):
+            if kind == 'node':
+                G.add_node(pydot.Node(key, **attrs))
             else:
-                delattr(self, 'case')
-            
-            # Add dependency relationships for DependentBLF and SubADMBLF nodes
-            for node_name, node in self.nodes.items():
-                if hasattr(node, 'dependency_node') and node.dependency_node:
-                    # Handle both single string and list of dependencies
-                    if isinstance(node.dependency_node, str):
-                        dependency_nodes = [node.dependency_node]
-                    else:
-                        dependency_nodes = node.dependency_node
-                    
-                    # Create a dotted black line from dependent node to each dependency node
-                    for dep_node in dependency_nodes:
-                        dependency_edge = pydot.Edge(node_name, dep_node, 
-                                               color='black', style='dotted')
-                        G.add_edge(dependency_edge)
-            
+                G.add_edge(pydot.Edge(*key, **attrs))
+        
+        # Assign ranks to ensure proper hierarchical layout
+        self._assign_node_ranks(G)
+        
+        # Legend removed - was causing too many issues
+        
+        return G
+    
+    def visualiseNetworkCollapsed(self, case=None, depth=2, max_nodes=None, root=None, expand=()):
+        """
+        visualises a large ADF with abstract-factor subtrees collapsed into summary nodes
+        
+        nodes are shown breadth first from the roots until the depth or node budget
+        is reached; any node whose children are not all shown is drawn as a summary
+        node giving the number of nodes hidden beneath it
+        
+        Parameters
+        ----------
+        case : list, optional
+            the list of factors constituting the case
+        depth : int, optional
+            how many levels below the roots to show, by default 2 (None for no limit)
+        max_nodes : int, optional
+            the most nodes to show
+        root : str, optional
+            draw only the subtree below this node, e.g. to expand a summary node
+        expand : iterable, optional
+            shown nodes whose children are always shown, whatever the depth or budget
             
-            # Assign ranks to ensure proper hierarchical layout
-            self._assign_node_ranks(G)
+        Returns:
+            pydot.Dot: the collapsed graph
+        """
+        view = self.collapsedView(depth, max_nodes, root, expand)
+        
+        G = pydot.Dot('{}'.format(root or self.name), graph_type='graph')
+        G.set_rankdir('TB')
+        
+        for kind, key, attrs in self._graphElements(case, view):
+            if kind == 'node':
+                G.add_node(pydot.Node(key, **attrs))
+            else:
+                G.add_edge(pydot.Edge(*key, **attrs))
+        
+        return G
+    
+    def writeCollapsedDot(self, out, case=None, depth=2, max_nodes=None, root=None, expand=()):
+        """
+        streams the collapsed graph of visualiseNetworkCollapsed as DOT to a file or pipe
+        
+        Parameters are as for visualiseNetworkCollapsed, with out a filename or
+        anything with a write() method
+        """
+        if isinstance(out, str):
+            with open(out, 'w', encoding='utf-8') as f:
+                return self.writeCollapsedDot(f, case, depth, max_nodes, root, expand)
+        
+        view = self.collapsedView(depth, max_nodes, root, expand)
+        with DotWriter(out, root or self.name, rankdir='TB') as writer:
+            self._writeElements(writer, case, view)
+    
+    def collapsedView(self, depth=None, max_nodes=None, root=None, expand=()):
+        """
+        works out which nodes a collapsed graph shows and which are summary nodes
+        
+        Parameters are as for visualiseNetworkCollapsed
+        
+        Returns
+        -------
+        set: the names of the nodes shown
+        dict: summary node name -> number of distinct nodes hidden beneath it
+        """
+        expand = set(expand)
         
+        if root is not None:
+            if root not in self.nodes:
+                raise KeyError(f"Unknown node: {root}")
+            roots = [root]
         else:
-            
-            #creates self.vis if not already created
-            self.evaluateTree([])
-            
-            #checks each node
-            for i in self.nodes.values():
-                
-                #checks if node is already in the graph
-                if i not in G.get_node_list():
-                    
-                    a = pydot.Node(i.name,label=i.name,color='black')
-
-                    G.add_node(a)
+            all_children = {child for _, child in self._childEdges()}
+            roots = [name for name in self.nodes if name not in all_children]
+        
+        #breadth first, so the budget is spent on the levels nearest the roots
+        shown = dict.fromkeys(roots)
+        frontier = list(roots)
+        level = 0
+        while frontier:
+            next_frontier = []
+            for name in frontier:
+                node = self.nodes.get(name)
+                children = list(node.children or []) if node is not None else []
+                new_children = [child for child in children if child not in shown]
+                if not new_children:
+                    continue
                 
-                #creates edges between a node and its children
-                if i.children != None and i.children != []:
-
-                    for j in i.children:
-                        
-                        if j not in G.get_node_list():
-                            
-                            a = pydot.Node(j,label=j,color='black')
-                           
-                            G.add_node(a)
-                        
-                        #self.vis is a list which tracks whether a node is an attacking or defending node
-                        if j in self.vis:
-                            my_edge = pydot.Edge(i.name, j, color='black',label='-')
-                        else:
-                            my_edge = pydot.Edge(i.name, j, color='black',label='+')
-
-                        G.add_edge(my_edge)
-            
-            # Add dependency relationships for DependentBLF and SubADMBLF nodes (without case)
-            for node_name, node in self.nodes.items():
-                if hasattr(node, 'dependency_node') and node.dependency_node:
-                    # Handle both single string and list of dependencies
-                    if isinstance(node.dependency_node, str):
-                        dependency_nodes = [node.dependency_node]
-                    else:
-                        dependency_nodes = node.dependency_node
-                    
-                    # Create a dotted black line from dependent node to each dependency node
-                    for dep_node in dependency_nodes:
-                        dependency_edge = pydot.Edge(node_name, dep_node, 
-                                               color='black', style='dotted')
-                        G.add_edge(dependency_edge)
+                within_depth = depth is None or level < depth
+                within_budget = max_nodes is None or len(shown) + len(new_children) <= max_nodes
+                if (within_depth and within_budget) or name in expand:
+                    for child in new_children:
+                        shown[child] = None
+                        next_frontier.append(child)
+            frontier = next_frontier
+            level += 1
+        
+        summaries = {}
+        for name in shown:
+            node = self.nodes.get(name)
+            if node is None or not node.children:
+                continue
+            if any(child not in shown for child in node.children):
+                summaries[name] = len(self._descendants(name) - shown.keys())
+        
+        return set(shown), summaries
+    
+    def _descendants(self, name):
+        """
+        returns every node reachable through the children of a node
+        """
+        seen = set()
+        stack = [name]
+        while stack:
+            node = self.nodes.get(stack.pop())
+            for child in (node.children or []) if node is not None else []:
+                if child not in seen:
+                    seen.add(child)
+                    stack.append(child)
+        return seen
+    
+    def writeDot(self, out, case=None, sub_adms=False):
+        """
+        streams the graph of the ADF as DOT to a file or pipe without building pydot objects
+        
+        the output matches visualiseNetwork, or visualiseNetworkWithSubADMs if
+        sub_adms is True, with the same colouring, edge polarity and dotted
+        dependency edges
+        
+        Parameters
+        ----------
+        out : str or file-like
+            a filename or anything with a write() method
+        case : list, optional
+            the list of factors constituting the case
+        sub_adms : bool, default False
+            whether to include the sub-ADMs as clusters
+        """
+        if isinstance(out, str):
+            with open(out, 'w', encoding='utf-8') as f:
+                return self.writeDot(f, case, sub_adms)
+        
+        if not sub_adms:
+            with DotWriter(out, self.name, rankdir='TB') as writer:
+                self._writeElements(writer, case)
+                abstract, blfs = self._rankGroups()
+                writer.rank(abstract)
+                writer.rank(blfs)
+            return
+        
+        sub_models, node_to_sub_model = self._subADMGroups()
+        
+        with DotWriter(out, f'{self.name}_with_subADMs', rankdir='TB') as writer:
+            # as in visualiseNetworkWithSubADMs the main graph's rank constraints are not carried over
+            with writer.cluster('cluster_main', label=f'Main ADM: {self.name}'):
+                self._writeElements(writer, case)
+                for sub_model_num in sub_models:
+                    writer.node(f"sub_model_label_{sub_model_num}", label=f"SUB-MODEL {sub_model_num}",
+                                shape="box", style="filled", fillcolor="lightgreen", width="1.5", height="0.5")
             
+            for sub_model_num, (node_name, creator) in sub_models.items():
+                try:
+                    sub_adf = creator("visualization_item")
+                    with writer.cluster(f'cluster_sub_{sub_model_num}', label=f'Sub-Model {sub_model_num}'):
+                        sub_adf._writeElements(writer)
+                except Exception as e:
+                    print(f"ERROR: Could not create sub-ADM for {node_name}: {e}")
             
-            # Assign ranks to ensure proper hierarchical layout
-            self._assign_node_ranks(G)
+            for node_name, sub_model_num in node_to_sub_model.items():
+                writer.edge(node_name, f"sub_model_label_{sub_model_num}", style='dashed', color='red', penwidth='0.5')
+    
+    def writeSVG(self, out, case=None):
+        """
+        lays out the graph of the ADF in Python and writes it as SVG, without Graphviz
         
-        # Legend removed - was causing too many issues
+        uses the same colouring, edge polarity and dotted dependency edges as visualiseNetwork
         
-        return G
+        Parameters
+        ----------
+        out : str or file-like
+            a filename or anything with a write() method
+        case : list, optional
+            the list of factors constituting the case
+        """
+        if isinstance(out, str):
+            with open(out, 'w', encoding='utf-8') as f:
+                return self.writeSVG(f, case)
+        
+        write_svg(self._graphElements(case), out, title=self.name)
+    
+    def exportGraph(self, case=None):
+        """
+        returns the graph of the ADF and its evaluation as a compact, JSON serialisable dict
+        
+        meant to be drawn client-side, e.g. shipped to a browser, rather than rendered on the server
+        
+        Parameters
+        ----------
+        case : list, optional
+            the list of factors constituting the case, evaluated on the compiled plan so
+            neither it nor the ADF's own case and statements are changed
+        
+        Returns
+        -------
+        dict: 'name'; 'nodes', each with its 'id', 'kind', 'accepted' (None without a case)
+        and the index of its 'statement' (None if not evaluated); 'edges', each with its
+        'source', 'target' and either its 'polarity' or 'dependency'; and 'clusters', the
+        evaluated sub-ADMs of each SubADMBLF keyed by item
+        """
+        if case is None:
+            return self._exportElements(None, {})
+        
+        accepted, statement_index = self._caseValues(case)
+        graph = self._exportElements(accepted, statement_index)
+        graph['clusters'] = self._exportClusters()
+        return graph
+    
+    def _caseValues(self, case):
+        """
+        evaluates a case on the compiled plan, leaving the ADF's case, statements and statementIndex alone
+        
+        Returns
+        -------
+        set: the factors of the case and the nodes accepted
+        dict: node name -> the index of the statement it gives
+        """
+        compiled = self.compiledADF()
+        #the plan may be shared with other views of the model, so the EvaluationBLFs read this ADF's facts
+        results = {name: compiled._evaluationResult(name, None, self) for name in compiled.evaluation_nodes}
+        values = compiled.evaluate(case, results)
+        accepted = set(case) | {name for name, (value, _) in values.items() if value}
+        statement_index = {name: index for name, (_, index) in values.items() if compiled.statement_counts[name]}
+        return accepted, statement_index
+    
+    def nodeTable(self):
+        """
+        returns the metadata of every node, worked out once and kept until structureChanged is called
+        
+        the kind of each node is read from here rather than by checking which
+        methods the node has, and whether it has a reject condition rather than
+        by scanning its acceptance conditions each time it is asked
+        
+        Returns
+        -------
+        dict: node name -> {'kind', 'has_reject', 'parents', 'depth', 'statements'}, where
+        kind is 'sub_adm', 'evaluation' or 'dependent' for the special BLFs, 'abstract'
+        for a node with children and otherwise 'blf'; parents are the nodes whose
+        conditions read it; depth is the number of edges on the longest path down
+        from it; and statements is its number of statements
+        """
+        table = getattr(self, '_nodeTable', None)
+        if table is None:
+            table = self._buildNodeTable()
+            self._nodeTable = table
+        return table
+    
+    def structureChanged(self):
+        """
+        discards the node table and compiled plan so they are worked out again when next needed
+        
+        called by addNodes and the add*BLF methods, and to be called after changing
+        self.nodes, or a node's children or acceptance conditions, directly
+        """
+        self._nodeTable = None
+        self._compiled = None
+    
+    def _buildNodeTable(self):
+        table = {}
+        for name, node in self.nodes.items():
+            if hasattr(node, 'sub_adf_creator'):
+                kind = 'sub_adm'
+            elif hasattr(node, 'evaluateResults'):
+                kind = 'evaluation'
+            elif hasattr(node, 'checkDependency'):
+                kind = 'dependent'
+            elif node.children:
+                kind = 'abstract'
+            else:
+                kind = 'blf'
+            table[name] = {
+                'kind': kind,
+                'has_reject': any('reject' in condition for condition in (getattr(node, 'acceptance', None) or [])),
+                'parents': [],
+                'depth': 0,
+                'statements': len(getattr(node, 'statement', None) or [])
+            }
+        for name, node in self.nodes.items():
+            for child in node.children or []:
+                if child in table:
+                    table[child]['parents'].append(name)
+        
+        #components come after every component they read, so the depths below are known; a cycle shares one depth
+        for component in self.stronglyConnectedComponents():
+            members = set(component)
+            depth = max((table[child]['depth'] + 1 for member in component
+                         for child in (self.nodes[member].children or [])
+                         if child in table and child not in members), default=0)
+            for member in component:
+                table[member]['depth'] = depth
+            #a cycle is allowed but evaluateTree cannot evaluate it, so it is reported once the structure is read
+            if len(component) > 1 or component[0] in (self.nodes[component[0]].children or []):
+                print(f"⚠️  {' -> '.join(component)} depend on each other in a cycle; use GroundedADF to evaluate this ADF")
+        return table
+    
+    def nodeKind(self, name, roles=None):
+        """
+        returns the kind of a node: 'sub_adm', 'evaluation' or 'dependent' for the
+        special BLFs, otherwise its role from _nodeRoles ('root', 'abstract' or 'blf')
+        
+        Parameters
+        ----------
+        name : str
+            the name of the node
+        roles : dict, optional
+            the result of _nodeRoles, so it is only worked out once for a whole graph
+        """
+        info = self.nodeTable().get(name)
+        if info is not None and info['kind'] in ('sub_adm', 'evaluation', 'dependent'):
+            return info['kind']
+        if roles is None:
+            roles = self._nodeRoles()
+        return roles.get(name, 'blf')
+    
+    def _exportElements(self, accepted, statement_index=None):
+        roles = self._nodeRoles()
+        if statement_index is None:
+            statement_index = getattr(self, 'statementIndex', {})
+        
+        nodes = []
+        for name in self._graphNodeNames():
+            nodes.append({
+                'id': name,
+                'kind': self.nodeKind(name, roles),
+                'accepted': None if accepted is None else name in accepted,
+                'statement': statement_index.get(name)
+            })
+        
+        edges = [{'source': parent, 'target': child, 'polarity': polarity}
+                 for parent, child, polarity in self.edgeTable()]
+        edges += [{'source': node_name, 'target': dep_node, 'dependency': True}
+                  for node_name, dep_node in self._dependencyEdges()]
+        
+        return {'name': self.name, 'nodes': nodes, 'edges': edges, 'clusters': {}}
+    
+    def _exportClusters(self):
+        """
+        returns SubADMBLF name -> item -> the exported graph of that item's sub-ADM
+        """
+        clusters = {}
+        facts = getattr(self, 'facts', {}) or {}
+        node_table = self.nodeTable()
+        for node_name, node in self.nodes.items():
+            if node_table[node_name]['kind'] != 'sub_adm':
+                continue
+            blf_facts = facts.get(node_name) or {}
+            items = blf_facts.get('items') or []
+            instances = blf_facts.get('sub_adf_instances') or []
+            results = blf_facts.get('results') or []
+            clusters[node_name] = {}
+            for i, (item, sub_adf) in enumerate(zip(items, instances)):
+                if sub_adf is None:
+                    #an item restored from a checkpoint keeps only its case, so it is exported
+                    #on a fresh sub-ADM without the statements it gave
+                    sub_adf = node.sub_adf_creator(item)
+                    case = results[i] if i < len(results) else []
+                    sub_graph = sub_adf._exportElements(set(case or []))
+                    order = sub_adf.compiledADF().order
+                    sub_graph['root'] = order[-1] if order else None
+                else:
+                    sub_graph = sub_adf._exportElements(set(getattr(sub_adf, 'case', None) or []))
+                    sub_graph['root'] = node.rootNode(sub_adf)
+                clusters[node_name][str(item)] = sub_graph
+        return clusters
+    
+    def renderGraph(self, filename, format=None, case=None, sub_adms=False, program='dot'):
+        """
+        renders the graph of the ADF by streaming DOT straight into Graphviz
+        
+        Parameters
+        ----------
+        filename : str
+            the image to write
+        format : str, optional
+            the output format, by default taken from the file extension
+        case : list, optional
+            the list of factors constituting the case
+        sub_adms : bool, default False
+            whether to include the sub-ADMs as clusters
+        program : str, default 'dot'
+            the Graphviz layout program
+        """
+        if format is None:
+            format = filename.rsplit('.', 1)[-1] if '.' in filename else 'png'
+        
+        process = subprocess.Popen([program, f'-T{format}', '-o', filename],
+                                   stdin=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        try:
+            self.writeDot(process.stdin, case, sub_adms)
+        finally:
+            process.stdin.close()
+            error = process.stderr.read()
+            process.stderr.close()
+            returncode = process.wait()
+        
+        if returncode != 0:
+            raise RuntimeError(f"{program} failed rendering {filename}: {error.strip()}")
+    
+    def _writeElements(self, writer, case=None, view=None):
+        for kind, key, attrs in self._graphElements(case, view):
+            if kind == 'node':
+                writer.node(key, **attrs)
+            else:
+                writer.edge(*key, **attrs)
+    
+    def _graphElements(self, case=None, view=None):
+        """
+        evaluates the ADF and yields the nodes and edges of its graph
+        
+        yields ('node', name, attributes) and ('edge', (source, target), attributes)
+        
+        Parameters
+        ----------
+        case : list, optional
+            the list of factors constituting the case
+        view : tuple, optional
+            the (shown, summaries) of collapsedView, to draw only part of the graph
+        """
+        if case != None:
+            # Evaluate the case on the compiled plan so accepted abstract factors are coloured too,
+            # without changing the ADF's own case and statements
+            accepted, _ = self._caseValues(case)
+        else:
+            accepted = None
+        
+        def colour(name):
+            if accepted is None:
+                return 'black'
+            return 'green' if name in accepted else 'red'
+        
+        if view is None:
+            shown, summaries = None, {}
+        else:
+            shown, summaries = view
+        
+        def visible(name):
+            return shown is None or name in shown
+        
+        #adds each node once, keyed by name
+        for name in self._graphNodeNames():
+            if not visible(name):
+                continue
+            if name in summaries:
+                # A collapsed subtree is drawn as a single summary node
+                yield 'node', name, {'label': f"{name}\\n(+{summaries[name]} nodes)", 'color': colour(name),
+                                     'shape': 'folder', 'style': 'dashed'}
+            else:
+                yield 'node', name, {'label': name, 'color': colour(name)}
+        
+        #creates edges between a node and its children, labelled with whether the child supports or attacks
+        for parent, child, polarity in self.edgeTable():
+            if visible(parent) and visible(child):
+                yield 'edge', (parent, child), {'color': colour(child), 'label': polarity}
+        
+        # Create a dotted black line from each DependentBLF and SubADMBLF node to its dependency nodes
+        for node_name, dep_node in self._dependencyEdges():
+            if visible(node_name) and visible(dep_node):
+                yield 'edge', (node_name, dep_node), {'color': 'black', 'style': 'dotted'}
+    
+    def structuralHash(self):
+        """
+        returns a hash of the structure of the ADF, which changes whenever a node,
+        child, acceptance condition or dependency changes
+        
+        used to key anything derived from the model alone, e.g. cached layouts
+        """
+        digest = hashlib.sha256()
+        for node_name, node in self.nodes.items():
+            digest.update(repr((
+                type(node).__name__,
+                node_name,
+                list(node.children or []),
+                list(getattr(node, 'acceptance', None) or []),
+                getattr(node, 'dependency_node', None),
+                getattr(node, 'source_blf', None),
+            )).encode('utf-8'))
+        return digest.hexdigest()
+    
+    def _graphNodeNames(self):
+        """
+        returns the name of every node in the graph once, in the order they are first met
+        
+        children which are not nodes of the ADF are included after their parent
+        """
+        #name keyed registry so a node is never added twice
+        registry = dict.fromkeys(self.nodes)
+        for node in self.nodes.values():
+            for child in node.children or []:
+                if child not in registry:
+                    registry[child] = None
+        return list(registry)
+    
+    def edgeTable(self):
+        """
+        returns every (parent, child, polarity) edge of the ADF
+        
+        the polarity is '+' if the child supports the parent and '-' if it attacks it,
+        as worked out from the acceptance conditions when the node was added
+        """
+        return [(node.name, child, node.polarity.get(child, '+'))
+                for node in self.nodes.values() for child in (node.children or [])]
+    
+    def _childEdges(self):
+        """
+        returns the (parent, child) edges of the ADF
+        """
+        return [(node.name, child) for node in self.nodes.values() for child in (node.children or [])]
+    
+    def _dependencyEdges(self):
+        """
+        returns the (node, dependency) edges of DependentBLF and SubADMBLF nodes
+        """
+        edges = []
+        for node_name, node in self.nodes.items():
+            dependency_nodes = getattr(node, 'dependency_node', None)
+            if not dependency_nodes:
+                continue
+            # Handle both single string and list of dependencies
+            if isinstance(dependency_nodes, str):
+                dependency_nodes = [dependency_nodes]
+            for dep_node in dependency_nodes:
+                edges.append((node_name, dep_node))
+        return edges
+    
+    def _nodeRoles(self):
+        """
+        returns the role of each node used to colour minimal graphs: 'root',
+        'abstract' or 'blf'
+        
+        a root has no parents and no nodes depending on it, an abstract factor has children
+        """
+        all_children = {child for _, child in self._childEdges()}
+        dependencies = {dep_node for _, dep_node in self._dependencyEdges()}
+        
+        roles = {}
+        for node_name, node in self.nodes.items():
+            if node_name not in all_children and node_name not in dependencies:
+                roles[node_name] = 'root'
+            elif node.children:
+                roles[node_name] = 'abstract'
+            else:
+                roles[node_name] = 'blf'
+        return roles
  
     def visualiseNetworkWithSubADMs(self, case=None):
         """
@@ -815,8 +1383,9 @@ class ADF:
         node_to_sub_model = {}
         
         # First pass: identify all sub-ADM creators and create sub-models
+        node_table = self.nodeTable()
         for node_name, node in self.nodes.items():
-            if hasattr(node, 'sub_adf_creator'):
+            if node_table[node_name]['kind'] == 'sub_adm':
                 # Check if this sub-ADM creator is already mapped
                 sub_adm_key = str(node.sub_adf_creator)
                 if sub_adm_key not in sub_adm_mapping:
@@ -870,11 +1439,11 @@ class ADF:
                         traceback.print_exc()
         
         # Second pass: identify EvaluationBLF nodes that should link to the same sub-models
-            for node_name, node in self.nodes.items():
-                if hasattr(node, 'source_blf') and node.source_blf in node_to_sub_model:
-                    # This is an EvaluationBLF that should link to the same sub-model as its source
-                    source_sub_model = node_to_sub_model[node.source_blf]
-                    node_to_sub_model[node_name] = source_sub_model
+        for node_name, node in self.nodes.items():
+            if hasattr(node, 'source_blf') and node.source_blf in node_to_sub_model:
+                # This is an EvaluationBLF that should link to the same sub-model as its source
+                source_sub_model = node_to_sub_model[node.source_blf]
+                node_to_sub_model[node_name] = source_sub_model
         
         # Third pass: create all connection edges
         for node_name, sub_model_num in node_to_sub_model.items():
@@ -924,6 +1493,9 @@ class ADF:
         main_subgraph = pydot.Subgraph('cluster_main')
         main_subgraph.set_label(f'Main ADM: {self.name}')
         
+        # Roles are worked out once for the whole graph rather than per node
+        roles = self._nodeRoles()
+        
         # Copy all nodes and edges from main graph to main subgraph
         for node in main_graph.get_node_list():
             # Remove labels and make nodes small and opaque
@@ -933,63 +1505,7 @@ class ADF:
             node.set_fontsize('0')
             
             # Color code by node type and hierarchy
-            node_name = node.get_name()
-            if node_name in self.nodes:
-                node_obj = self.nodes[node_name]
-                
-                # Find root node (node with no parents and no dependencies)
-                all_children = set()
-                for n in self.nodes.values():
-                    if hasattr(n, 'children') and n.children:
-                        for child in n.children:
-                            all_children.add(child)
-                
-                # Check if this node has any dependencies (DependentBLF nodes that depend on it)
-                has_dependencies = False
-                for other_node in self.nodes.values():
-                    if hasattr(other_node, 'dependency_node') and other_node.dependency_node:
-                        if isinstance(other_node.dependency_node, str):
-                            if other_node.dependency_node == node_name:
-                                has_dependencies = True
-                                break
-                        elif isinstance(other_node.dependency_node, list):
-                            if node_name in other_node.dependency_node:
-                                has_dependencies = True
-                                break
-                
-                is_root = node_name not in all_children and not has_dependencies
-                
-                # Check if this is an immediate child of root (not a BLF)
-                is_immediate_child_of_root = False
-                if not is_root:
-                    for n in self.nodes.values():
-                        if hasattr(n, 'children') and n.children and node_name in n.children:
-                            # Check if parent is root
-                            parent_name = n.name
-                            if parent_name not in all_children:  # Parent is root
-                                is_immediate_child_of_root = True
-                                break
-                
-                if is_root:
-                    # Root node - red
-                    node.set_color('red')
-                    node.set_fillcolor('red')
-                elif is_immediate_child_of_root and hasattr(node_obj, 'children') and node_obj.children:
-                    # Immediate child of root that is NOT a BLF (abstract factor) - blue
-                    node.set_color('blue')
-                    node.set_fillcolor('blue')
-                elif hasattr(node_obj, 'children') and node_obj.children:
-                    # Other abstract factors - blue
-                    node.set_color('blue')
-                    node.set_fillcolor('blue')
-                else:
-                    # Base-level factors - green
-                    node.set_color('green')
-                    node.set_fillcolor('green')
-            else:
-                # Default - gray
-                node.set_color('gray')
-                node.set_fillcolor('gray')
+            self._colourMinimalNode(node, roles)
             
             main_subgraph.add_node(node)
         
@@ -1009,8 +1525,9 @@ class ADF:
         node_to_sub_model = {}
         
         # First pass: identify all sub-ADM creators and create sub-models
+        node_table = self.nodeTable()
         for node_name, node in self.nodes.items():
-            if hasattr(node, 'sub_adf_creator'):
+            if node_table[node_name]['kind'] == 'sub_adm':
                 # Check if this sub-ADM creator is already mapped
                 sub_adm_key = str(node.sub_adf_creator)
                 if sub_adm_key not in sub_adm_mapping:
@@ -1050,6 +1567,8 @@ class ADF:
                         # This positions it within the main ADM area, closer to the nodes
                         main_subgraph.add_node(label_node)
                         
+                        sub_roles = sub_adf._nodeRoles()
+                        
                         # Add all nodes and edges from the sub-ADM to the subgraph
                         for sub_node in sub_graph.get_node_list():
                             # Remove labels and make sub-ADM nodes small and opaque
@@ -1059,63 +1578,7 @@ class ADF:
                             sub_node.set_fontsize('0')
                             
                             # Color code sub-ADM nodes by type and hierarchy
-                            sub_node_name = sub_node.get_name()
-                            if hasattr(sub_adf, 'nodes') and sub_node_name in sub_adf.nodes:
-                                sub_node_obj = sub_adf.nodes[sub_node_name]
-                                
-                                # Find root node in sub-ADM (node with no parents and no dependencies)
-                                all_children = set()
-                                for n in sub_adf.nodes.values():
-                                    if hasattr(n, 'children') and n.children:
-                                        for child in n.children:
-                                            all_children.add(child)
-                                
-                                # Check if this node has any dependencies (DependentBLF nodes that depend on it)
-                                has_dependencies = False
-                                for other_node in sub_adf.nodes.values():
-                                    if hasattr(other_node, 'dependency_node') and other_node.dependency_node:
-                                        if isinstance(other_node.dependency_node, str):
-                                            if other_node.dependency_node == sub_node_name:
-                                                has_dependencies = True
-                                                break
-                                        elif isinstance(other_node.dependency_node, list):
-                                            if sub_node_name in other_node.dependency_node:
-                                                has_dependencies = True
-                                                break
-                                
-                                is_root = sub_node_name not in all_children and not has_dependencies
-                                
-                                # Check if this is an immediate child of root (not a BLF)
-                                is_immediate_child_of_root = False
-                                if not is_root:
-                                    for n in sub_adf.nodes.values():
-                                        if hasattr(n, 'children') and n.children and sub_node_name in n.children:
-                                            # Check if parent is root
-                                            parent_name = n.name
-                                            if parent_name not in all_children:  # Parent is root
-                                                is_immediate_child_of_root = True
-                                                break
-                                
-                                if is_root:
-                                    # Root node - red
-                                    sub_node.set_color('red')
-                                    sub_node.set_fillcolor('red')
-                                elif is_immediate_child_of_root and hasattr(sub_node_obj, 'children') and sub_node_obj.children:
-                                    # Immediate child of root that is NOT a BLF (abstract factor) - blue
-                                    sub_node.set_color('blue')
-                                    sub_node.set_fillcolor('blue')
-                                elif hasattr(sub_node_obj, 'children') and sub_node_obj.children:
-                                    # Other abstract factors - blue
-                                    sub_node.set_color('blue')
-                                    sub_node.set_fillcolor('blue')
-                                else:
-                                    # Base-level factors - green
-                                    sub_node.set_color('green')
-                                    sub_node.set_fillcolor('green')
-                            else:
-                                # Default - gray
-                                sub_node.set_color('gray')
-                                sub_node.set_fillcolor('gray')
+                            sub_adf._colourMinimalNode(sub_node, sub_roles)
                             
                             sub_subgraph.add_node(sub_node)
                         
@@ -1165,6 +1628,15 @@ class ADF:
         return combined_graph
     
     
+    def _colourMinimalNode(self, node, roles):
+        """
+        colours a node of a minimal graph by its role: root red, abstract factors
+        blue, base-level factors green and anything else gray
+        """
+        colour = {'root': 'red', 'abstract': 'blue', 'blf': 'green'}.get(roles.get(node.get_name()), 'gray')
+        node.set_color(colour)
+        node.set_fillcolor(colour)
+    
     def _assign_node_ranks(self, G):
         """
         Assign ranks to nodes to ensure proper hierarchical layout
@@ -1174,22 +1646,61 @@ class ADF:
         rank_0 = pydot.Subgraph(rank='same')
         rank_1 = pydot.Subgraph(rank='same')
         
-        # Rank 0: Abstract factors (nodes with children) - top level
-        # Rank 1: Base level factors (BLFs) and DependentBLFs - bottom level
-        
-        for node_name, node in self.nodes.items():
-            if node.children and node.children != []:
-                # Abstract factors go to rank 0 (top level)
-                rank_0.add_node(pydot.Node(node_name))
-            else:
-                # Base level factors and DependentBLFs go to rank 1 (bottom level)
-                rank_1.add_node(pydot.Node(node_name))
+        abstract, blfs = self._rankGroups()
+        for node_name in abstract:
+            rank_0.add_node(pydot.Node(node_name))
+        for node_name in blfs:
+            rank_1.add_node(pydot.Node(node_name))
         
         # Add subgraphs to the main graph
         if rank_0.get_node_list():
             G.add_subgraph(rank_0)
         if rank_1.get_node_list():
             G.add_subgraph(rank_1)
+    
+    def _rankGroups(self):
+        """
+        returns the abstract factors and the base level factors of the ADF
+        
+        Rank 0: Abstract factors (nodes with children) - top level
+        Rank 1: Base level factors (BLFs) and DependentBLFs - bottom level
+        """
+        abstract = []
+        blfs = []
+        for node_name, node in self.nodes.items():
+            if node.children and node.children != []:
+                abstract.append(node_name)
+            else:
+                blfs.append(node_name)
+        return abstract, blfs
+    
+    def _subADMGroups(self):
+        """
+        numbers the distinct sub-ADMs of the ADF as visualiseNetworkWithSubADMs does
+        
+        Returns
+        -------
+        dict: sub-model number -> (first SubADMBLF using it, sub_adf_creator)
+        dict: node name -> sub-model number, including EvaluationBLFs of those SubADMBLFs
+        """
+        sub_models = {}
+        sub_adm_mapping = {}
+        node_to_sub_model = {}
+        
+        node_table = self.nodeTable()
+        for node_name, node in self.nodes.items():
+            if node_table[node_name]['kind'] == 'sub_adm':
+                sub_adm_key = str(node.sub_adf_creator)
+                if sub_adm_key not in sub_adm_mapping:
+                    sub_adm_mapping[sub_adm_key] = len(sub_adm_mapping) + 1
+                    sub_models[sub_adm_mapping[sub_adm_key]] = (node_name, node.sub_adf_creator)
+                node_to_sub_model[node_name] = sub_adm_mapping[sub_adm_key]
+        
+        for node_name, node in self.nodes.items():
+            if hasattr(node, 'source_blf') and node.source_blf in node_to_sub_model:
+                node_to_sub_model[node_name] = node_to_sub_model[node.source_blf]
+        
+        return sub_models, node_to_sub_model
 
     def addInformationQuestion(self, name, question):
         """
@@ -1329,6 +1840,7 @@ class Node:
             self.acceptance = None
             self.children = None
             self.statement = None
+            self.polarity = {}
     
     def attributes(self, acceptance):
         """
@@ -1356,6 +1868,40 @@ class Node:
                 if token not in ['and','or','not','reject','accept'] and token not in self.children:
                     
                     self.children.append(token)   
+        
+        #edge polarity for visualisation - a child is attacking if it is negated or rejects this node
+        attacking = set()
+        for i in self.acceptance:
+            attacking.update(self.attackingChildren(i))
+        self.polarity = {child: '-' if child in attacking else '+' for child in self.children}
+
+    @staticmethod
+    def attackingChildren(acceptance):
+        """
+        returns the children which are the direct operand of a not or reject in an acceptance condition
+        
+        Parameters
+        ----------
+        acceptance : str
+            the acceptance condition in postfix form
+        """
+        attacking = set()
+        #operands are None once they are the result of an operator rather than a node name
+        operands = []
+        for token in acceptance.split():
+            if token in ['not', 'reject']:
+                operand = operands.pop() if operands else None
+                if operand is not None:
+                    attacking.add(operand)
+                operands.append(None)
+            elif token in ['and', 'or']:
+                del operands[-2:]
+                operands.append(None)
+            elif token == 'accept':
+                operands.append(None)
+            else:
+                operands.append(token)
+        return attacking
 
     def logicConverter(self, expression):
         """
@@ -1441,7 +1987,6 @@ class SubADMBLF(Node):
         
         self.sub_adf_creator = sub_adf_creator
         self.function = function
-        self.sub_adf_results = {}
         
         # Handle both single string and list of dependencies
         if dependency_node is None:
@@ -1480,8 +2025,8 @@ class SubADMBLF(Node):
         
         Parameters
         ----------
-        ui_instance : UI
-            the UI instance to access the main ADF
+        ui_instance : QuestionFlow
+            the question flow, giving the main ADF and case
             
         Returns:
             list: list of items to evaluate
@@ -1504,8 +2049,8 @@ class SubADMBLF(Node):
         
         Parameters
         ----------
-        ui_instance : UI
-            the UI instance that contains the case and facts
+        ui_instance : QuestionFlow
+            the question flow, which contains the case and facts
             
         Returns
         -------
@@ -1531,191 +2076,75 @@ class SubADMBLF(Node):
         
         return key_facts
 
-    def evaluateSubADMs(self, ui_instance):
+    def rootNode(self, sub_adf):
         """
-        Evaluates sub-ADMs for each item using the existing ADM infrastructure
+        Finds the root node of an evaluated sub-ADM
+        
+        The root node is the node that was evaluated last, which corresponds to the
+        final statement of the explanation
         
         Parameters
         ----------
-        ui_instance : UI
-            the UI instance to access the main ADF and case
+        sub_adf : ADF
+            the sub-ADM after evaluateTree has been run
             
         Returns:
-            bool: True if BLF should be accepted, False otherwise
-        """
-        try:
-            # Get the list of items to evaluate
-            items = self._get_source_items(ui_instance)
-            
-            if not items:
-                print(f"\nNo items found to evaluate for {self.name}")
-                return False
-            
-            accepted_count = 0
-            rejected_count = 0
-            item_results = []
-            sub_adf_instances = []  # Store sub-ADM instances for later access to statements
-            
-            print(f"\n=== Evaluating {self.name} for {len(items)} item(s) ===")
-            
-            # Collect key facts from the main ADM to pass to sub-ADMs
-            key_facts = self._collect_key_facts(ui_instance)
-
-            # Evaluate sub-ADM for each item using the existing UI infrastructure
-            for i, item in enumerate(items, 1):
-                print(f"\n--- Item {i}/{len(items)}: {item} ---")
-                try:
-                    # Create a new sub-ADM instance with key facts
-                    sub_adf = self.sub_adf_creator(item, key_facts)
-                    
-                    # Set the item name in the sub-ADM
-                    if hasattr(sub_adf, 'setFact'):
-                        sub_adf.setFact('ITEM', 'name', item)
-                    
-                    # Pass key facts to the sub-ADM
-                    if key_facts:
-                        if hasattr(sub_adf, 'facts'):
-                            sub_adf.facts.update(key_facts)
-                        else:
-                            sub_adf.facts = key_facts.copy()
-                        print(f"Passed {len(key_facts)} key facts to sub-ADM for {item}")
-                    
-                    # Store the sub-ADM instance for later access to statements
-                    sub_adf_instances.append(sub_adf)
-                    
-                    # Use the existing UI infrastructure to evaluate the sub-ADM
-                    # This will handle all node types generically (DependentBLF, QuestionInstantiator, etc.)
-                    sub_result, sub_case = self._evaluateSubADMWithUI(sub_adf, item, ui_instance)
-                    
-                    self.sub_adf_results[item] = sub_result
-                    item_results.append(sub_case)
-                    
-                    if sub_result == 'ACCEPTED':
-                        accepted_count += 1
-                        print(f"✓ {item}: ACCEPTED")
-                    elif sub_result == 'REJECTED':
-                        rejected_count += 1
-                        print(f"✗ {item}: REJECTED")
-                    else:
-                        print(f"? {item}: UNKNOWN")
-                        
-                except Exception as e:
-                    self.sub_adf_results[item] = 'ERROR'
-                    item_results.append(['ERROR'])
-                    print(f"✗ {item}: ERROR - {e}")
-            
-            # Display summary
-            print(f"\n=== {self.name} Evaluation Summary ===")
-            print(f"Total items: {len(items)}")
-            print(f"Accepted: {accepted_count}")
-            print(f"Rejected: {rejected_count}")
-            print(f"Unknown: {len(items) - accepted_count - rejected_count}")
-            
-            # Store the detailed results in the main ADF for other BLFs to access
-            if hasattr(ui_instance.adf, 'setFact'):
-                ui_instance.adf.setFact(self.name, 'results', item_results)
-                ui_instance.adf.setFact(self.name, 'accepted_count', accepted_count)
-                ui_instance.adf.setFact(self.name, 'rejected_count', rejected_count)
-                ui_instance.adf.setFact(self.name, 'items', items)  # Store the item names for display
-                ui_instance.adf.setFact(self.name, 'sub_adf_instances', sub_adf_instances)  # Store sub-ADM instances for statements
-            
-            # Determine final acceptance based on results
-
-            if self.rejection_condition:
-                if rejected_count < 1:
-                    print(f"\n✓ {self.name} is ACCEPTED (found {accepted_count} accepted item(s))")
-                    return True 
-                else:
-                    print(f"\n✗ {self.name} is REJECTED (no accepted items found)")
-                    return False
+            str: the name of the root node, or None if it cannot be found
+        """
+        if hasattr(sub_adf, 'statements') and sub_adf.statements and hasattr(sub_adf, 'nodes') and sub_adf.nodes:
+            # The final statement corresponds to the final evaluated node
+            final_statement = sub_adf.statements[-1]
+            # Find the node that has this statement
+            for node_name, node in sub_adf.nodes.items():
+                if hasattr(node, 'statement') and node.statement and final_statement in node.statement:
+                    return node_name
+        return None
 
-            else:
-                if accepted_count >= 1:
-                    print(f"\n✓ {self.name} is ACCEPTED (found {accepted_count} accepted item(s))")
-                    return True
-                else:
-                    print(f"\n✗ {self.name} is REJECTED (no accepted items found)")
-                    return False
-                    
-        except Exception as e:
-            print(f"\n✗ Error evaluating {self.name}: {e}")
-            return False
-    
-    def _evaluateSubADMWithUI(self, sub_adf, item, ui_instance):
+    def isAccepted(self, accepted_count, rejected_count):
         """
-        Evaluates a single sub-ADM using the existing UI infrastructure
+        Determines whether the BLF is accepted given the item results
         
         Parameters
         ----------
-        sub_adf : ADF
-            the sub-ADM instance to evaluate
-        item : str
-            the item name being evaluated
-        ui_instance : UI
-            the UI instance to reuse question generation logic
-            
-        Returns:
-            str: 'ACCEPTED', 'REJECTED', or 'UNKNOWN'
-            list: the final case after evaluation
+        accepted_count : int
+            the number of items whose sub-ADM was accepted
+        rejected_count : int
+            the number of items whose sub-ADM was rejected
+        """
+        if self.rejection_condition:
+            return rejected_count < 1
+        return accepted_count >= 1
+
+    def storeResults(self, adf, items, item_results, accepted_count, rejected_count, sub_adf_instances,
+                     sub_adf_results=None):
         """
-        try:
-            print(f"  Evaluating sub-ADM for {item}...")
-            
-            # Create a temporary UI instance for this sub-ADM evaluation
-            # This allows us to reuse all the existing question generation logic
-            temp_ui = type(ui_instance)()  # Create instance of same class
-            temp_ui.adf = sub_adf
-            temp_ui.case = sub_adf.case.copy()
-            temp_ui.caseName = item
-            
-            print(f"  → Created temp_ui with {len(temp_ui.adf.nodes)} nodes")
-            
-            # Use the existing UI infrastructure to ask questions and build the case
-            # This will handle all node types generically
-            temp_ui.ask_questions()
-            
-            print(f"  → Completed ask_questions for {item}")
-            
-            # Get the final case after evaluation
-            final_case = temp_ui.case
-            print(f"  → Final case for {item}: {final_case}")
-            
-            # Determine the result based on whether the root node is accepted or rejected
-            # The root node is the final node that gets evaluated (corresponds to final statement in explanation)
-            # We need to find the node that was evaluated last during the ask_questions process
-            # This is the node that determines the final acceptance/rejection
-            root_node = None
-            
-            # Find the node that was evaluated last by looking at the evaluation order
-            # The final node is typically the one that corresponds to the final statement
-            # We can identify it by looking at which node was processed last in the evaluation
-            if hasattr(temp_ui.adf, 'statements') and temp_ui.adf.statements and hasattr(temp_ui.adf, 'nodes') and temp_ui.adf.nodes:
-                # The final statement corresponds to the final evaluated node
-                # We need to find which node this statement belongs to
-                final_statement = temp_ui.adf.statements[-1]
-                # Find the node that has this statement
-                for node_name, node in temp_ui.adf.nodes.items():
-                    if hasattr(node, 'statement') and node.statement and final_statement in node.statement:
-                        root_node = node_name
-                        break
-            
-            # Fallback: if we can't find the root node from statements, use the last node in question order
-            if not root_node:
-                print(f"  → {item} classification: UNKNOWN (no root node found)")
-                return 'UNKNOWN', final_case
-            
-            if root_node in final_case:
-                # Root node was accepted
-                print(f"  → {item} classified as {root_node} (ACCEPTED)")
-                return 'ACCEPTED', final_case
-            else:
-                # Root node was rejected (not in final_case)
-                print(f"  → {item} REJECTED (root node {root_node} rejected)")
-                return 'REJECTED', final_case
-                
-        except Exception as e:
-            print(f"  → Error evaluating sub-ADM for {item}: {e}")
-            return 'UNKNOWN', []
+        Stores the sub-ADM results as facts on the main ADF for other BLFs to access
+        
+        Parameters
+        ----------
+        adf : ADF
+            the main ADF
+        items : list
+            the items which were evaluated
+        item_results : list
+            the final case of each item's sub-ADM
+        accepted_count : int
+            the number of accepted items
+        rejected_count : int
+            the number of rejected items
+        sub_adf_instances : list
+            the evaluated sub-ADM instances
+        sub_adf_results : dict, optional
+            item -> 'ACCEPTED', 'REJECTED', 'UNKNOWN' or 'ERROR'
+        """
+        if hasattr(adf, 'setFact'):
+            adf.setFact(self.name, 'results', item_results)
+            adf.setFact(self.name, 'accepted_count', accepted_count)
+            adf.setFact(self.name, 'rejected_count', rejected_count)
+            adf.setFact(self.name, 'items', items)  # Store the item names for display
+            adf.setFact(self.name, 'sub_adf_instances', sub_adf_instances)  # Store sub-ADM instances for statements
+            if sub_adf_results is not None:
+                adf.setFact(self.name, 'sub_adf_results', sub_adf_results)
 
 class DependentBLF(Node):
     """
@@ -6,12 +6,15 @@ Provides descriptive statistics for ADM structures including main ADM and sub-AD
 
 import sys
 import os
+from collections import Counter
 from MainClasses import *
+from compiled_adf import strongly_connected_components
 import inventive_step_ADM
 
-def analyze_adm_structure(adf, adm_name="Main ADM"):
+def analyze_adm_structure(adf, adm_name="Main ADM", sub_adms=True):
     """
-    Analyze an ADM structure and return statistics about leaf and non-leaf nodes
+    Analyze an ADM structure in a single pass over its nodes and return statistics
+    about its node kinds, shape and predicted evaluation cost
     
     Parameters:
     -----------
@@ -19,60 +22,158 @@ def analyze_adm_structure(adf, adm_name="Main ADM"):
         The ADM instance to analyze
     adm_name : str
         Name of the ADM for reporting
+    sub_adms : bool
+        Whether to also analyze the sub-ADM template of each SubADMBLF
         
     Returns:
     --------
-    dict : Statistics about the ADM structure
+    dict : Statistics about the ADM structure, with per-node details in
+        'condition_size' (acceptance condition tokens) and 'questions_per_root'
+        (distinct questions below each root), and the sub-ADM statistics in 'sub_adms'
     """
-    # Generate non-leaf nodes first
-    adf.nonLeafGen()
+    nodes = adf.nodes
+    counts = dict.fromkeys(['leaf_nodes', 'non_leaf_nodes', 'blf_nodes', 'abstract_nodes', 'other_nodes',
+                            'sub_adm_blf_nodes', 'evaluation_blf_nodes', 'dependent_blf_nodes'], 0)
+    parents = {name: 0 for name in nodes}
+    fan_out = Counter()
+    condition_size = {}
+    dependencies = {}
+    templates = {}
+    node_table = adf.nodeTable()
     
-    # Count total nodes
-    total_nodes = len(adf.nodes)
-    
-    # Count leaf nodes (nodes without children)
-    leaf_nodes = 0
-    non_leaf_nodes = 0
-    
-    for node_name, node in adf.nodes.items():
-        if hasattr(node, 'children') and node.children is not None and len(node.children) > 0:
-            non_leaf_nodes += 1
+    #one pass over the nodes collects everything the metrics below are derived from
+    for node_name, node in nodes.items():
+        children = node.children or []
+        if children:
+            counts['non_leaf_nodes'] += 1
+            fan_out[len(children)] += 1
         else:
-            leaf_nodes += 1
-    
-    # Count different node types
-    blf_nodes = 0  # Base Level Factors (nodes with questions)
-    abstract_nodes = 0  # Abstract factors (nodes with acceptance conditions)
-    other_nodes = 0  # Other types
-    
-    for node_name, node in adf.nodes.items():
-        if hasattr(node, 'question') and node.question is not None:
-            blf_nodes += 1
-        elif hasattr(node, 'acceptance') and node.acceptance is not None:
-            abstract_nodes += 1
+            counts['leaf_nodes'] += 1
+        for child in children:
+            parents[child] = parents.get(child, 0) + 1
+        
+        if getattr(node, 'question', None) is not None:
+            counts['blf_nodes'] += 1
+        elif getattr(node, 'acceptance', None) is not None:
+            counts['abstract_nodes'] += 1
         else:
-            other_nodes += 1
+            counts['other_nodes'] += 1
+        
+        kind = node_table[node_name]['kind']
+        if kind == 'sub_adm':
+            counts['sub_adm_blf_nodes'] += 1
+            templates.setdefault(node.sub_adf_creator, node_name)
+        elif kind == 'evaluation':
+            counts['evaluation_blf_nodes'] += 1
+        elif kind == 'dependent':
+            counts['dependent_blf_nodes'] += 1
+        
+        if getattr(node, 'acceptance', None):
+            condition_size[node_name] = sum(len(condition.split()) for condition in node.acceptance)
+        
+        dependency_nodes = getattr(node, 'dependency_node', None) or []
+        dependencies[node_name] = [dependency_nodes] if isinstance(dependency_nodes, str) else list(dependency_nodes)
+    
+    roots = [name for name in nodes if parents[name] == 0]
+    
+    stats = {
+        'adm_name': adm_name,
+        'total_nodes': len(nodes),
+        **counts,
+        'depth': max((row['depth'] for row in node_table.values()), default=0),
+        'fan_out': dict(sorted(fan_out.items())),
+        'fan_in': dict(sorted(Counter(count for count in parents.values() if count).items())),
+        'longest_dependency_chain': _longest_chain(dependencies),
+        'condition_size': condition_size,
+        'questions_per_root': {root: _questions_below(root, nodes) for root in roots},
+        'evaluation_cost': _evaluation_cost(adf, condition_size)
+    }
+    
+    if sub_adms:
+        stats['sub_adms'] = {}
+        for creator, node_name in templates.items():
+            stats['sub_adms'][node_name] = analyze_sub_adm_structure(creator, f"Sub-ADM ({node_name})")
+    
+    return stats
+
+def _longest_chain(dependencies):
+    """
+    returns the longest chain of dependency nodes, worked out once per node
+    
+    the components come after every component they depend on, so the chains
+    below each are already known; the nodes of a cycle are chained together
+    """
+    chains = {}
+    longest = []
+    for component in strongly_connected_components(dependencies):
+        members = set(component)
+        below = max((chains[dep] for name in component for dep in dependencies.get(name, [])
+                     if dep not in members), key=len, default=[])
+        chain = component + below
+        for name in component:
+            chains[name] = chain
+        if len(chain) > len(longest):
+            longest = chain
+    return longest
+
+def _questions_below(root, nodes):
+    """
+    returns the number of distinct questions which may be asked to decide a node
+    """
+    questions = set()
+    stack, seen = [root], set()
+    while stack:
+        name = stack.pop()
+        if name in seen or name not in nodes:
+            continue
+        seen.add(name)
+        if getattr(nodes[name], 'question', None) is not None:
+            questions.add(name)
+        stack.extend(nodes[name].children or [])
+    return len(questions)
+
+def _evaluation_cost(adf, condition_size):
+    """
+    predicts the work evaluateTree does by replaying the order it picks nodes in
     
-    # Count sub-ADM related nodes
-    sub_adm_blf_nodes = 0
-    evaluation_blf_nodes = 0
+    scan_steps counts the nodes looked at across its passes, child_checks the
+    children checked by checkNonLeaf and condition_tokens the tokens of every
+    acceptance condition, an upper bound on those evaluated
+    """
+    #the nodes nonLeafGen would pick, without changing the ADF's own state
+    node_table = adf.nodeTable()
+    pending = [name for name, row in node_table.items() if adf.nodes[name].children or row['kind'] == 'evaluation']
+    scan_steps = child_checks = 0
+    stalls = False
     
-    for node_name, node in adf.nodes.items():
-        if hasattr(node, 'source_blf') and hasattr(node, 'sub_adm_creator'):
-            sub_adm_blf_nodes += 1
-        elif hasattr(node, 'source_blf') and hasattr(node, 'condition_to_check'):
-            evaluation_blf_nodes += 1
+    while pending:
+        removed = False
+        for name in list(pending):
+            scan_steps += 1
+            node = adf.nodes[name]
+            if name == 'Decide' and len(pending) != 1:
+                continue
+            if node_table[name]['kind'] == 'evaluation':
+                pending.remove(name)
+                removed = True
+                continue
+            child_checks += len(node.children)
+            if all(child not in pending for child in node.children):
+                pending.remove(name)
+                removed = True
+                break
+        if not removed:
+            #evaluateTree would raise, as the nodes left wait on a cycle
+            stalls = True
+            break
     
+    condition_tokens = sum(condition_size.values())
     return {
-        'adm_name': adm_name,
-        'total_nodes': total_nodes,
-        'leaf_nodes': leaf_nodes,
-        'non_leaf_nodes': non_leaf_nodes,
-        'blf_nodes': blf_nodes,
-        'abstract_nodes': abstract_nodes,
-        'other_nodes': other_nodes,
-        'sub_adm_blf_nodes': sub_adm_blf_nodes,
-        'evaluation_blf_nodes': evaluation_blf_nodes
+        'scan_steps': scan_steps,
+        'child_checks': child_checks,
+        'condition_tokens': condition_tokens,
+        'total': scan_steps + child_checks + condition_tokens,
+        'stalls': stalls
     }
 
 def analyze_sub_adm_structure(sub_adm_creator, sub_adm_name, item_name="test_item"):
@@ -111,6 +212,7 @@ def analyze_sub_adm_structure(sub_adm_creator, sub_adm_name, item_name="test_ite
             'other_nodes': 0,
             'sub_adm_blf_nodes': 0,
             'evaluation_blf_nodes': 0,
+            'dependent_blf_nodes': 0,
             'error': str(e)
         }
 
@@ -147,7 +249,25 @@ def print_statistics(stats_list):
         print(f"  ├─ Abstract Factors: {stats['abstract_nodes']}")
         print(f"  ├─ Other Nodes: {stats['other_nodes']}")
         print(f"  ├─ Sub-ADM BLF Nodes: {stats['sub_adm_blf_nodes']}")
-        print(f"  └─ Evaluation BLF Nodes: {stats['evaluation_blf_nodes']}")
+        print(f"  ├─ Evaluation BLF Nodes: {stats['evaluation_blf_nodes']}")
+        print(f"  └─ Dependent BLF Nodes: {stats['dependent_blf_nodes']}")
+        print()
+        print(f"Shape:")
+        print(f"  ├─ Depth: {stats['depth']}")
+        print(f"  ├─ Fan-Out (children: nodes): {stats['fan_out']}")
+        print(f"  ├─ Fan-In (parents: nodes): {stats['fan_in']}")
+        print(f"  └─ Longest Dependency Chain: {' -> '.join(stats['longest_dependency_chain'])}")
+        print()
+        if stats['condition_size']:
+            largest = max(stats['condition_size'], key=stats['condition_size'].get)
+            print(f"Largest Acceptance Conditions: {largest} ({stats['condition_size'][largest]} tokens)")
+        for root, questions in stats['questions_per_root'].items():
+            print(f"Questions Below {root}: {questions}")
+        cost = stats['evaluation_cost']
+        print(f"Predicted Evaluation Cost: {cost['total']} (scan steps {cost['scan_steps']}, "
+              f"child checks {cost['child_checks']}, condition tokens {cost['condition_tokens']})")
+        if cost['stalls']:
+            print("⚠️  evaluateTree would not finish on this ADM")
         print()
     
     # Print summary statistics
@@ -205,18 +325,8 @@ def main():
         inventive_stats = analyze_adm_structure(inventive_adf, "Inventive Step ADM")
         stats_list.append(inventive_stats)
         
-        # Analyze its sub-ADMs
-        sub_adm_1_stats = analyze_sub_adm_structure(
-            inventive_step_ADM.create_sub_adm_1, 
-            "Sub-ADM 1 (Inventive Step)"
-        )
-        stats_list.append(sub_adm_1_stats)
-        
-        sub_adm_2_stats = analyze_sub_adm_structure(
-            inventive_step_ADM.create_sub_adm_2, 
-            "Sub-ADM 2 (Inventive Step)"
-        )
-        stats_list.append(sub_adm_2_stats)
+        # Its sub-ADMs are analyzed from the template of each SubADMBLF
+        stats_list.extend(inventive_stats['sub_adms'].values())
         
     except Exception as e:
         print(f"Error analyzing Inventive Step ADM: {e}")
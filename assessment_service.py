@@ -0,0 +1,413 @@
+"""
+Assessment Service
+Serves ADM assessments over HTTP and Socket.IO, one session per client, from models loaded once per process
+"""
+
+import io
+import threading
+import time
+import uuid
+
+import WildAnimals
+import inventive_step_ADM
+import academic_research_ADM
+from question_flow import QuestionFlow
+from explanation import explain
+from case_store import serialisable_facts
+
+#domains which can be served, keyed by the name used in the API
+DOMAINS = {
+    'academic_research': academic_research_ADM,
+    'inventive_step': inventive_step_ADM,
+    'wild_animals': WildAnimals
+}
+
+
+class AssessmentSession:
+    """
+    The state of a single client's assessment
+
+    Attributes
+    ----------
+    id : str
+        the session id
+    domain : str
+        the key of the domain being assessed
+    adf : ADF
+        a session view of the shared model
+    flow : QuestionFlow
+        the question flow driving the session
+    question : Question
+        the question currently waiting for an answer, None once finished
+    lock : threading.Lock
+        serialises requests for the session
+    last_used : float
+        time of the last request, used to prune idle sessions
+    case_id : int
+        the id of the session in the service's case store once finished, None otherwise
+    """
+
+    def __init__(self, session_id, domain, adf):
+        self.id = session_id
+        self.domain = domain
+        self.adf = adf
+        self.flow = QuestionFlow(adf)
+        self.lock = threading.Lock()
+        self.last_used = time.time()
+        self.case_id = None
+
+        self._questions = self.flow.questions()
+        self.question = self._advance(None)
+
+    def _advance(self, answer):
+        try:
+            if answer is None:
+                return next(self._questions)
+            return self._questions.send(answer)
+        except StopIteration:
+            return None
+
+
+class AssessmentService:
+    """
+    Runs assessment sessions against shared ADF models
+
+    Each domain's ADF is built once, when first requested, and every session
+    works on a sessionView() of it, so the nodes, acceptance conditions and
+    questions are shared while the case and facts stay per session.
+
+    Attributes
+    ----------
+    domains : dict
+        domain name -> module with an adf() function
+    sessions : dict
+        session id -> AssessmentSession
+    store : CaseStore, optional
+        where finished sessions are recorded
+
+    Methods
+    -------
+    create_session(domain)
+        starts a session and returns its first question
+    next_question(session_id)
+        returns the question awaiting an answer
+    answer(session_id, answer)
+        answers the current question and returns the next one
+    outcome(session_id)
+        returns the outcome of a finished session
+    explanation(session_id)
+        returns the full evaluation of a finished session
+    preview(session_id)
+        returns an SVG of the model coloured by the case so far
+    graph(session_id)
+        returns the model and its evaluation so far as JSON, for drawing client-side
+    close(session_id)
+        discards a session
+    prune(max_idle)
+        discards sessions idle for longer than max_idle seconds
+    """
+
+    def __init__(self, domains=None, store=None):
+        self.domains = domains if domains is not None else DOMAINS
+        self.store = store
+        self.sessions = {}
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def model(self, domain):
+        """
+        returns the shared ADF for a domain, building it on first use
+        """
+        if domain not in self.domains:
+            raise KeyError(f"Unknown domain: {domain}")
+        with self._lock:
+            if domain not in self._models:
+                model = self.domains[domain].adf()
+                #compiled before any session view is taken, so every session shares the one plan
+                model.compiledADF()
+                self._models[domain] = model
+            return self._models[domain]
+
+    def create_session(self, domain):
+        """
+        starts a session for a domain
+
+        Returns
+        -------
+        dict: the session id and its first question
+        """
+        adf = self.model(domain).sessionView()
+        session = AssessmentSession(uuid.uuid4().hex, domain, adf)
+        with self._lock:
+            self.sessions[session.id] = session
+        return self._state(session)
+
+    def next_question(self, session_id):
+        """
+        returns the question awaiting an answer, or None if the session has finished
+        """
+        session = self._session(session_id)
+        with session.lock:
+            return self._state(session)
+
+    def answer(self, session_id, answer):
+        """
+        answers the current question
+
+        An invalid answer returns the same question with an 'error' key.
+
+        Parameters
+        ----------
+        session_id : str
+            the session id
+        answer : str, bool or list
+            the answer, in the same form as it would be typed into the CLI
+        """
+        session = self._session(session_id)
+        with session.lock:
+            if session.question is None:
+                raise ValueError("Session has finished, no question to answer")
+            session.question = session._advance(answer)
+            if session.question is None and self.store is not None:
+                #the evaluated nodes were added to the case by evaluateTree, the rest were given
+                given = [factor for factor in session.flow.case if factor not in session.adf.statementIndex]
+                session.case_id = self.store.add(session.adf, given, name=session.id)
+            return self._state(session)
+
+    def outcome(self, session_id):
+        """
+        returns the final case and decision of a finished session
+        """
+        session = self._finished(session_id)
+        statements = session.flow.statements
+        return {
+            'session': session.id,
+            'domain': session.domain,
+            'case': list(session.flow.case),
+            'outcome': statements[-1] if statements else None
+        }
+
+    def explanation(self, session_id):
+        """
+        returns every evaluation statement of a finished session along with its facts,
+        and under 'minimal' the fewest of its factors which on their own decide the outcome
+        """
+        session = self._finished(session_id)
+        compiled = session.adf.compiledADF()
+        #evaluateTree has added the accepted abstract factors, which would explain themselves
+        factors = [factor for factor in session.flow.case if factor not in compiled.conditions]
+        minimal = explain(session.adf, factors, compiled=compiled)
+        return {
+            'session': session.id,
+            'domain': session.domain,
+            'case': list(session.flow.case),
+            'statements': list(session.flow.statements),
+            'facts': serialisable_facts(getattr(session.adf, 'facts', {})),
+            'minimal': {key: minimal[key] for key in ('target', 'present', 'absent', 'statements')}
+        }
+
+    def preview(self, session_id):
+        """
+        returns an SVG of the model coloured by the case so far, laid out in-process
+        """
+        session = self._session(session_id)
+        with session.lock:
+            out = io.StringIO()
+            #coloured from the compiled plan, so the session's own evaluation is left alone
+            session.adf.writeSVG(out, session.flow.case)
+            return out.getvalue()
+
+    def graph(self, session_id):
+        """
+        returns the graph of the model evaluated on the case so far, see ADF.exportGraph
+        """
+        session = self._session(session_id)
+        with session.lock:
+            graph = session.adf.exportGraph(session.flow.case)
+            graph['session'] = session.id
+            graph['domain'] = session.domain
+            return graph
+    
+    def close(self, session_id):
+        """
+        discards a session
+        """
+        with self._lock:
+            if self.sessions.pop(session_id, None) is None:
+                raise KeyError(f"Unknown session: {session_id}")
+
+    def prune(self, max_idle):
+        """
+        discards sessions which have not been used for max_idle seconds
+
+        Returns
+        -------
+        int: the number of sessions discarded
+        """
+        cutoff = time.time() - max_idle
+        with self._lock:
+            idle = [session_id for session_id, session in self.sessions.items()
+                    if session.last_used < cutoff]
+            for session_id in idle:
+                del self.sessions[session_id]
+        return len(idle)
+
+    def _session(self, session_id):
+        with self._lock:
+            session = self.sessions.get(session_id)
+        if session is None:
+            raise KeyError(f"Unknown session: {session_id}")
+        session.last_used = time.time()
+        return session
+
+    def _finished(self, session_id):
+        session = self._session(session_id)
+        if not session.flow.done:
+            raise ValueError("Session has not finished yet")
+        return session
+
+    def _state(self, session):
+        return {
+            'session': session.id,
+            'domain': session.domain,
+            'done': session.flow.done,
+            'question': session.question.to_dict() if session.question is not None else None,
+            #anything reported after the last question, the rest being carried by the questions
+            'notes': list(session.flow.notes)
+        }
+
+
+def create_app(service=None):
+    """
+    creates a Flask app exposing an AssessmentService
+
+    Routes
+    ------
+    POST   /sessions                       {"domain": ...} starts a session
+    GET    /sessions/<id>/question         the question awaiting an answer
+    POST   /sessions/<id>/answer           {"answer": ...} answers it
+    GET    /sessions/<id>/outcome          the outcome once finished
+    GET    /sessions/<id>/explanation      every statement once finished
+    GET    /sessions/<id>/preview.svg      the model coloured by the case so far
+    GET    /sessions/<id>/graph            the model and its evaluation as JSON
+    DELETE /sessions/<id>                  discards the session
+    """
+    #Flask is only needed when the service is actually served
+    from flask import Flask, Response, jsonify, request
+
+    service = service if service is not None else AssessmentService()
+    app = Flask(__name__)
+
+    def handle(call, *args):
+        try:
+            return jsonify(call(*args))
+        except KeyError as e:
+            return jsonify({'error': str(e.args[0])}), 404
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 409
+
+    @app.route('/sessions', methods=['POST'])
+    def create_session():
+        body = request.get_json(silent=True) or {}
+        return handle(service.create_session, body.get('domain'))
+
+    @app.route('/sessions/<session_id>/question', methods=['GET'])
+    def next_question(session_id):
+        return handle(service.next_question, session_id)
+
+    @app.route('/sessions/<session_id>/answer', methods=['POST'])
+    def answer(session_id):
+        body = request.get_json(silent=True) or {}
+        return handle(service.answer, session_id, body.get('answer'))
+
+    @app.route('/sessions/<session_id>/outcome', methods=['GET'])
+    def outcome(session_id):
+        return handle(service.outcome, session_id)
+
+    @app.route('/sessions/<session_id>/explanation', methods=['GET'])
+    def explanation(session_id):
+        return handle(service.explanation, session_id)
+
+    @app.route('/sessions/<session_id>/preview.svg', methods=['GET'])
+    def preview(session_id):
+        try:
+            return Response(service.preview(session_id), mimetype='image/svg+xml')
+        except KeyError as e:
+            return jsonify({'error': str(e.args[0])}), 404
+
+    @app.route('/sessions/<session_id>/graph', methods=['GET'])
+    def graph(session_id):
+        return handle(service.graph, session_id)
+    
+    @app.route('/sessions/<session_id>', methods=['DELETE'])
+    def close(session_id):
+        return handle(lambda session_id: service.close(session_id) or {'closed': session_id}, session_id)
+
+    app.service = service
+    return app
+
+
+def create_socketio(app):
+    """
+    attaches a Socket.IO endpoint to an app from create_app, so a client can hold a
+    session open over a web socket and be sent each question as soon as it is ready
+
+    Events
+    ------
+    create_session  {"domain": ...}                 replies 'question' with the first question
+    question        {"session": ...}                replies 'question' with the question awaiting an answer
+    answer          {"session": ..., "answer": ...} replies 'question' with the next question, and
+                                                    'outcome' as well once the session has finished
+    explanation     {"session": ...}                replies 'explanation' once finished
+    close           {"session": ...}                replies 'closed'
+
+    A failed request replies 'error' with {"error": ...}.
+    """
+    #Flask-SocketIO is only needed when the socket endpoint is actually served
+    from flask_socketio import SocketIO, emit
+
+    service = app.service
+    socketio = SocketIO(app)
+
+    def reply(event, call, *args):
+        try:
+            result = call(*args)
+        except KeyError as e:
+            emit('error', {'error': str(e.args[0])})
+            return None
+        except ValueError as e:
+            emit('error', {'error': str(e)})
+            return None
+        emit(event, result)
+        return result
+
+    @socketio.on('create_session')
+    def create_session(body):
+        reply('question', service.create_session, (body or {}).get('domain'))
+
+    @socketio.on('question')
+    def next_question(body):
+        reply('question', service.next_question, (body or {}).get('session'))
+
+    @socketio.on('answer')
+    def answer(body):
+        body = body or {}
+        state = reply('question', service.answer, body.get('session'), body.get('answer'))
+        if state is not None and state['done']:
+            reply('outcome', service.outcome, state['session'])
+
+    @socketio.on('explanation')
+    def explanation(body):
+        reply('explanation', service.explanation, (body or {}).get('session'))
+
+    @socketio.on('close')
+    def close(body):
+        session_id = (body or {}).get('session')
+        reply('closed', lambda session_id: service.close(session_id) or {'closed': session_id}, session_id)
+
+    return socketio
+
+
+if __name__ == '__main__':
+    app = create_app()
+    create_socketio(app).run(app)
@@ -0,0 +1,381 @@
+"""
+Binary Decision Diagrams
+Compiles the outcome of a node into reduced ordered BDDs over the base-level factors,
+for exact counts and probabilities of each outcome without enumerating cases
+"""
+
+from compiled_adf import CompiledADF
+from counterfactual import relevant_factors
+
+FALSE = 0
+TRUE = 1
+
+
+class BDD:
+    """
+    A manager of reduced ordered binary decision diagrams over a fixed variable order
+
+    A diagram is the id of its root. Nodes are (level, low, high) and are
+    hash-consed in a unique table, so equal functions always have the same id
+    and a node whose two branches are equal is never made.
+
+    Attributes
+    ----------
+    variables : list
+        the variables from the top of the diagrams down
+    level : dict
+        variable -> its position in the order
+
+    Methods
+    -------
+    var(name)
+        returns the diagram of a variable
+    expression(expression, variable=None)
+        returns the diagram of an expression tree
+    negate(u), conjoin(u, v), disjoin(u, v)
+        combine diagrams
+    evaluate(u, present)
+        follows a diagram for an assignment
+    possible(u, value)
+        returns whether some completion of a partial assignment satisfies a diagram
+    count(u)
+        returns the number of assignments of every variable which satisfy a diagram
+    probability(u, probabilities)
+        returns the probability a diagram is satisfied when each variable is independent
+    size(u)
+        returns the number of nodes of a diagram
+    """
+
+    def __init__(self, variables):
+        self.variables = list(variables)
+        self.level = {name: i for i, name in enumerate(self.variables)}
+        #the terminals sit below every variable
+        terminal = len(self.variables)
+        self._nodes = [(terminal, FALSE, FALSE), (terminal, TRUE, TRUE)]
+        self._unique = {}
+        self._cache = {}
+
+    def node(self, level, low, high):
+        """
+        returns the node testing the variable at a level, reusing an equal node if there is one
+        """
+        if low == high:
+            return low
+        key = (level, low, high)
+        u = self._unique.get(key)
+        if u is None:
+            u = len(self._nodes)
+            self._nodes.append(key)
+            self._unique[key] = u
+        return u
+
+    def var(self, name):
+        return self.node(self.level[name], FALSE, TRUE)
+
+    def negate(self, u):
+        if u <= TRUE:
+            return 1 - u
+        key = ('not', u)
+        if key not in self._cache:
+            level, low, high = self._nodes[u]
+            self._cache[key] = self.node(level, self.negate(low), self.negate(high))
+        return self._cache[key]
+
+    def conjoin(self, u, v):
+        if u == FALSE or v == FALSE:
+            return FALSE
+        if u == TRUE:
+            return v
+        if v == TRUE or u == v:
+            return u
+        return self._apply('and', u, v)
+
+    def disjoin(self, u, v):
+        if u == TRUE or v == TRUE:
+            return TRUE
+        if u == FALSE:
+            return v
+        if v == FALSE or u == v:
+            return u
+        return self._apply('or', u, v)
+
+    def _apply(self, op, u, v):
+        #both operators are commutative, so the operands are ordered to share cache entries
+        if u > v:
+            u, v = v, u
+        key = (op, u, v)
+        if key not in self._cache:
+            u_level, u_low, u_high = self._nodes[u]
+            v_level, v_low, v_high = self._nodes[v]
+            level = min(u_level, v_level)
+            if u_level != level:
+                u_low = u_high = u
+            if v_level != level:
+                v_low = v_high = v
+            combine = self.conjoin if op == 'and' else self.disjoin
+            self._cache[key] = self.node(level, combine(u_low, v_low), combine(u_high, v_high))
+        return self._cache[key]
+
+    def expression(self, expression, variable=None):
+        """
+        returns the diagram of an expression tree from compile_condition
+
+        Parameters
+        ----------
+        expression : tuple
+            the expression tree
+        variable : callable, optional
+            node name -> its diagram, by default the variable of that name
+        """
+        variable = variable if variable is not None else self.var
+        op = expression[0]
+        if op == 'var':
+            return variable(expression[1])
+        if op == 'const':
+            return TRUE if expression[1] else FALSE
+        if op == 'not':
+            return self.negate(self.expression(expression[1], variable))
+        combine = self.conjoin if op == 'and' else self.disjoin
+        return combine(self.expression(expression[1], variable), self.expression(expression[2], variable))
+
+    def evaluate(self, u, present):
+        """
+        follows a diagram from its root for an assignment, in at most one step per variable
+
+        Parameters
+        ----------
+        u : int
+            the diagram
+        present : container
+            the variables which are true
+        """
+        while u > TRUE:
+            level, low, high = self._nodes[u]
+            u = high if self.variables[level] in present else low
+        return u == TRUE
+
+    def possible(self, u, value):
+        """
+        returns whether a diagram is satisfied by some way of filling in the unknown variables
+        of a partial assignment, following both branches only where a variable is unknown
+
+        Parameters
+        ----------
+        u : int
+            the diagram
+        value : callable
+            variable -> True, False, or None if it is unknown
+        """
+        memo = {}
+
+        def search(u):
+            if u <= TRUE:
+                return u == TRUE
+            if u not in memo:
+                level, low, high = self._nodes[u]
+                known = value(self.variables[level])
+                if known is None:
+                    memo[u] = search(low) or search(high)
+                else:
+                    memo[u] = search(high if known else low)
+            return memo[u]
+
+        return search(u)
+
+    def count(self, u):
+        """
+        returns the number of assignments of all the variables which satisfy a diagram
+        """
+        memo = {}
+
+        def paths(u):
+            #assignments of the variables from this node's level down
+            if u <= TRUE:
+                return u
+            if u not in memo:
+                level, low, high = self._nodes[u]
+                memo[u] = (paths(low) << (self._nodes[low][0] - level - 1)) + \
+                          (paths(high) << (self._nodes[high][0] - level - 1))
+            return memo[u]
+
+        return paths(u) << self._nodes[u][0]
+
+    def probability(self, u, probabilities):
+        """
+        returns the probability that a diagram is satisfied
+
+        Parameters
+        ----------
+        u : int
+            the diagram
+        probabilities : dict
+            variable -> the probability it is true, 0.5 where not given
+        """
+        memo = {}
+
+        def weight(u):
+            if u <= TRUE:
+                return float(u)
+            if u not in memo:
+                level, low, high = self._nodes[u]
+                p = probabilities.get(self.variables[level], 0.5)
+                memo[u] = (1 - p) * weight(low) + p * weight(high)
+            return memo[u]
+
+        return weight(u)
+
+    def size(self, u):
+        """
+        returns the number of decision nodes reachable from a diagram
+        """
+        seen = set()
+        stack = [u]
+        while stack:
+            u = stack.pop()
+            if u <= TRUE or u in seen:
+                continue
+            seen.add(u)
+            _, low, high = self._nodes[u]
+            stack += [low, high]
+        return len(seen)
+
+
+class OutcomeDiagram:
+    """
+    The outcomes of a node compiled into BDDs over the factors below it
+
+    Attributes
+    ----------
+    target : str
+        the compiled node
+    bdd : BDD
+        the manager holding the diagrams
+    accepted : int
+        the diagram of the node being accepted
+    statements : dict
+        statement index -> the diagram of the node giving that statement
+
+    Methods
+    -------
+    evaluate(case)
+        returns the (accepted, statement index) of a case
+    counts()
+        returns the number of assignments giving each outcome
+    probabilities(priors)
+        returns the probability of each outcome
+    """
+
+    def __init__(self, target, bdd, accepted, statements):
+        self.target = target
+        self.bdd = bdd
+        self.accepted = accepted
+        self.statements = statements
+
+    def evaluate(self, case):
+        present = set(case)
+        accepted = self.bdd.evaluate(self.accepted, present)
+        for index, u in self.statements.items():
+            if self.bdd.evaluate(u, present):
+                return accepted, index
+        return accepted, None
+
+    def counts(self):
+        """
+        returns 'accepted', 'rejected' and each statement index -> the number of
+        assignments of the factors giving it
+        """
+        accepted = self.bdd.count(self.accepted)
+        result = {'accepted': accepted, 'rejected': (1 << len(self.bdd.variables)) - accepted}
+        result.update({index: self.bdd.count(u) for index, u in self.statements.items()})
+        return result
+
+    def probabilities(self, priors):
+        """
+        returns 'accepted', 'rejected' and each statement index -> its probability
+        when each factor is present independently with its prior probability
+        """
+        accepted = self.bdd.probability(self.accepted, priors)
+        result = {'accepted': accepted, 'rejected': 1 - accepted}
+        result.update({index: self.bdd.probability(u, priors) for index, u in self.statements.items()})
+        return result
+
+
+def compile_bdd(adf, target=None, compiled=None, order=None):
+    """
+    compiles the outcome of a node into BDDs over the factors it depends on
+
+    A node gives the statement of the first condition which holds, so statement
+    i holds when condition i does and none before it do; it is accepted if that
+    condition's reject flag is not set. If no condition holds, the last
+    condition's reject flag picks between its statement and the rejection
+    statement. EvaluationBLFs are variables like the base-level factors, since
+    their results come from the sub-ADM facts.
+
+    Parameters
+    ----------
+    adf : ADF
+        the ADF to compile
+    target : str, optional
+        the node to compile, by default the root evaluated last
+    compiled : CompiledADF, optional
+        the compiled ADF, to reuse it
+    order : list, optional
+        the variable order, by default the factors in the order they are met below the target
+
+    Returns
+    -------
+    OutcomeDiagram
+    """
+    compiled = compiled if compiled is not None else CompiledADF(adf)
+    target = target if target is not None else compiled.order[-1]
+    if target not in compiled.conditions:
+        raise ValueError(f"{target} is not an abstract factor of {adf.name}")
+
+    names = compiled.closure(target)
+    variables = order if order is not None else \
+        relevant_factors(compiled, target) + [name for name in names if name in compiled.evaluation_nodes]
+    bdd = BDD(variables)
+
+    membership = {}
+
+    def variable(name):
+        if name in membership:
+            return membership[name]
+        return bdd.var(name) if name in bdd.level else FALSE
+
+    def expression(e):
+        return bdd.expression(e, variable)
+
+    for name in names:
+        if name in compiled.evaluation_nodes:
+            membership[name] = bdd.var(name)
+            continue
+        accepted, statements = _outcomes(bdd, compiled, name, expression)
+        membership[name] = accepted
+        if name == target:
+            return OutcomeDiagram(target, bdd, accepted, statements)
+
+
+def _outcomes(bdd, compiled, name, expression):
+    """
+    returns the diagram of a node being accepted and statement index -> the diagram of it giving that statement
+    """
+    statements = {}
+    accepted = FALSE
+    #none of the conditions so far hold
+    none_before = TRUE
+    flag = FALSE
+    for index, (condition, reject) in enumerate(compiled.conditions[name]):
+        holds = expression(condition)
+        flag = expression(reject) if reject is not None else FALSE
+        first = bdd.conjoin(none_before, holds)
+        statements[index] = bdd.disjoin(statements.get(index, FALSE), first)
+        accepted = bdd.disjoin(accepted, bdd.conjoin(first, bdd.negate(flag)))
+        none_before = bdd.conjoin(none_before, bdd.negate(holds))
+
+    last = len(compiled.conditions[name]) - 1
+    rejection = compiled.statement_counts[name] - 1
+    statements[last] = bdd.disjoin(statements.get(last, FALSE), bdd.conjoin(none_before, flag))
+    statements[rejection] = bdd.disjoin(statements.get(rejection, FALSE),
+                                        bdd.conjoin(none_before, bdd.negate(flag)))
+    return accepted, {index: u for index, u in sorted(statements.items()) if u != FALSE}
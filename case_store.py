@@ -0,0 +1,284 @@
+"""
+Case Store
+Keeps evaluated cases in SQLite, indexed by outcome and factor for analytics queries
+"""
+
+import json
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cases (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    model TEXT NOT NULL,
+    version TEXT NOT NULL,
+    root TEXT,
+    outcome TEXT,
+    given TEXT NOT NULL,
+    facts TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS factors (
+    case_id INTEGER NOT NULL REFERENCES cases(id),
+    factor TEXT NOT NULL,
+    given INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS nodes (
+    case_id INTEGER NOT NULL REFERENCES cases(id),
+    node TEXT NOT NULL,
+    accepted INTEGER NOT NULL,
+    statement INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS items (
+    case_id INTEGER NOT NULL REFERENCES cases(id),
+    blf TEXT NOT NULL,
+    item TEXT NOT NULL,
+    factors TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cases_outcome ON cases (outcome, model);
+CREATE INDEX IF NOT EXISTS cases_version ON cases (version);
+CREATE INDEX IF NOT EXISTS factors_factor ON factors (factor, case_id);
+CREATE INDEX IF NOT EXISTS factors_case ON factors (case_id);
+CREATE INDEX IF NOT EXISTS nodes_node ON nodes (node, accepted, case_id);
+CREATE INDEX IF NOT EXISTS nodes_case ON nodes (case_id);
+CREATE INDEX IF NOT EXISTS items_case ON items (case_id);
+"""
+
+
+class CaseStore:
+    """
+    A SQLite store of evaluated cases
+
+    Each case keeps the factors it was given, its facts, the factors in its
+    final case, the accepted state and statement index of every evaluated
+    node, the case of each sub-ADM item and the structural hash of the model
+    it was evaluated with. Factors and nodes are kept one row each, indexed
+    by name, so a query on any of them is an index lookup rather than a scan.
+
+    Attributes
+    ----------
+    path : str
+        the database file, ':memory:' for a store which is not kept
+
+    Methods
+    -------
+    record(adf, given, name=None)
+        returns the record of an evaluated ADF, ready to insert
+    insert(records)
+        inserts records in one transaction
+    add(adf, given, name=None)
+        records and inserts a single evaluated ADF
+    get(case_id)
+        returns a stored case
+    find(accepted=(), rejected=(), present=(), absent=(), outcome=None, model=None, version=None)
+        returns the ids of the cases matching every condition
+    outcomes(model=None)
+        returns the number of cases with each outcome
+    """
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def record(self, adf, given, name=None):
+        """
+        returns the record of an ADF after evaluateTree
+
+        Parameters
+        ----------
+        adf : ADF
+            the evaluated ADF, whose case, statementIndex and facts are recorded
+        given : list
+            the factors the case was given before evaluation
+        name : str, optional
+            the name of the case
+        """
+        statement_index = getattr(adf, 'statementIndex', {})
+        final = list(dict.fromkeys(getattr(adf, 'case', None) or []))
+        accepted = set(final)
+        facts = getattr(adf, 'facts', {}) or {}
+
+        #the root is the node evaluated last
+        root = next(reversed(statement_index), None)
+        outcome = None
+        if root is not None:
+            statements = adf.nodes[root].statement or []
+            index = statement_index[root]
+            outcome = statements[index] if -len(statements) <= index < len(statements) else None
+
+        items = []
+        node_table = adf.nodeTable()
+        for blf, values in facts.items():
+            #abstract factors inherit the facts of their children, so only the SubADMBLFs' own are taken
+            if node_table.get(blf, {}).get('kind') != 'sub_adm':
+                continue
+            if isinstance(values, dict) and isinstance(values.get('results'), list):
+                for item, item_case in zip(values.get('items') or [], values['results']):
+                    items.append((blf, str(item), json.dumps(list(item_case or []))))
+
+        given = list(dict.fromkeys(given))
+        given_set = set(given)
+        return {
+            'name': name,
+            'model': adf.name,
+            'version': adf.structuralHash(),
+            'root': root,
+            'outcome': outcome,
+            'given': given,
+            'facts': serialisable_facts(facts),
+            'factors': [(factor, factor in given_set) for factor in dict.fromkeys(given + final)],
+            'nodes': [(node, node in accepted, index) for node, index in statement_index.items()],
+            'items': items
+        }
+
+    def insert(self, records):
+        """
+        inserts records in one transaction, so either all of them are stored or none are
+
+        Returns
+        -------
+        list: the ids of the stored cases
+        """
+        ids = []
+        created = time.time()
+        with self.connection:
+            cursor = self.connection.cursor()
+            factor_rows = []
+            node_rows = []
+            item_rows = []
+            for record in records:
+                cursor.execute(
+                    "INSERT INTO cases (name, model, version, root, outcome, given, facts, created) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (record['name'], record['model'], record['version'], record['root'], record['outcome'],
+                     json.dumps(record['given']), json.dumps(record['facts']), created))
+                case_id = cursor.lastrowid
+                ids.append(case_id)
+                factor_rows.extend((case_id, factor, int(given)) for factor, given in record['factors'])
+                node_rows.extend((case_id, node, int(accepted), index) for node, accepted, index in record['nodes'])
+                item_rows.extend((case_id,) + item for item in record['items'])
+            #the rows of every case are inserted together rather than a statement per row
+            cursor.executemany("INSERT INTO factors VALUES (?, ?, ?)", factor_rows)
+            cursor.executemany("INSERT INTO nodes VALUES (?, ?, ?, ?)", node_rows)
+            cursor.executemany("INSERT INTO items VALUES (?, ?, ?, ?)", item_rows)
+        return ids
+
+    def add(self, adf, given, name=None):
+        """
+        records and inserts an evaluated ADF, returning its id
+        """
+        return self.insert([self.record(adf, given, name)])[0]
+
+    def get(self, case_id):
+        """
+        returns a stored case as a dict, as given to insert
+        """
+        row = self.connection.execute(
+            "SELECT name, model, version, root, outcome, given, facts FROM cases WHERE id = ?",
+            (case_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"Unknown case: {case_id}")
+        name, model, version, root, outcome, given, facts = row
+        return {
+            'id': case_id,
+            'name': name,
+            'model': model,
+            'version': version,
+            'root': root,
+            'outcome': outcome,
+            'given': json.loads(given),
+            'facts': json.loads(facts),
+            'factors': [(factor, bool(given)) for factor, given in self.connection.execute(
+                "SELECT factor, given FROM factors WHERE case_id = ? ORDER BY rowid", (case_id,))],
+            'nodes': [(node, bool(accepted), index) for node, accepted, index in self.connection.execute(
+                "SELECT node, accepted, statement FROM nodes WHERE case_id = ? ORDER BY rowid", (case_id,))],
+            'items': [(blf, item, json.loads(factors)) for blf, item, factors in self.connection.execute(
+                "SELECT blf, item, factors FROM items WHERE case_id = ? ORDER BY rowid", (case_id,))]
+        }
+
+    def find(self, accepted=(), rejected=(), present=(), absent=(), outcome=None, model=None, version=None):
+        """
+        returns the ids of the cases matching every condition
+
+        e.g. find(accepted=['NonTechnicalContribution'], rejected=['InvStep'])
+
+        Parameters
+        ----------
+        accepted : iterable
+            nodes which were evaluated and accepted
+        rejected : iterable
+            nodes which were evaluated and rejected
+        present : iterable
+            factors in the final case
+        absent : iterable
+            factors not in the final case
+        outcome : str, optional
+            the final statement
+        model : str, optional
+            the name of the model
+        version : str, optional
+            the structural hash of the model
+        """
+        clauses = []
+        parameters = []
+        for column, value in (('outcome', outcome), ('model', model), ('version', version)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                parameters.append(value)
+        for node in accepted:
+            clauses.append("id IN (SELECT case_id FROM nodes WHERE node = ? AND accepted = 1)")
+            parameters.append(node)
+        for node in rejected:
+            clauses.append("id IN (SELECT case_id FROM nodes WHERE node = ? AND accepted = 0)")
+            parameters.append(node)
+        for factor in present:
+            clauses.append("id IN (SELECT case_id FROM factors WHERE factor = ?)")
+            parameters.append(factor)
+        for factor in absent:
+            clauses.append("id NOT IN (SELECT case_id FROM factors WHERE factor = ?)")
+            parameters.append(factor)
+
+        query = "SELECT id FROM cases"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        return [row[0] for row in self.connection.execute(query + " ORDER BY id", parameters)]
+
+    def outcomes(self, model=None):
+        """
+        returns outcome -> the number of cases with it
+        """
+        query = "SELECT outcome, COUNT(*) FROM cases"
+        parameters = []
+        if model is not None:
+            query += " WHERE model = ?"
+            parameters.append(model)
+        return dict(self.connection.execute(query + " GROUP BY outcome", parameters))
+
+
+def serialisable_facts(facts):
+    """
+    returns the facts which can be encoded as JSON (sub-ADM instances are left out)
+    """
+    result = {}
+    for category, values in (facts or {}).items():
+        if not isinstance(values, dict):
+            continue
+        for name, value in values.items():
+            try:
+                json.dumps(value)
+            except (TypeError, ValueError):
+                continue
+            result.setdefault(category, {})[name] = value
+    return result
@@ -0,0 +1,295 @@
+"""
+Session Checkpointing
+Append-only journal of an interactive assessment so a long session can be resumed
+"""
+
+import json
+import os
+
+
+class SessionCheckpoint:
+    """
+    An append-only checkpoint of an assessment session
+
+    Every answered question is written as a single JSON line holding only what
+    changed since the previous line (new case factors and changed facts), so
+    writing a checkpoint costs one small append regardless of session length.
+    Sub-ADM item lists and completed items are journalled in the same file.
+
+    Attributes
+    ----------
+    path : str
+        the file the journal is appended to
+    state : dict
+        the session state rebuilt from the journal (domain, caseName, case,
+        facts, completed questions and sub-ADM progress)
+    durable : bool, default False
+        if True each line is fsync'd rather than just flushed
+
+    Methods
+    -------
+    start(domain, caseName)
+        starts a new journal for a session
+    record_question(name, case, facts)
+        records that a question has been completed
+    record_items(blf_name, items)
+        records the items a SubADMBLF will evaluate
+    record_item(blf_name, index, item, result, item_case)
+        records a completed sub-ADM item
+    items(blf_name)
+        the recorded items for a SubADMBLF, or None
+    item_result(blf_name, index)
+        the recorded (result, case) of a completed sub-ADM item, or None
+    remaining(question_order)
+        the question order with completed questions removed
+    load(path)
+        rebuilds the session state from a journal
+    """
+
+    VERSION = 1
+
+    def __init__(self, path, state=None, durable=False):
+        """
+        Parameters
+        ----------
+        path : str
+            the file the journal is appended to
+        state : dict, optional
+            a state previously returned by load(), used when resuming
+        durable : bool, default False
+            if True each line is fsync'd rather than just flushed
+        """
+        self.path = path
+        self.durable = durable
+        self.state = state if state is not None else self._emptyState()
+
+        #shadow copies used to work out what changed between answers
+        self._case_seen = set(self.state['case'])
+        self._facts_seen = {blf: {name: json.dumps(value) for name, value in values.items()}
+                            for blf, values in self.state['facts'].items()}
+
+        self._file = None
+
+    @staticmethod
+    def _emptyState():
+        return {
+            'domain': None,
+            'caseName': None,
+            'case': [],
+            'facts': {},
+            'completed': [],
+            'sub_adm': {}
+        }
+
+    def start(self, domain, caseName):
+        """
+        starts a new journal for a session, discarding any previous one at the path
+
+        Parameters
+        ----------
+        domain : str
+            the key of the domain being assessed
+        caseName : str
+            the name of the case
+        """
+        self.close()
+        self.state = self._emptyState()
+        self.state['domain'] = domain
+        self.state['caseName'] = caseName
+        self._case_seen = set()
+        self._facts_seen = {}
+
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._append({'event': 'start', 'version': self.VERSION, 'domain': domain, 'caseName': caseName})
+
+    def record_question(self, name, case, facts):
+        """
+        records that a question has been completed along with the case factors
+        and facts it produced
+
+        Parameters
+        ----------
+        name : str
+            the name of the question in the question order
+        case : list
+            the current case
+        facts : dict
+            the current facts of the ADF
+        """
+        added = [factor for factor in case if factor not in self._case_seen]
+        self._case_seen.update(added)
+        changed = self._changedFacts(facts)
+
+        self.state['case'].extend(added)
+        self._mergeFacts(changed)
+        self.state['completed'].append(name)
+
+        self._append({'event': 'question', 'name': name, 'case': added, 'facts': changed})
+
+    def record_items(self, blf_name, items):
+        """
+        records the items a SubADMBLF will evaluate so they are not collected again
+
+        Parameters
+        ----------
+        blf_name : str
+            the name of the SubADMBLF
+        items : list
+            the items to be evaluated by the sub-ADM
+        """
+        self.state['sub_adm'][blf_name] = {'items': list(items), 'done': {}}
+        self._append({'event': 'items', 'blf': blf_name, 'items': list(items)})
+
+    def record_item(self, blf_name, index, item, result, item_case):
+        """
+        records a completed sub-ADM item
+
+        Parameters
+        ----------
+        blf_name : str
+            the name of the SubADMBLF
+        index : int
+            the position of the item in the item list
+        item : str
+            the item that was evaluated
+        result : str
+            'ACCEPTED', 'REJECTED' or 'UNKNOWN'
+        item_case : list
+            the final case of the sub-ADM for the item
+        """
+        progress = self.state['sub_adm'].setdefault(blf_name, {'items': [], 'done': {}})
+        progress['done'][index] = {'item': item, 'result': result, 'case': list(item_case)}
+        self._append({'event': 'item', 'blf': blf_name, 'index': index, 'item': item,
+                      'result': result, 'case': list(item_case)})
+
+    def items(self, blf_name):
+        """
+        returns the recorded items for a SubADMBLF, or None if none were recorded
+        """
+        progress = self.state['sub_adm'].get(blf_name)
+        if progress is None:
+            return None
+        return list(progress['items'])
+
+    def item_result(self, blf_name, index):
+        """
+        returns the recorded (result, case) of a completed sub-ADM item, or None
+        """
+        progress = self.state['sub_adm'].get(blf_name)
+        if progress is None or index not in progress['done']:
+            return None
+        done = progress['done'][index]
+        return done['result'], list(done['case'])
+
+    def remaining(self, question_order):
+        """
+        returns the question order with the completed questions removed
+
+        Parameters
+        ----------
+        question_order : list
+            the full question order of the ADF
+        """
+        completed = set(self.state['completed'])
+        return [question for question in question_order if question not in completed]
+
+    def close(self):
+        """
+        closes the journal file
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @classmethod
+    def load(cls, path, durable=False):
+        """
+        rebuilds the session state from a journal and returns a checkpoint which
+        continues appending to it
+
+        A partially written final line (e.g. the process died mid-write) is ignored.
+
+        Parameters
+        ----------
+        path : str
+            the journal to load
+        durable : bool, default False
+            if True each new line is fsync'd rather than just flushed
+        """
+        state = cls._emptyState()
+
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+
+                event = record.get('event')
+                if event == 'start':
+                    state['domain'] = record['domain']
+                    state['caseName'] = record['caseName']
+                elif event == 'question':
+                    for factor in record['case']:
+                        if factor not in state['case']:
+                            state['case'].append(factor)
+                    for blf, values in record['facts'].items():
+                        state['facts'].setdefault(blf, {}).update(values)
+                    state['completed'].append(record['name'])
+                elif event == 'items':
+                    state['sub_adm'][record['blf']] = {'items': record['items'], 'done': {}}
+                elif event == 'item':
+                    progress = state['sub_adm'].setdefault(record['blf'], {'items': [], 'done': {}})
+                    progress['done'][record['index']] = {'item': record['item'],
+                                                         'result': record['result'],
+                                                         'case': record['case']}
+
+        checkpoint = cls(path, state, durable)
+        #drops any partial final line before new records are appended
+        checkpoint._truncateTo(path)
+        return checkpoint
+
+    def _truncateTo(self, path):
+        """
+        reopens the journal for appending, cutting off a trailing partial line
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+        valid = data.rfind(b'\n') + 1
+        with open(path, 'r+b') as f:
+            f.truncate(valid)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def _changedFacts(self, facts):
+        """
+        returns the JSON serialisable facts which changed since the last record
+        """
+        changed = {}
+        for blf, values in (facts or {}).items():
+            if not isinstance(values, dict):
+                continue
+            seen = self._facts_seen.setdefault(blf, {})
+            for fact_name, value in values.items():
+                try:
+                    encoded = json.dumps(value)
+                except (TypeError, ValueError):
+                    #e.g. sub-ADM instances, which are not journalled
+                    continue
+                #compares encoded values so lists mutated in place are still noticed
+                if seen.get(fact_name) == encoded:
+                    continue
+                seen[fact_name] = encoded
+                changed.setdefault(blf, {})[fact_name] = value
+        return changed
+
+    def _mergeFacts(self, changed):
+        for blf, values in changed.items():
+            self.state['facts'].setdefault(blf, {}).update(values)
+
+    def _append(self, record):
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+        if self.durable:
+            os.fsync(self._file.fileno())
@@ -0,0 +1,168 @@
+"""
+Code Generation
+Writes an ADF out as a standalone Python module evaluating cases as bit vectors
+"""
+
+import hashlib
+import importlib.util
+import os
+
+from compiled_adf import CompiledADF
+
+
+def expression_code(expression, bits):
+    """
+    returns the Python of an expression tree from compile_condition over a bit vector
+
+    Parameters
+    ----------
+    expression : tuple
+        the expression tree
+    bits : dict
+        node name -> its bit
+    """
+    op = expression[0]
+    if op == 'var':
+        return f"bits & {1 << bits[expression[1]]}"
+    if op == 'const':
+        return 'True' if expression[1] else 'False'
+    if op == 'not':
+        return f"not ({expression_code(expression[1], bits)})"
+    return f"({expression_code(expression[1], bits)}) {op} ({expression_code(expression[2], bits)})"
+
+
+def generate_module(adf, compiled=None):
+    """
+    returns the source of a module evaluating the ADF without interpreting its conditions
+
+    The module has one function per abstract factor, with its acceptance
+    conditions inlined as bit tests, and an evaluate() calling them in
+    evaluateTree's order. A case is an int with a bit per node (see NAMES).
+    EvaluationBLFs are not evaluated, since their result comes from sub-ADM
+    facts; they are present when their bit is given.
+
+    Parameters
+    ----------
+    adf : ADF
+        the ADF to generate
+    compiled : CompiledADF, optional
+        the compiled ADF, to reuse it
+    """
+    compiled = compiled if compiled is not None else CompiledADF(adf)
+    names = list(dict.fromkeys(adf._graphNodeNames() + compiled.order))
+    bits = {name: i for i, name in enumerate(names)}
+
+    lines = [
+        '"""',
+        f'Evaluator generated for {adf.name}',
+        'Do not edit, it is regenerated whenever the model changes',
+        '"""',
+        '',
+        f'VERSION = {adf.structuralHash()!r}',
+        f'NAMES = {names!r}',
+        'BITS = {name: 1 << i for i, name in enumerate(NAMES)}',
+        f'ORDER = {compiled.order!r}',
+        'STATEMENTS = [',
+    ]
+    for name in compiled.order:
+        lines.append(f'    {list(adf.nodes[name].statement or [])!r},')
+    lines += [']', '']
+
+    for position, name in enumerate(compiled.order):
+        lines += ['', f'def node_{position}(bits):', f'    #{name}']
+        count = compiled.statement_counts[name]
+        if name in compiled.evaluation_nodes:
+            rejected = 1 if count > 1 else 0
+            lines += [f'    if bits & {1 << bits[name]}:', '        return True, 0', f'    return False, {rejected}', '']
+            continue
+
+        conditions = compiled.conditions[name]
+        for index, (expression, reject) in enumerate(conditions):
+            lines.append(f'    if {expression_code(expression, bits)}:')
+            if reject is None:
+                lines.append(f'        return True, {index}')
+            else:
+                lines.append(f'        return not ({expression_code(reject, bits)}), {index}')
+        last_reject = conditions[-1][1] if conditions else None
+        if last_reject is None:
+            lines.append(f'    return False, {count - 1}')
+        else:
+            #the last condition's reject flag picks its own statement over the rejection statement
+            lines.append(f'    return False, ({len(conditions) - 1} if {expression_code(last_reject, bits)} else {count - 1})')
+        lines.append('')
+
+    lines += [
+        '',
+        'def evaluate(bits):',
+        '    """',
+        '    evaluates a case given as a bit vector',
+        '',
+        '    Returns',
+        '    -------',
+        '    int: the bits of the final case',
+        '    list: the index of the statement of each node in ORDER',
+        '    """',
+    ]
+    for position, name in enumerate(compiled.order):
+        lines += [f'    accepted, s{position} = node_{position}(bits)',
+                  '    if accepted:',
+                  f'        bits |= {1 << bits[name]}']
+    lines.append(f"    return bits, [{', '.join(f's{position}' for position in range(len(compiled.order)))}]")
+
+    lines += [
+        '',
+        '',
+        'def encode(case):',
+        '    """',
+        '    returns the bit vector of a list of factors, ignoring any which are not nodes',
+        '    """',
+        '    bits = 0',
+        '    for factor in case:',
+        '        bits |= BITS.get(factor, 0)',
+        '    return bits',
+        '',
+        '',
+        'def decode(bits):',
+        '    """',
+        '    returns the factors of a bit vector',
+        '    """',
+        '    return [name for i, name in enumerate(NAMES) if bits >> i & 1]',
+        '',
+        '',
+        'def evaluate_case(case):',
+        '    """',
+        '    evaluates a list of factors, returning the final case and the statements as evaluateTree does',
+        '    """',
+        '    bits, indices = evaluate(encode(case))',
+        '    statements = [STATEMENTS[i][index] for i, index in enumerate(indices) if STATEMENTS[i]]',
+        '    final = list(dict.fromkeys(case))',
+        '    final += [name for name in ORDER if bits & BITS[name] and name not in final]',
+        '    return final, statements',
+        '',
+    ]
+    return '\n'.join(lines)
+
+
+def load_evaluator(adf, directory='.codegen_cache', compiled=None):
+    """
+    returns the generated evaluator module of an ADF, generating it only if the
+    model has changed since it was last written
+
+    the module is kept in the directory as adm_<structural hash>_<statements hash>.py,
+    since the statements are generated into it but are not part of the structure
+    """
+    version = adf.structuralHash()
+    statements = hashlib.sha256(repr([node.statement for node in adf.nodes.values()]).encode('utf-8')).hexdigest()
+    name = f"adm_{version[:32]}_{statements[:8]}"
+    path = os.path.join(directory, f"{name}.py")
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        #written to a temporary file first so a half written module is never imported
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(generate_module(adf, compiled))
+        os.replace(path + '.tmp', path)
+
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,586 @@
+"""
+Compiled ADF
+Acceptance conditions compiled once into expression trees and evaluated in evaluateTree's order
+"""
+
+import heapq
+
+#tokens of a postfix acceptance condition which are not node names
+OPERATORS = ('and', 'or', 'not', 'reject', 'accept')
+
+
+def compile_condition(postfix):
+    """
+    compiles a postfix acceptance condition into an expression tree
+
+    Expressions are tuples: ('var', name), ('const', bool), ('not', e),
+    ('and', a, b) and ('or', a, b). The reject token does not appear in the
+    tree; as in postfixEvaluation it leaves its operand's value on the stack and
+    sets the reject flag, which is the value of the operand of the last reject
+    token in the condition.
+
+    Parameters
+    ----------
+    postfix : str
+        the condition in postfix notation, as stored in Node.acceptance
+
+    Returns
+    -------
+    tuple: the expression and the expression of the reject flag, None if the
+    condition has no reject token
+    """
+    stack = []
+    reject = None
+    for token in postfix.split():
+        if token == 'accept':
+            stack.append(('const', True))
+        elif token == 'reject':
+            operand = stack.pop()
+            #only a node name can be in the case, anything else never rejects
+            flag = operand if operand[0] == 'var' else ('const', False)
+            reject = flag
+            stack.append(flag)
+        elif token == 'not':
+            stack.append(('not', stack.pop()))
+        elif token in ('and', 'or'):
+            operand2 = stack.pop()
+            operand1 = stack.pop()
+            stack.append((token, operand1, operand2))
+        else:
+            stack.append(('var', token))
+
+    expression = stack.pop() if stack else ('const', False)
+    return expression, reject
+
+
+def evaluate_expression(expression, present):
+    """
+    evaluates an expression tree
+
+    Parameters
+    ----------
+    expression : tuple
+        a tree from compile_condition
+    present : callable
+        name -> whether the node is in the case
+    """
+    op = expression[0]
+    if op == 'var':
+        return present(expression[1])
+    if op == 'const':
+        return expression[1]
+    if op == 'not':
+        return not evaluate_expression(expression[1], present)
+    if op == 'and':
+        return evaluate_expression(expression[1], present) and evaluate_expression(expression[2], present)
+    return evaluate_expression(expression[1], present) or evaluate_expression(expression[2], present)
+
+
+def evaluate_kleene(expression, value):
+    """
+    evaluates an expression tree in three-valued (Kleene) logic
+
+    Parameters
+    ----------
+    expression : tuple
+        a tree from compile_condition
+    value : callable
+        name -> True, False, or None if it is not known whether the node is in the case
+
+    Returns
+    -------
+    True or False if the known values decide the expression, otherwise None
+    """
+    op = expression[0]
+    if op == 'var':
+        return value(expression[1])
+    if op == 'const':
+        return expression[1]
+    if op == 'not':
+        result = evaluate_kleene(expression[1], value)
+        return None if result is None else not result
+    #the operand which decides and/or on its own
+    decisive = op == 'or'
+    operand1 = evaluate_kleene(expression[1], value)
+    if operand1 is decisive:
+        return decisive
+    operand2 = evaluate_kleene(expression[2], value)
+    if operand2 is decisive:
+        return decisive
+    if operand1 is None or operand2 is None:
+        return None
+    return not decisive
+
+
+def expression_variables(expression):
+    """
+    returns the node names an expression tree reads
+    """
+    if expression[0] == 'var':
+        return {expression[1]}
+    if expression[0] == 'const':
+        return set()
+    names = set()
+    for operand in expression[1:]:
+        names |= expression_variables(operand)
+    return names
+
+
+def popcount(bits):
+    """
+    returns the number of bits set in a non-negative int, as int.bit_count does from Python 3.10
+    """
+    return bin(bits).count('1')
+
+
+class CompiledADF:
+    """
+    The acceptance conditions of an ADF compiled once, for evaluating many cases
+
+    Evaluates to the same accepted nodes and statement indices as evaluateTree,
+    in the same order, without re-parsing the postfix strings or scanning the
+    non-leaf nodes for the next one ready.
+
+    Attributes
+    ----------
+    adf : ADF
+        the compiled ADF
+    order : list
+        the non-leaf nodes in the order evaluateTree evaluates them
+    conditions : dict
+        node name -> list of (expression, reject expression), one per acceptance condition
+    statement_counts : dict
+        node name -> number of statements
+    evaluation_nodes : set
+        the EvaluationBLFs, whose result comes from the sub-ADM facts rather than the case
+    parents : dict
+        node name -> the non-leaf nodes whose conditions read it
+    evaluations : int
+        the number of nodes evaluated so far, to measure the work done
+
+    Methods
+    -------
+    evaluate(case, results=None)
+        evaluates every non-leaf node for a case
+    evaluateNode(name, present)
+        evaluates one node's acceptance conditions
+    evaluateTarget(target, case, results=None, adf=None)
+        evaluates only the nodes one node's outcome needs
+    propagate(case, values, flips, changed=None, flipped=())
+        re-evaluates only what changes when some factors are added or removed
+    statement(name, outcome)
+        returns the statement a node gives for an outcome
+    closure(target)
+        returns the non-leaf nodes a node depends on, in evaluation order
+    possibleOutcomes(name, value)
+        returns the outcomes a node may have when some factors are unknown
+    evaluateKleene(known, results, names=None)
+        evaluates the possible outcomes of nodes when only some factors are known
+    """
+
+    def __init__(self, adf):
+        self.adf = adf
+        adf.nonLeafGen()
+        non_leaf = dict(adf.nonLeaf)
+
+        self.order = self._evaluationOrder(non_leaf)
+        self.conditions = {}
+        self.statement_counts = {}
+        self.evaluation_nodes = set()
+        self.parents = {}
+        self.evaluations = 0
+
+        node_table = adf.nodeTable()
+        for name in self.order:
+            node = non_leaf[name]
+            self.statement_counts[name] = node_table[name]['statements']
+            if node_table[name]['kind'] == 'evaluation':
+                self.evaluation_nodes.add(name)
+                continue
+            self.conditions[name] = [compile_condition(condition) for condition in node.acceptance]
+            for child in node.children:
+                self.parents.setdefault(child, []).append(name)
+
+        self._position = {name: i for i, name in enumerate(self.order)}
+
+    def _evaluationOrder(self, non_leaf):
+        return evaluation_order(non_leaf)
+
+    def evaluateNode(self, name, present):
+        """
+        evaluates a node's acceptance conditions as evaluateNode does
+
+        Returns
+        -------
+        tuple: (accepted, index of the statement given)
+        """
+        self.evaluations += 1
+        index = -1
+        flag = False
+        for index, (expression, reject) in enumerate(self.conditions[name]):
+            result = evaluate_expression(expression, present)
+            flag = reject is not None and evaluate_expression(reject, present)
+            if result:
+                return (not flag, index)
+        #the last condition's reject flag decides between its own statement and the rejection statement
+        if flag:
+            return (False, index)
+        return (False, self.statement_counts[name] - 1)
+
+    def evaluate(self, case, results=None):
+        """
+        evaluates every non-leaf node for a case
+
+        Parameters
+        ----------
+        case : iterable
+            the factors of the case, which is not changed
+        results : dict, optional
+            EvaluationBLF name -> its result, by default from evaluateResults on the ADF's facts
+
+        Returns
+        -------
+        dict: node name -> (accepted, statement index), in evaluation order
+        """
+        present = set(case)
+        values = {}
+        for name in self.order:
+            if name in self.evaluation_nodes:
+                accepted = self._evaluationResult(name, results)
+                values[name] = (accepted, 0 if accepted or self.statement_counts[name] < 2 else 1)
+            else:
+                values[name] = self.evaluateNode(name, present.__contains__)
+            if values[name][0]:
+                present.add(name)
+        return values
+
+    def evaluateTarget(self, target, case, results=None, adf=None):
+        """
+        evaluates only the nodes the outcome of one node needs, giving them the
+        outcomes evaluate would
+
+        A node is evaluated when a condition being evaluated reads it, so nodes
+        only read behind an operand which has already decided the condition are
+        never evaluated, and each node is evaluated at most once in the run.
+
+        Parameters
+        ----------
+        target : str
+            the non-leaf node
+        case : iterable
+            the factors of the case, which is not changed
+        results : dict, optional
+            EvaluationBLF name -> its result, by default from evaluateResults on the ADF's facts
+        adf : ADF, optional
+            the ADF whose facts decide EvaluationBLFs without a result, by default the
+            compiled one, e.g. a session view sharing its nodes
+
+        Returns
+        -------
+        dict: node name -> (accepted, statement index) of every node evaluated,
+        each after the nodes it read, so the target is last
+        """
+        if target not in self._position:
+            raise ValueError(f"{target} is not a non-leaf node of {self.adf.name}")
+        present = set(case)
+        values = {}
+
+        def is_present(name):
+            if name in present:
+                return True
+            if name not in self._position:
+                return False
+            if name not in values:
+                evaluate(name)
+            return values[name][0]
+
+        def evaluate(name):
+            if name in self.evaluation_nodes:
+                accepted = self._evaluationResult(name, results, adf)
+                values[name] = (accepted, 0 if accepted or self.statement_counts[name] < 2 else 1)
+            else:
+                values[name] = self.evaluateNode(name, is_present)
+
+        evaluate(target)
+        return values
+
+    def accepted(self, case, values):
+        """
+        returns the factors of the case after evaluation, as evaluateTree leaves it
+        """
+        result = list(dict.fromkeys(case))
+        seen = set(result)
+        for name, (accepted, _) in values.items():
+            if accepted and name not in seen:
+                result.append(name)
+                seen.add(name)
+        return result
+
+    def propagate(self, case, values, flips, changed=None, flipped=()):
+        """
+        re-evaluates only the nodes reading a factor whose presence changes
+
+        Nodes are revisited in evaluation order and a node's parents only when
+        its own presence in the case changes, so flipping a factor costs the
+        nodes it can reach rather than a whole evaluation.
+
+        Parameters
+        ----------
+        case : set
+            the factors of the original case
+        values : dict
+            the result of evaluate for that case
+        flips : iterable
+            the factors to add if absent or remove if present
+        changed : dict, optional
+            the result of an earlier propagate to build on, so work shared by
+            several flips is only done once
+        flipped : iterable, optional
+            the flips of that earlier propagate
+
+        Returns
+        -------
+        dict: node name -> (accepted, statement index) for every node whose value changed
+        """
+        changed = dict(changed or {})
+        presence = {}
+
+        def present(name):
+            if name in presence:
+                return presence[name]
+            if name in changed:
+                return name in case or changed[name][0]
+            if name in values:
+                return name in case or values[name][0]
+            return name in case
+
+        pending = []
+        queued = set()
+
+        def schedule(name):
+            for parent in self.parents.get(name, []):
+                if parent not in queued:
+                    queued.add(parent)
+                    heapq.heappush(pending, self._position[parent])
+
+        #earlier flips are already reflected in changed, so only the new ones are propagated
+        for name in flipped:
+            presence[name] = not present(name)
+        for name in flips:
+            presence[name] = not present(name)
+            schedule(name)
+
+        while pending:
+            name = self.order[heapq.heappop(pending)]
+            queued.discard(name)
+            if name in presence:
+                continue
+            was_present = present(name)
+            value = self.evaluateNode(name, present)
+            if value != values[name]:
+                changed[name] = value
+            else:
+                changed.pop(name, None)
+            if present(name) != was_present:
+                schedule(name)
+
+        return changed
+
+    def statement(self, name, outcome):
+        """
+        returns the statement a node gives for an (accepted, statement index) outcome, None if it has none
+        """
+        statements = self.adf.nodes[name].statement or []
+        index = outcome[1]
+        return statements[index] if -len(statements) <= index < len(statements) else None
+
+    def closure(self, target):
+        """
+        returns the non-leaf nodes whose outcome the outcome of a node depends on,
+        the node included, in evaluation order
+        """
+        needed = set()
+        stack = [target]
+        while stack:
+            name = stack.pop()
+            if name in needed or name not in self._position:
+                continue
+            needed.add(name)
+            if name in self.conditions:
+                stack.extend(self.adf.nodes[name].children)
+        return [name for name in self.order if name in needed]
+
+    def possibleOutcomes(self, name, value):
+        """
+        returns every (accepted, statement index) a node may have given three-valued
+        values of the nodes it reads
+
+        the operands of a condition are treated as independent, so the set may
+        hold outcomes which cannot actually happen but never misses one which can
+        """
+        self.evaluations += 1
+        outcomes = set()
+        index = -1
+        flags = {False}
+        for index, (expression, reject) in enumerate(self.conditions[name]):
+            result = evaluate_kleene(expression, value)
+            flag = False if reject is None else evaluate_kleene(reject, value)
+            flags = {flag} if flag is not None else {True, False}
+            if result is not False:
+                outcomes.update((not flag, index) for flag in flags)
+            if result is True:
+                return outcomes
+        for flag in flags:
+            outcomes.add((False, index) if flag else (False, self.statement_counts[name] - 1))
+        return outcomes
+
+    def evaluateKleene(self, known, results, names=None):
+        """
+        evaluates the possible outcomes of nodes when only some factors are known
+
+        Parameters
+        ----------
+        known : dict
+            factor -> True if in the case, False if not; other factors are unknown.
+            For an abstract factor True means it was given in the case, False that it
+            was not, so it is only present if accepted
+        results : dict
+            EvaluationBLF name -> its result
+        names : list, optional
+            the non-leaf nodes to evaluate, e.g. from closure(), by default all of them
+
+        Returns
+        -------
+        dict: node name -> set of possible (accepted, statement index)
+        """
+        outcomes = {}
+
+        def value(name):
+            if name not in outcomes:
+                return known.get(name)
+            accepted = {outcome[0] for outcome in outcomes[name]}
+            given = known.get(name)
+            if given is True or accepted == {True}:
+                return True
+            if given is False and accepted == {False}:
+                return False
+            return None
+
+        for name in (self.order if names is None else names):
+            if name in self.evaluation_nodes:
+                accepted = results[name]
+                outcomes[name] = {(accepted, 0 if accepted or self.statement_counts[name] < 2 else 1)}
+            else:
+                outcomes[name] = self.possibleOutcomes(name, value)
+        return outcomes
+
+    def _evaluationResult(self, name, results, adf=None):
+        if results is not None and name in results:
+            return results[name]
+        adf = adf if adf is not None else self.adf
+        return bool(adf.nodes[name].evaluateResults(adf))
+
+
+def evaluation_order(non_leaf):
+    """
+    returns the non-leaf nodes in the order evaluateTree evaluates them
+
+    Each pass evaluates the first node whose non-leaf children are done, while
+    EvaluationBLFs are evaluated as they are met and Decide is left until last.
+
+    Parameters
+    ----------
+    non_leaf : dict
+        node name -> node, as built by nonLeafGen
+    """
+    pending = dict(non_leaf)
+    order = []
+    while pending:
+        progressed = False
+        for name, node in list(pending.items()):
+            if name == 'Decide' and len(pending) != 1:
+                continue
+            if hasattr(node, 'evaluateResults'):
+                del pending[name]
+                order.append(name)
+                progressed = True
+                continue
+            if all(child not in pending for child in node.children):
+                del pending[name]
+                order.append(name)
+                progressed = True
+                break
+        if not progressed:
+            raise ValueError(f"The acceptance conditions of {', '.join(pending)} depend on each other in a cycle")
+    return order
+
+
+def strongly_connected_components(children):
+    """
+    returns the strongly connected components of a graph by Tarjan's algorithm
+
+    The search is iterative, so deep models cannot exhaust the recursion limit.
+    A component is emitted once everything it reaches has been, so the nodes a
+    component reads are always in earlier components.
+
+    Parameters
+    ----------
+    children : dict
+        node name -> the names it has edges to; names which are not keys have no edges
+
+    Returns
+    -------
+    list: the components, each a list of node names
+    """
+    index = {}
+    low = {}
+    stack = []
+    on_stack = set()
+    components = []
+
+    def visit(name):
+        index[name] = low[name] = len(index)
+        stack.append(name)
+        on_stack.add(name)
+        return (name, iter(children.get(name) or ()))
+
+    for root in children:
+        if root in index:
+            continue
+        work = [visit(root)]
+        while work:
+            name, remaining = work[-1]
+            descended = False
+            for child in remaining:
+                if child not in index:
+                    work.append(visit(child))
+                    descended = True
+                    break
+                if child in on_stack:
+                    low[name] = min(low[name], index[child])
+            if descended:
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[name])
+            if low[name] == index[name]:
+                #the node is the root of a component, which is everything above it on the stack
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == name:
+                        break
+                components.append(component[::-1])
+    return components
+
+
+def cyclic_components(children):
+    """
+    returns the strongly connected components which contain a cycle, i.e. those of
+    more than one node or of a node which reads itself
+    """
+    return [component for component in strongly_connected_components(children)
+            if len(component) > 1 or component[0] in (children.get(component[0]) or ())]
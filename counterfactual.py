@@ -0,0 +1,101 @@
+"""
+Counterfactual Analysis
+Finds the base-level factors whose addition or removal would change the outcome of a decided case
+"""
+
+from itertools import combinations
+
+from compiled_adf import CompiledADF
+
+
+def counterfactual_flips(adf, case, target=None, pairs=True, compiled=None):
+    """
+    finds every single factor whose addition or removal changes the outcome of a node,
+    and the minimal pairs which do when no single factor does
+
+    The case is evaluated once. Each flip is then propagated from that
+    evaluation through the parents of the factor only, and each pair builds on
+    the propagation of its first factor, so a sweep costs a fraction of one
+    evaluateTree per factor. Only factors below the target are tried, since no
+    other factor can reach it. Questions and dependencies are not checked, so a
+    flip may describe a case the CLI would not have asked for.
+
+    Parameters
+    ----------
+    adf : ADF
+        the ADF, whose facts decide any EvaluationBLFs
+    case : list
+        the factors of the decided case, which is not changed
+    target : str, optional
+        the node whose outcome is watched, by default the root evaluated last
+    pairs : bool, default True
+        whether to look for pairs of factors when no single factor changes the outcome
+    compiled : CompiledADF, optional
+        the compiled ADF, to reuse it across calls
+
+    Returns
+    -------
+    dict: 'target'; its 'outcome' as (accepted, statement index) and 'statement';
+    'flips', one for each factor changing the outcome with the 'factors', each
+    'added' or 'removed', and the new 'outcome' and 'statement'; and 'pairs' in
+    the same form, empty if a single factor is enough
+    """
+    compiled = compiled if compiled is not None else CompiledADF(adf)
+    target = target if target is not None else compiled.order[-1]
+    if target not in compiled.conditions:
+        raise ValueError(f"{target} is not an abstract factor of {adf.name}")
+
+    present = set(case)
+    values = compiled.evaluate(present)
+    outcome = values[target]
+    candidates = relevant_factors(compiled, target)
+
+    def flip(factors, changed):
+        new_outcome = changed.get(target, outcome)
+        return {
+            'factors': {factor: 'removed' if factor in present else 'added' for factor in factors},
+            'outcome': new_outcome,
+            'statement': compiled.statement(target, new_outcome)
+        }
+
+    singles = {}
+    flips = []
+    for factor in candidates:
+        singles[factor] = compiled.propagate(present, values, [factor])
+        if target in singles[factor]:
+            flips.append(flip([factor], singles[factor]))
+
+    found_pairs = []
+    if pairs and not flips:
+        for first, second in combinations(candidates, 2):
+            changed = compiled.propagate(present, values, [second], singles[first], flipped=[first])
+            if target in changed:
+                found_pairs.append(flip([first, second], changed))
+
+    return {
+        'target': target,
+        'outcome': outcome,
+        'statement': compiled.statement(target, outcome),
+        'flips': flips,
+        'pairs': found_pairs
+    }
+
+
+def relevant_factors(compiled, target):
+    """
+    returns the factors below a node which are not themselves evaluated, in the order first met
+    """
+    factors = {}
+    stack = [target]
+    seen = set()
+    while stack:
+        name = stack.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        if name in compiled.conditions:
+            stack.extend(reversed(compiled.adf.nodes[name].children))
+        elif name not in compiled.evaluation_nodes:
+            factors[name] = None
+    return list(factors)
+
@@ -0,0 +1,128 @@
+"""
+DOT Writer
+Streams Graphviz DOT statements straight to a file or pipe without building a pydot graph
+"""
+
+from contextlib import contextmanager
+
+
+class DotWriter:
+    """
+    Writes a DOT graph statement by statement
+
+    Every statement is written as soon as it is made, so memory use does not
+    grow with the size of the graph and the output can be piped straight into
+    Graphviz while it is still being produced.
+
+    Attributes
+    ----------
+    out : file-like
+        where the DOT is written, anything with a write() method
+    name : str
+        the name of the graph
+    graph_type : str, default 'graph'
+        'graph' or 'digraph'
+
+    Methods
+    -------
+    attributes(**attrs)
+        sets attributes of the current graph or cluster
+    node(name, **attrs)
+        writes a node
+    edge(source, target, **attrs)
+        writes an edge
+    cluster(name, **attrs)
+        context manager writing the statements made inside it to a subgraph
+    rank(names, rank='same')
+        writes a rank constraint for a group of nodes
+    close()
+        closes the graph
+    """
+
+    def __init__(self, out, name, graph_type='graph', **attrs):
+        self.out = out
+        self.name = name
+        self.graph_type = graph_type
+        self._edge_op = '->' if graph_type == 'digraph' else '--'
+        self._depth = 1
+        self._closed = False
+
+        self.out.write(f'{graph_type} {quote(name)} {{\n')
+        self.attributes(**attrs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def attributes(self, **attrs):
+        """
+        sets attributes of the current graph or cluster
+        """
+        for key, value in attrs.items():
+            self._write(f'{key}={quote(value)};')
+
+    def node(self, name, **attrs):
+        """
+        writes a node, with any attributes given as keywords
+        """
+        self._write(f'{quote(name)}{formatAttributes(attrs)};')
+
+    def edge(self, source, target, **attrs):
+        """
+        writes an edge between two nodes, with any attributes given as keywords
+        """
+        self._write(f'{quote(source)} {self._edge_op} {quote(target)}{formatAttributes(attrs)};')
+
+    @contextmanager
+    def cluster(self, name, **attrs):
+        """
+        writes the statements made inside the context to a subgraph
+
+        Graphviz only draws a box around subgraphs whose name starts with 'cluster'
+        """
+        self._write(f'subgraph {quote(name)} {{')
+        self._depth += 1
+        self.attributes(**attrs)
+        try:
+            yield self
+        finally:
+            self._depth -= 1
+            self._write('}')
+
+    def rank(self, names, rank='same'):
+        """
+        writes a rank constraint so the nodes are laid out on the same level
+        """
+        names = list(names)
+        if names:
+            self._write(f'{{rank={rank}; ' + ' '.join(f'{quote(name)};' for name in names) + '}')
+
+    def close(self):
+        """
+        closes the graph, leaving the output open
+        """
+        if not self._closed:
+            self.out.write('}\n')
+            self._closed = True
+
+    def _write(self, statement):
+        self.out.write('\t' * self._depth + statement + '\n')
+
+
+def quote(value):
+    """
+    returns a value as a quoted DOT identifier
+    """
+    return '"' + str(value).replace('"', '\\"') + '"'
+
+
+def formatAttributes(attrs):
+    """
+    returns the attribute list of a node or edge statement
+    """
+    if not attrs:
+        return ''
+    return ' [' + ', '.join(f'{key}={quote(value)}' for key, value in attrs.items()) + ']'
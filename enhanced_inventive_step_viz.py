@@ -8,6 +8,7 @@ import sys
 import os
 from MainClasses import *
 import inventive_step_ADM
+from render_pipeline import render
 
 def create_enhanced_inventive_step_visualization():
     """
@@ -68,7 +69,7 @@ def create_enhanced_inventive_step_visualization():
                 node.set_fillcolor('lightgreen')
                 node.set_style('filled')
                 node.set_penwidth('2')
-            elif hasattr(node_obj, 'sub_adf_creator'):
+            elif adf.nodeTable()[node_name]['kind'] == 'sub_adm':
                 # Sub-ADM BLF - orange/red
                 node.set_color('darkred')
                 node.set_fillcolor('orange')
@@ -104,8 +105,9 @@ def create_enhanced_inventive_step_visualization():
     node_to_sub_model = {}
     
     # Find sub-ADM creators
+    node_table = adf.nodeTable()
     for node_name, node in adf.nodes.items():
-        if hasattr(node, 'sub_adf_creator'):
+        if node_table[node_name]['kind'] == 'sub_adm':
             sub_adm_key = str(node.sub_adf_creator)
             if sub_adm_key not in sub_adm_mapping:
                 sub_adm_count += 1
@@ -238,20 +240,11 @@ def main():
     # Create the enhanced visualization
     graph = create_enhanced_inventive_step_visualization()
     
-    # Save as high-quality PNG
-    png_filename = "Inventive_Step_Enhanced.png"
-    graph.write_png(png_filename)
-    print(f"✓ Saved PNG: {png_filename}")
-    
-    # Save as SVG for vector graphics
-    svg_filename = "Inventive_Step_Enhanced.svg"
-    graph.write_svg(svg_filename)
-    print(f"✓ Saved SVG: {svg_filename}")
-    
-    # Save as PDF for publication
-    pdf_filename = "Inventive_Step_Enhanced.pdf"
-    graph.write_pdf(pdf_filename)
-    print(f"✓ Saved PDF: {pdf_filename}")
+    # Save as high-quality PNG, SVG for vector graphics and PDF for publication from a single layout
+    if render(graph, "Inventive_Step_Enhanced", ('png', 'svg', 'pdf')):
+        print("✓ Saved PNG, SVG and PDF: Inventive_Step_Enhanced.png/svg/pdf")
+    else:
+        print("✓ Unchanged, skipped: Inventive_Step_Enhanced")
     
     print("\n" + "=" * 60)
     print("✅ Enhanced visualization generated successfully!")
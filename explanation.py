@@ -0,0 +1,146 @@
+"""
+Explanation
+Finds a minimal set of the case's factors which on its own entails an outcome,
+as a short alternative to the full list of statements from evaluateTree
+"""
+
+from compiled_adf import CompiledADF
+from counterfactual import relevant_factors
+
+
+def explain(adf, case, target=None, compiled=None):
+    """
+    finds a subset-minimal set of factors of the case which on its own decides the outcome of a node
+
+    A factor is either present in the case or absent from it. Every other
+    factor is treated as unknown and the nodes are evaluated in three-valued
+    logic, so the factors kept decide the outcome whatever the unknown ones are.
+    Factors are dropped one at a time while the outcome stays decided, absent
+    ones first, which leaves a set no factor can be removed from.
+
+    Parameters
+    ----------
+    adf : ADF
+        the ADF, whose facts decide any EvaluationBLFs
+    case : list
+        the factors of the decided case, which is not changed
+    target : str, optional
+        the node to explain, by default the root evaluated last
+    compiled : CompiledADF, optional
+        the compiled ADF, to reuse it across calls
+
+    Returns
+    -------
+    dict: the 'target', its 'outcome' as (accepted, statement index) and
+    'statement', the 'present' and 'absent' factors of the explanation, and the
+    'statements' of the nodes those factors alone decide, in evaluation order
+    """
+    compiled = compiled if compiled is not None else CompiledADF(adf)
+    target, values, results = _evaluate(adf, compiled, case, target)
+    outcome = values[target]
+
+    present, absent, decided = _minimise(compiled, case, target, results,
+                                         lambda outcomes: outcomes == {outcome})
+    return {
+        'target': target,
+        'outcome': outcome,
+        'statement': compiled.statement(target, outcome),
+        'present': present,
+        'absent': absent,
+        'statements': decided
+    }
+
+
+def why_not(adf, case, alternative=None, target=None, compiled=None):
+    """
+    finds a subset-minimal set of factors of the case which on its own rules out an alternative outcome
+
+    Parameters
+    ----------
+    adf : ADF
+        the ADF, whose facts decide any EvaluationBLFs
+    case : list
+        the factors of the decided case, which is not changed
+    alternative : int, optional
+        the index of the statement which was not given, by default any outcome
+        with the opposite acceptance to the actual one
+    target : str, optional
+        the node to explain, by default the root evaluated last
+    compiled : CompiledADF, optional
+        the compiled ADF, to reuse it across calls
+
+    Returns
+    -------
+    dict: as explain, with the 'alternative' ruled out, 'accepted', 'rejected' or its statement
+    """
+    compiled = compiled if compiled is not None else CompiledADF(adf)
+    target, values, results = _evaluate(adf, compiled, case, target)
+    outcome = values[target]
+
+    if alternative is None:
+        excluded = lambda candidate: candidate[0] != outcome[0]
+        label = 'rejected' if outcome[0] else 'accepted'
+    else:
+        excluded = lambda candidate: candidate[1] == alternative
+        label = compiled.statement(target, (None, alternative))
+    if excluded(outcome):
+        raise ValueError(f"The alternative is the outcome of {target} for this case")
+
+    present, absent, decided = _minimise(compiled, case, target, results,
+                                         lambda outcomes: not any(excluded(candidate) for candidate in outcomes))
+    return {
+        'target': target,
+        'outcome': outcome,
+        'statement': compiled.statement(target, outcome),
+        'alternative': label,
+        'present': present,
+        'absent': absent,
+        'statements': decided
+    }
+
+
+def _evaluate(adf, compiled, case, target):
+    target = target if target is not None else compiled.order[-1]
+    if target not in compiled.conditions:
+        raise ValueError(f"{target} is not an abstract factor of {compiled.adf.name}")
+    #the plan may be shared with other views of the model, so the EvaluationBLFs read this ADF's facts
+    results = {name: compiled._evaluationResult(name, None, adf) for name in compiled.evaluation_nodes}
+    values = compiled.evaluate(case, results)
+    return target, values, results
+
+
+def _minimise(compiled, case, target, results, entailed):
+    """
+    drops factors while the remaining ones still entail the outcome
+
+    Returns
+    -------
+    list: the present factors kept
+    list: the absent factors kept
+    list: the statements of the nodes decided by the factors kept
+    """
+    given = set(case)
+    names = compiled.closure(target)
+    factors = relevant_factors(compiled, target)
+
+    #abstract factors given in the case may be dropped, the others are only present if accepted
+    known = {name: name in given for name in names}
+    known.update({factor: factor in given for factor in factors})
+    candidates = [factor for factor in factors if factor not in given] + \
+                 [factor for factor in factors if factor in given] + \
+                 [name for name in names if name in given]
+
+    for name in candidates:
+        trial = dict(known)
+        del trial[name]
+        if entailed(compiled.evaluateKleene(trial, results, names)[target]):
+            known = trial
+
+    outcomes = compiled.evaluateKleene(known, results, names)
+    decided = [compiled.statement(name, next(iter(possible)))
+               for name, possible in outcomes.items() if len(possible) == 1]
+
+    kept = [name for name in candidates if name in known]
+    present = [name for name in kept if name in given]
+    absent = [name for name in kept if name not in given]
+    return present, absent, [statement for statement in decided if statement is not None]
@@ -0,0 +1,215 @@
+"""
+Goal Solver
+Works backwards from an outcome of a node to the minimal sets of base-level factors which achieve it
+"""
+
+from compiled_adf import CompiledADF
+from counterfactual import relevant_factors
+
+#the term of no factors, which every case satisfies
+EMPTY = frozenset()
+
+
+class GoalSolver:
+    """
+    Finds the sets of base-level factors which achieve an outcome of a node
+
+    A goal is a node being present or absent, or giving a statement. Each goal
+    is solved as a list of terms, a term being a frozenset of (factor, present)
+    pairs which achieves the goal whatever the other factors are. A goal on an
+    abstract factor is solved from the goals on its children, which are
+    memoised, so a node shared by several conditions is only solved once for
+    each value. Terms needing a factor both present and absent are dropped, so a
+    condition whose reject flag must hold for it to be met, or whose earlier
+    conditions cannot all fail, is pruned without being expanded further.
+
+    Attributes
+    ----------
+    compiled : CompiledADF
+        the compiled ADF
+    fixed : dict
+        base-level factor -> whether it is present, for factors already decided
+    limit : int, optional
+        the most factors a term may need present, to keep large models interactive
+
+    Methods
+    -------
+    solve(target, accepted=True, statement=None)
+        returns the minimal terms achieving an outcome of a node
+    outcomes(name)
+        returns the terms of every outcome of an abstract factor
+    """
+
+    def __init__(self, compiled, fixed=None, limit=None):
+        self.compiled = compiled
+        if fixed is not None and not isinstance(fixed, dict):
+            fixed = {factor: True for factor in fixed}
+        self.fixed = fixed or {}
+        self.limit = limit
+        self._outcomes = {}
+
+    def solve(self, target, accepted=True, statement=None):
+        """
+        returns the minimal terms achieving an outcome of a node
+
+        Parameters
+        ----------
+        target : str
+            the abstract factor
+        accepted : bool, default True
+            whether the node should be accepted
+        statement : int, optional
+            the index of the statement the node should give, instead of accepted
+        """
+        if target not in self.compiled.conditions:
+            raise ValueError(f"{target} is not an abstract factor of {self.compiled.adf.name}")
+        outcomes = self.outcomes(target)
+        if statement is not None:
+            return outcomes['statements'].get(statement, [])
+        return outcomes['accepted' if accepted else 'rejected']
+
+    def outcomes(self, name):
+        """
+        returns the terms of an abstract factor being accepted and rejected and of each statement index
+
+        Returns
+        -------
+        dict: 'accepted', 'rejected' and 'statements', statement index -> terms
+        """
+        if name in self._outcomes:
+            return self._outcomes[name]
+
+        accepted = []
+        rejected = []
+        statements = {}
+        #the terms under which none of the conditions so far hold
+        none = [EMPTY]
+        reject = None
+        conditions = self.compiled.conditions[name]
+        for index, (expression, reject) in enumerate(conditions):
+            first = self._product(none, self.expression(expression, True))
+            if first:
+                statements[index] = self._union(statements.get(index, []), first)
+                if reject is None:
+                    accepted = self._union(accepted, first)
+                else:
+                    accepted = self._union(accepted, self._product(first, self.expression(reject, False)))
+                    rejected = self._union(rejected, self._product(first, self.expression(reject, True)))
+            none = self._product(none, self.expression(expression, False))
+            if not none:
+                #a later condition can never be the first to hold
+                break
+
+        if none:
+            last = len(conditions) - 1
+            rejection = self.compiled.statement_counts[name] - 1
+            rejected = self._union(rejected, none)
+            if reject is not None and last >= 0:
+                statements[last] = self._union(statements.get(last, []), self._product(none, self.expression(reject, True)))
+                none = self._product(none, self.expression(reject, False))
+            statements[rejection] = self._union(statements.get(rejection, []), none)
+
+        self._outcomes[name] = {
+            'accepted': accepted,
+            'rejected': rejected,
+            'statements': {index: terms for index, terms in sorted(statements.items()) if terms}
+        }
+        return self._outcomes[name]
+
+    def expression(self, expression, value):
+        """
+        returns the terms under which an expression tree has a value
+        """
+        op = expression[0]
+        if op == 'var':
+            return self._literal(expression[1], value)
+        if op == 'const':
+            return [EMPTY] if expression[1] == value else []
+        if op == 'not':
+            return self.expression(expression[1], not value)
+        operand1 = self.expression(expression[1], value)
+        #an and which must hold, or an or which must fail, needs both operands
+        if (op == 'and') == value:
+            if not operand1:
+                return []
+            return self._product(operand1, self.expression(expression[2], value))
+        return self._union(operand1, self.expression(expression[2], value))
+
+    def _literal(self, name, value):
+        if name in self.compiled.conditions:
+            return self.outcomes(name)['accepted' if value else 'rejected']
+        if name in self.fixed:
+            return [EMPTY] if self.fixed[name] == value else []
+        return [frozenset([(name, value)])]
+
+    def _product(self, terms1, terms2):
+        terms = []
+        for term1 in terms1:
+            for term2 in terms2:
+                term = term1 | term2
+                if self.limit is not None and sum(present for _, present in term) > self.limit:
+                    continue
+                #a factor needed both present and absent
+                if len({factor for factor, _ in term}) < len(term):
+                    continue
+                terms.append(term)
+        return _minimal(terms)
+
+    def _union(self, terms1, terms2):
+        return _minimal(terms1 + terms2)
+
+
+def _minimal(terms):
+    """
+    returns the terms which do not contain another, so no term has a factor it does not need
+    """
+    kept = []
+    for term in sorted(set(terms), key=len):
+        if not any(other <= term for other in kept):
+            kept.append(term)
+    return kept
+
+
+def solve(adf, target=None, accepted=True, statement=None, fixed=None, limit=None, compiled=None):
+    """
+    finds the minimal sets of base-level factors which achieve an outcome of a node
+
+    e.g. solve(adf, 'InvStep') or solve(adf, 'Decide', statement=1)
+
+    Parameters
+    ----------
+    adf : ADF
+        the ADF
+    target : str, optional
+        the node, by default the root evaluated last
+    accepted : bool, default True
+        whether the node should be accepted
+    statement : int, optional
+        the index of the statement the node should give, instead of accepted
+    fixed : dict or list, optional
+        base-level factor -> whether it is present, or a list of factors which are
+        present, for factors already decided; no term mentions them
+    limit : int, optional
+        only find sets needing at most this many factors present
+    compiled : CompiledADF, optional
+        the compiled ADF, to reuse it
+
+    Returns
+    -------
+    list: from the fewest factors present, a dict per set with the factors which must be
+    'present' and those which must be 'absent'. Any case with those factors
+    present and absent achieves the outcome, whatever its other factors.
+    EvaluationBLFs are taken as factors, since they come from sub-ADM facts
+    """
+    compiled = compiled if compiled is not None else CompiledADF(adf)
+    target = target if target is not None else compiled.order[-1]
+    terms = GoalSolver(compiled, fixed, limit).solve(target, accepted, statement)
+
+    position = {factor: i for i, factor in enumerate(relevant_factors(compiled, target))}
+
+    def ordered(term, value):
+        return sorted((factor for factor, present in term if present == value),
+                      key=lambda factor: (position.get(factor, len(position)), factor))
+
+    terms = sorted(terms, key=lambda term: (len(ordered(term, True)), len(term), ordered(term, True), ordered(term, False)))
+    return [{'present': ordered(term, True), 'absent': ordered(term, False)} for term in terms]
@@ -0,0 +1,126 @@
+"""
+Grounded Evaluation
+Evaluates ADFs whose acceptance conditions may depend on each other in cycles, under grounded semantics
+"""
+
+from collections import deque
+
+from bdd import BDD, FALSE, _outcomes
+from compiled_adf import CompiledADF, cyclic_components, expression_variables, strongly_connected_components
+
+
+class GroundedADF(CompiledADF):
+    """
+    A compiled ADF which also evaluates cyclic graphs, giving the grounded interpretation
+
+    The non-leaf nodes are split into strongly connected components, which are
+    evaluated children first. Within a component every node starts undecided.
+    Each outcome of a node is compiled into a BDD over the nodes it reads, so
+    the outcomes it may still have are exactly those some two-valued completion
+    of the undecided nodes gives, rather than the over-approximation of
+    evaluating operands independently in three-valued logic; e.g. 'a or not a'
+    is accepted with a undecided. A node is decided once every outcome it may
+    still have accepts it, or every one rejects it. A node is only evaluated
+    again when a node of its component it reads becomes decided, and a decided
+    node never changes, so the worklist empties after each node has been
+    revisited at most once per input. Nodes still undecided then stay
+    undecided, which is the least fixed point of the grounded operator. On an
+    acyclic ADF every node is decided and the outcomes are those of evaluate.
+
+    Attributes
+    ----------
+    components : list
+        the strongly connected components of the non-leaf nodes, in evaluation order
+    cycles : list
+        the components containing a cycle
+    bdd : BDD
+        the manager holding the diagrams of the outcomes
+    diagrams : dict
+        node name -> list of ((accepted, statement index), diagram), one per outcome the node can give
+
+    Methods
+    -------
+    evaluate(case, results=None)
+        returns the grounded outcome of every non-leaf node
+    """
+
+    def __init__(self, adf):
+        super().__init__(adf)
+        variables = set()
+        for conditions in self.conditions.values():
+            for expression, reject in conditions:
+                variables |= expression_variables(expression)
+                if reject is not None:
+                    variables |= expression_variables(reject)
+        self.bdd = BDD(sorted(variables))
+        self.diagrams = {}
+        for name in self.conditions:
+            accepted, statements = _outcomes(self.bdd, self, name, self.bdd.expression)
+            rejected = self.bdd.negate(accepted)
+            diagrams = [((True, index), self.bdd.conjoin(u, accepted)) for index, u in statements.items()]
+            diagrams += [((False, index), self.bdd.conjoin(u, rejected)) for index, u in statements.items()]
+            self.diagrams[name] = [(outcome, u) for outcome, u in diagrams if u != FALSE]
+
+    def _evaluationOrder(self, non_leaf):
+        graph = {name: [child for child in (node.children or []) if child in non_leaf]
+                 for name, node in non_leaf.items()}
+        self.components = strongly_connected_components(graph)
+        self.cycles = cyclic_components(graph)
+        return [name for component in self.components for name in component]
+
+    def evaluate(self, case, results=None):
+        """
+        evaluates every non-leaf node for a case under grounded semantics
+
+        Parameters
+        ----------
+        case : iterable
+            the factors of the case, which is not changed
+        results : dict, optional
+            EvaluationBLF name -> its result, by default from evaluateResults on the ADF's facts
+
+        Returns
+        -------
+        dict: node name -> (accepted, statement index), in evaluation order. A node
+        left undecided by a cycle has accepted None, and an index of None when
+        more than one statement is still possible
+        """
+        present = set(case)
+        status = {}
+        values = {}
+
+        def value(name):
+            if name in present:
+                return True
+            if name in status:
+                return status[name]
+            #a leaf not in the case is absent
+            return None if name in self._position else False
+
+        for component in self.components:
+            members = set(component)
+            for name in component:
+                status[name] = None
+            pending = deque(component)
+            queued = set(component)
+            while pending:
+                name = pending.popleft()
+                queued.discard(name)
+                if name in self.evaluation_nodes:
+                    accepted = self._evaluationResult(name, results)
+                    outcomes = {(accepted, 0 if accepted or self.statement_counts[name] < 2 else 1)}
+                else:
+                    outcomes = {outcome for outcome, u in self.diagrams[name] if self.bdd.possible(u, value)}
+                accepted = {outcome[0] for outcome in outcomes}
+                indices = {outcome[1] for outcome in outcomes}
+                values[name] = (accepted.pop() if len(accepted) == 1 else None,
+                                indices.pop() if len(indices) == 1 else None)
+                if values[name][0] is not None and status[name] is None:
+                    status[name] = values[name][0]
+                    #only the nodes of this component can be waiting on it
+                    for parent in self.parents.get(name, []):
+                        if parent in members and parent not in queued:
+                            queued.add(parent)
+                            pending.append(parent)
+
+        return {name: values[name] for name in self.order}
@@ -0,0 +1,159 @@
+"""
+Layout Cache
+Lays out the graph of an ADF once per model version so case-coloured renders only restyle it
+"""
+
+import io
+import json
+import os
+import subprocess
+
+from dot_writer import DotWriter
+
+
+class LayoutCache:
+    """
+    A disk cache of Graphviz layouts keyed by the structural hash of an ADF
+
+    The layout (graph bounding box, node positions and sizes, edge splines and
+    label positions) is computed once with Graphviz's JSON output. A case is
+    then rendered by writing the case-coloured graph with those positions fixed
+    and handing it to neato -n2, which draws the given positions without
+    running layout again.
+
+    Attributes
+    ----------
+    directory : str
+        where layouts are stored, one JSON file per model version
+    program : str, default 'dot'
+        the Graphviz program used for the layout
+
+    Methods
+    -------
+    layout(adf)
+        returns the cached layout of an ADF, computing it if needed
+    writeCaseDot(adf, out, case=None)
+        writes the DOT of a case with the cached layout fixed
+    render(adf, output_base, case=None, formats=('png',))
+        renders a case from the cached layout
+    """
+
+    def __init__(self, directory='.layout_cache', program='dot'):
+        self.directory = directory
+        self.program = program
+        self._layouts = {}
+
+    def path(self, adf):
+        """
+        returns the file the layout of an ADF is cached in
+        """
+        return os.path.join(self.directory, f"{adf.structuralHash()}-{self.program}.json")
+
+    def layout(self, adf):
+        """
+        returns the layout of an ADF, from memory, disk or a new Graphviz run
+
+        Returns
+        -------
+        dict: 'bb', 'nodes' (name -> pos, width, height) and 'edges' (pos and lp,
+        in the order the edges are written by writeDot)
+        """
+        path = self.path(adf)
+        if path in self._layouts:
+            return self._layouts[path]
+
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                layout = json.load(f)
+        else:
+            source = io.StringIO()
+            adf.writeDot(source)
+            result = subprocess.run([self.program, '-Tjson'], input=source.getvalue(),
+                                    capture_output=True, text=True)
+            if result.returncode != 0:
+                raise RuntimeError(f"{self.program} failed laying out {adf.name}: {result.stderr.strip()}")
+            layout = parseLayout(json.loads(result.stdout))
+
+            os.makedirs(self.directory, exist_ok=True)
+            #written to a temporary file first so a half written layout is never read
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(layout, f)
+            os.replace(path + '.tmp', path)
+
+        self._layouts[path] = layout
+        return layout
+
+    def writeCaseDot(self, adf, out, case=None):
+        """
+        writes the DOT of the ADF coloured for a case, with every position taken from the cached layout
+
+        Parameters
+        ----------
+        adf : ADF
+            the ADF to draw
+        out : file-like
+            where the DOT is written
+        case : list, optional
+            the list of factors constituting the case
+        """
+        layout = self.layout(adf)
+        nodes = layout['nodes']
+        edges = iter(layout['edges'])
+
+        with DotWriter(out, adf.name, bb=layout['bb'], splines='true') as writer:
+            for kind, key, attrs in adf._graphElements(case):
+                if kind == 'node':
+                    writer.node(key, **attrs, **nodes.get(key, {}))
+                else:
+                    writer.edge(*key, **attrs, **next(edges, {}))
+
+    def render(self, adf, output_base, case=None, formats=('png',)):
+        """
+        renders a case by restyling the cached layout
+
+        Parameters
+        ----------
+        adf : ADF
+            the ADF to draw
+        output_base : str
+            the output filename without extension
+        case : list, optional
+            the list of factors constituting the case
+        formats : tuple, default ('png',)
+            the Graphviz output formats
+        """
+        source = io.StringIO()
+        self.writeCaseDot(adf, source, case)
+
+        #neato -n2 keeps the given positions (in points) and splines instead of laying out again
+        command = ['neato', '-n2']
+        for fmt in formats:
+            command += [f'-T{fmt}', '-o', f"{output_base}.{fmt}"]
+
+        result = subprocess.run(command, input=source.getvalue(), capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"neato failed rendering {output_base}: {result.stderr.strip()}")
+
+
+def parseLayout(graph):
+    """
+    extracts the positions from Graphviz JSON output
+
+    Parameters
+    ----------
+    graph : dict
+        the output of Graphviz -Tjson
+    """
+    nodes = {}
+    for obj in graph.get('objects', []):
+        #subgraphs (rank groups) have no position, nodes do
+        if 'pos' not in obj:
+            continue
+        nodes[obj['name']] = {key: obj[key] for key in ('pos', 'width', 'height') if key in obj}
+
+    #edges are numbered in the order they were written
+    edges = []
+    for edge in sorted(graph.get('edges', []), key=lambda edge: edge['_gvid']):
+        edges.append({key: edge[key] for key in ('pos', 'lp') if key in edge})
+
+    return {'bb': graph.get('bb', ''), 'nodes': nodes, 'edges': edges}
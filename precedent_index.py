@@ -0,0 +1,235 @@
+"""
+Precedent Index
+Finds the stored cases closest to a new case, comparing cases as bitsets of their factors
+"""
+
+import ast
+import heapq
+import os
+
+from compiled_adf import CompiledADF, popcount
+from counterfactual import relevant_factors
+
+
+class PrecedentIndex:
+    """
+    A case base answering k-nearest-neighbour queries by Hamming or weighted distance
+
+    Each case is a Python int with one bit per factor, so the distance between
+    two cases is the popcount of their XOR, counted without a loop over the factors.
+    Identical cases are stored once and the distinct cases are blocked by how
+    many factors they have: two cases whose factor counts differ by d are at
+    least d apart, so the blocks are searched outwards from the query's count
+    and the search stops once no block left can beat the k found so far.
+
+    Attributes
+    ----------
+    adf : ADF, optional
+        the ADF the cases come from, needed to restrict queries to the factors
+        below an abstract factor
+    factors : dict
+        factor -> its bit
+    names : list
+        the name of each stored case
+    outcomes : list
+        the outcome of each stored case, None if not known
+
+    Methods
+    -------
+    add(name, case, outcome=None)
+        stores a case
+    addCases(cases)
+        stores a dict of name -> case, such as WildAnimals.cases()
+    encode(case)
+        returns the bitset of a case
+    nearest(case, k=5, target=None, weights=None)
+        returns the k stored cases closest to a case
+    """
+
+    def __init__(self, adf=None):
+        self.adf = adf
+        self.factors = {}
+        self.names = []
+        self.outcomes = []
+        self._bits = []
+        #distinct bitset -> the ids of the cases with it
+        self._distinct = {}
+        #mask -> factor count -> distinct bitsets, built when first queried with that mask
+        self._blocks = {}
+        self._compiled = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name, case, outcome=None):
+        """
+        stores a case
+
+        Parameters
+        ----------
+        name : str
+            the name of the case, e.g. the decision it comes from
+        case : list
+            the factors of the case
+        outcome : optional
+            the outcome of the case, returned with it by nearest()
+        """
+        for factor in case:
+            if factor not in self.factors:
+                self.factors[factor] = 1 << len(self.factors)
+        bits = self.encode(case)
+
+        case_id = len(self.names)
+        self.names.append(name)
+        self.outcomes.append(outcome)
+        self._bits.append(bits)
+        if bits not in self._distinct:
+            self._distinct[bits] = []
+            #a new distinct case changes every block
+            self._blocks = {}
+        self._distinct[bits].append(case_id)
+        return case_id
+
+    def addCases(self, cases, outcomes=None):
+        """
+        stores a dict of name -> case, with an optional dict of name -> outcome
+        """
+        for name, case in cases.items():
+            self.add(name, case, (outcomes or {}).get(name))
+
+    def encode(self, case):
+        """
+        returns the bitset of a case, ignoring factors no stored case has
+        """
+        bits = 0
+        for factor in case:
+            bits |= self.factors.get(factor, 0)
+        return bits
+
+    def mask(self, target=None):
+        """
+        returns the bits of the factors below an abstract factor, or of every factor
+        """
+        if target is None:
+            return (1 << len(self.factors)) - 1
+        if self.adf is None:
+            raise ValueError("The index needs the ADF to restrict a query to an abstract factor")
+        if self._compiled is None:
+            self._compiled = CompiledADF(self.adf)
+        return self.encode(relevant_factors(self._compiled, target))
+
+    def nearest(self, case, k=5, target=None, weights=None):
+        """
+        returns the k stored cases closest to a case
+
+        Parameters
+        ----------
+        case : list
+            the factors of the new case
+        k : int, default 5
+            the number of cases to return, of equally close cases the earliest stored
+        target : str, optional
+            only compare the factors below this abstract factor
+        weights : dict, optional
+            factor -> the cost of the cases differing on it, by default 1 for every factor
+
+        Returns
+        -------
+        list: (distance, name, outcome) from closest to furthest
+        """
+        mask = self.mask(target)
+        query = self.encode(case) & mask
+        query_count = popcount(query)
+        distance, floor = self._distance(mask, weights)
+
+        blocks = self._maskedBlocks(mask)
+        counts = sorted(blocks, key=lambda count: abs(count - query_count))
+
+        #the k closest cases so far as a heap whose top is the furthest, ties going to the earlier stored
+        best = []
+        for count in counts:
+            if len(best) >= k and abs(count - query_count) * floor > -best[0][0]:
+                break
+            for bits, ids in blocks[count]:
+                d = distance(query ^ bits)
+                if len(best) >= k and d > -best[0][0]:
+                    continue
+                for case_id in ids:
+                    item = (-d, -case_id)
+                    if len(best) < k:
+                        heapq.heappush(best, item)
+                    elif item > best[0]:
+                        heapq.heapreplace(best, item)
+
+        return [(-d, self.names[-case_id], self.outcomes[-case_id]) for d, case_id in sorted(best, reverse=True)]
+
+    def _maskedBlocks(self, mask):
+        """
+        returns factor count -> [(bitset, case ids)] of the stored cases restricted to a mask
+        """
+        if mask not in self._blocks:
+            merged = {}
+            for bits, ids in self._distinct.items():
+                merged.setdefault(bits & mask, []).extend(ids)
+            blocks = {}
+            for bits, ids in merged.items():
+                blocks.setdefault(popcount(bits), []).append((bits, ids))
+            self._blocks[mask] = blocks
+        return self._blocks[mask]
+
+    def _distance(self, mask, weights):
+        """
+        returns the distance of an XOR of two bitsets and the least a single differing factor costs
+        """
+        if weights is None:
+            return popcount, 1
+
+        #weights are summed a byte at a time from a table per byte of the bitset
+        weight = [0.0] * len(self.factors)
+        for factor, bit in self.factors.items():
+            if bit & mask:
+                weight[bit.bit_length() - 1] = weights.get(factor, 1)
+        tables = []
+        for start in range(0, len(weight), 8):
+            chunk = weight[start:start + 8]
+            tables.append([sum(w for i, w in enumerate(chunk) if byte >> i & 1) for byte in range(256)])
+
+        def distance(difference):
+            total = 0
+            for table in tables:
+                if not difference:
+                    break
+                total += table[difference & 0xFF]
+                difference >>= 8
+            return total
+
+        floor = min((w for i, w in enumerate(weight) if mask >> i & 1), default=0)
+        return distance, floor
+
+
+def load_transcripts(directory='eval'):
+    """
+    reads the case and outcome of every evaluation transcript in a directory
+
+    Returns
+    -------
+    dict: transcript name -> case
+    dict: transcript name -> the final statement of the main evaluation
+    """
+    cases = {}
+    outcomes = {}
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.txt'):
+            continue
+        name = filename[:-len('.txt')]
+        last_statement = None
+        with open(os.path.join(directory, filename), encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('Case:'):
+                    cases[name] = ast.literal_eval(line[len('Case:'):].strip())
+                    outcomes[name] = last_statement
+                    break
+                number, _, statement = line.partition('. ')
+                if number.strip().isdigit():
+                    last_statement = statement.strip()
+    return cases, outcomes
@@ -9,6 +9,29 @@ import os
 from MainClasses import *
 import academic_research_ADM
 import inventive_step_ADM
+from render_pipeline import render, render_all
+
+def create_publication_graph(adf, title="ADM Structure", include_sub_adms=True, layout_style="hierarchical"):
+    """
+    Create the graph of a publication-ready visualization without rendering it
+    
+    Parameters are as for create_publication_visualization
+    """
+    
+    if layout_style == "minimal":
+        # Use the existing minimal visualization but with improvements
+        graph = create_improved_minimal_visualization(adf, title, include_sub_adms)
+    elif layout_style == "hierarchical":
+        # Create a clean hierarchical layout
+        graph = create_hierarchical_visualization(adf, title, include_sub_adms)
+    else:
+        # Create a detailed visualization with labels
+        graph = create_detailed_visualization(adf, title, include_sub_adms)
+    
+    # Set high DPI for publication quality
+    graph.set_dpi(300)
+    
+    return graph
 
 def create_publication_visualization(adf, output_filename, title="ADM Structure", 
                                    include_sub_adms=True, layout_style="hierarchical"):
@@ -29,28 +52,13 @@ def create_publication_visualization(adf, output_filename, title="ADM Structure"
         Layout style: "hierarchical", "minimal", or "detailed"
     """
     
-    if layout_style == "minimal":
-        # Use the existing minimal visualization but with improvements
-        graph = create_improved_minimal_visualization(adf, title, include_sub_adms)
-    elif layout_style == "hierarchical":
-        # Create a clean hierarchical layout
-        graph = create_hierarchical_visualization(adf, title, include_sub_adms)
-    else:
-        # Create a detailed visualization with labels
-        graph = create_detailed_visualization(adf, title, include_sub_adms)
-    
-    # Set high DPI for publication quality
-    graph.set_dpi(300)
+    graph = create_publication_graph(adf, title, include_sub_adms, layout_style)
     
-    # Save as PNG
-    png_filename = f"{output_filename}.png"
-    graph.write_png(png_filename)
-    print(f"✓ Saved PNG: {png_filename}")
-    
-    # Save as SVG for vector graphics
-    svg_filename = f"{output_filename}.svg"
-    graph.write_svg(svg_filename)
-    print(f"✓ Saved SVG: {svg_filename}")
+    # Save as PNG, and as SVG for vector graphics, from a single layout
+    if render(graph, output_filename, ('png', 'svg')):
+        print(f"✓ Saved PNG and SVG: {output_filename}.png, {output_filename}.svg")
+    else:
+        print(f"✓ Unchanged, skipped: {output_filename}")
     
     return graph
 
@@ -106,7 +114,7 @@ def create_improved_minimal_visualization(adf, title, include_sub_adms=True):
                 node.set_color('darkgreen')
                 node.set_fillcolor('lightgreen')
                 node.set_style('filled')
-            elif hasattr(node_obj, 'sub_adf_creator'):
+            elif adf.nodeTable()[node_name]['kind'] == 'sub_adm':
                 # Sub-ADM BLF - orange
                 node.set_color('darkorange')
                 node.set_fillcolor('orange')
@@ -139,8 +147,9 @@ def create_improved_minimal_visualization(adf, title, include_sub_adms=True):
         node_to_sub_model = {}
         
         # Find sub-ADM creators
+        node_table = adf.nodeTable()
         for node_name, node in adf.nodes.items():
-            if hasattr(node, 'sub_adf_creator'):
+            if node_table[node_name]['kind'] == 'sub_adm':
                 sub_adm_key = str(node.sub_adf_creator)
                 if sub_adm_key not in sub_adm_mapping:
                     sub_adm_count += 1
@@ -288,10 +297,15 @@ def create_detailed_visualization(adf, title, include_sub_adms=True):
 def generate_all_visualizations():
     """
     Generate all types of visualizations for both ADMs
+    
+    The graphs are built first and then rendered in parallel, skipping any
+    whose DOT source is unchanged since the last run
     """
     print("Generating publication-ready visualizations...")
     print("=" * 60)
     
+    jobs = []
+    
     # Academic Research ADM
     print("\n📊 Academic Research ADM")
     print("-" * 30)
@@ -299,23 +313,14 @@ def generate_all_visualizations():
     try:
         academic_adf = academic_research_ADM.adf()
         
-        # Minimal visualization
-        create_publication_visualization(
-            academic_adf, 
-            "academic_research_minimal", 
-            "Academic Research ADM - Minimal View",
-            include_sub_adms=True,
-            layout_style="minimal"
-        )
-        
-        # Hierarchical visualization
-        create_publication_visualization(
-            academic_adf, 
-            "academic_research_hierarchical", 
-            "Academic Research ADM - Hierarchical View",
-            include_sub_adms=True,
-            layout_style="hierarchical"
-        )
+        for layout_style in ["minimal", "hierarchical"]:
+            graph = create_publication_graph(
+                academic_adf,
+                f"Academic Research ADM - {layout_style.capitalize()} View",
+                include_sub_adms=True,
+                layout_style=layout_style
+            )
+            jobs.append((graph, f"academic_research_{layout_style}", ('png', 'svg')))
         
     except Exception as e:
         print(f"Error with Academic Research ADM: {e}")
@@ -327,36 +332,24 @@ def generate_all_visualizations():
     try:
         inventive_adf = inventive_step_ADM.adf()
         
-        # Minimal visualization
-        create_publication_visualization(
-            inventive_adf, 
-            "inventive_step_minimal", 
-            "Inventive Step ADM - Minimal View",
-            include_sub_adms=True,
-            layout_style="minimal"
-        )
-        
-        # Hierarchical visualization
-        create_publication_visualization(
-            inventive_adf, 
-            "inventive_step_hierarchical", 
-            "Inventive Step ADM - Hierarchical View",
-            include_sub_adms=True,
-            layout_style="hierarchical"
-        )
-        
-        # Detailed visualization
-        create_publication_visualization(
-            inventive_adf, 
-            "inventive_step_detailed", 
-            "Inventive Step ADM - Detailed View",
-            include_sub_adms=True,
-            layout_style="detailed"
-        )
+        for layout_style in ["minimal", "hierarchical", "detailed"]:
+            graph = create_publication_graph(
+                inventive_adf,
+                f"Inventive Step ADM - {layout_style.capitalize()} View",
+                include_sub_adms=True,
+                layout_style=layout_style
+            )
+            jobs.append((graph, f"inventive_step_{layout_style}", ('png', 'svg')))
         
     except Exception as e:
         print(f"Error with Inventive Step ADM: {e}")
     
+    for output_filename, rendered in render_all(jobs).items():
+        if rendered:
+            print(f"✓ Saved PNG and SVG: {output_filename}.png, {output_filename}.svg")
+        else:
+            print(f"✓ Unchanged, skipped: {output_filename}")
+    
     print("\n" + "=" * 60)
     print("✅ All visualizations generated successfully!")
     print("\nGenerated files:")
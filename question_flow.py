@@ -0,0 +1,533 @@
+"""
+Question Flow
+Non-blocking version of the CLI questioning logic, driven by sending answers into a generator
+"""
+
+import copy
+import logging
+
+from MainClasses import *
+
+logger = logging.getLogger(__name__)
+
+
+class Question:
+    """
+    A question waiting for an answer
+
+    Attributes
+    ----------
+    name : str
+        the name of the question in the question order
+    question : str
+        the resolved question text
+    context : dict
+        where the question was asked from (e.g. the sub-ADM item being assessed)
+    error : str
+        why the previous answer was rejected, None otherwise
+    notes : list
+        what the flow reported since the previous question (e.g. questions it skipped)
+
+    Methods
+    -------
+    parse(answer)
+        returns the value of an answer or raises ValueError
+    to_dict()
+        returns the question as a JSON friendly dict
+    """
+
+    kind = None
+
+    def __init__(self, name, question, context=None):
+        self.name = name
+        self.question = question
+        self.context = dict(context or {})
+        self.error = None
+        self.notes = []
+
+    def parse(self, answer):
+        return str(answer).strip()
+
+    def retry(self, error):
+        """
+        returns a copy of the question carrying the reason the last answer was rejected
+        """
+        question = copy.copy(self)
+        question.error = error
+        question.notes = []
+        return question
+
+    def to_dict(self):
+        result = dict(self.context)
+        result.update({'kind': self.kind, 'name': self.name, 'question': self.question})
+        result.update(self._fields())
+        if self.error is not None:
+            result['error'] = self.error
+        if self.notes:
+            result['notes'] = list(self.notes)
+        return result
+
+    def _fields(self):
+        return {}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name!r})"
+
+
+class YesNoQuestion(Question):
+    """
+    the question of a base-level factor, answered y/n
+    """
+
+    kind = 'yes_no'
+
+    def parse(self, answer):
+        if isinstance(answer, bool):
+            return answer
+        answer = str(answer).strip().lower()
+        if answer in ['y', 'yes']:
+            return True
+        if answer in ['n', 'no']:
+            return False
+        raise ValueError("Invalid answer, please answer y/n")
+
+
+class ChoiceQuestion(Question):
+    """
+    a question instantiator, answered with one of its options or the option's number (from 1)
+    """
+
+    kind = 'choice'
+
+    def __init__(self, name, question, options, context=None):
+        super().__init__(name, question, context)
+        self.options = list(options)
+
+    def parse(self, answer):
+        if answer in self.options:
+            return answer
+        try:
+            choice = int(answer) - 1
+        except (TypeError, ValueError):
+            raise ValueError("Invalid input. Please enter a number.")
+        if 0 <= choice < len(self.options):
+            return self.options[choice]
+        raise ValueError("Invalid choice. Please try again.")
+
+    def _fields(self):
+        return {'options': list(self.options)}
+
+
+class InformationQuestion(Question):
+    """
+    an information question, answered with free text stored as a fact
+    """
+
+    kind = 'information'
+
+
+class FactQuestion(Question):
+    """
+    a factual ascription question for a BLF chosen by a question instantiator
+    """
+
+    kind = 'fact'
+
+    def __init__(self, name, question, blf, fact, context=None):
+        super().__init__(name, question, context)
+        self.blf = blf
+        self.fact = fact
+
+    def _fields(self):
+        return {'blf': self.blf, 'fact': self.fact}
+
+
+class ItemsQuestion(Question):
+    """
+    asks for the items a SubADMBLF evaluates, answered with a list or comma-separated string
+    """
+
+    kind = 'items'
+
+    def parse(self, answer):
+        if isinstance(answer, (list, tuple)):
+            return [str(item).strip() for item in answer if str(item).strip()]
+        return [item.strip() for item in str(answer).split(',') if item.strip()]
+
+
+class QuestionFlow:
+    """
+    Steps through the question order of an ADF one question at a time
+
+    The flow applies the questioning rules (dependencies, question instantiators,
+    DependentBLFs, SubADMBLFs, EvaluationBLFs and information questions) but
+    instead of calling input() it yields each question as a Question and
+    receives the answer through send(), or asend() on the async generator.
+    Nothing blocks, so a single event loop can hold many flows at once and the
+    CLI, the assessment service or a batch replayer all drive the same engine.
+
+    Attributes
+    ----------
+    adf : ADF
+        the ADF being questioned, normally a sessionView() of a shared model
+    case : list
+        the case built so far
+    question_order : list
+        the questions still to be asked, the first one being the current question
+    context : dict
+        extra keys added to every question (e.g. the sub-ADM item being assessed)
+    checkpoint : SessionCheckpoint
+        journals each finished question and sub-ADM item so the session can be resumed, None otherwise
+    collect_items : bool
+        whether a SubADMBLF's collection function is called for its items, which only
+        suits a terminal since they read from input(); otherwise the items are asked for
+    statements : list
+        the evaluation statements once the flow has finished
+    notes : list
+        what the flow has reported since the last question was yielded; they are
+        moved onto the next question, so any left once finished came after the last one
+    done : bool
+        whether every question has been asked
+
+    Methods
+    -------
+    questions()
+        generator yielding the questions and receiving the answers
+    aquestions()
+        async generator yielding the questions and receiving the answers
+    evaluateDependency(dependency_node_name, current_question)
+        evaluates a dependency node against the case built so far
+    """
+
+    def __init__(self, adf, case=None, question_order=None, context=None, checkpoint=None,
+                 collect_items=False):
+        """
+        Parameters
+        ----------
+        adf : ADF
+            the ADF being questioned
+        case : list, optional
+            the starting case, by default the ADF's own case
+        question_order : list, optional
+            the questions to ask, by default the ADF's question order
+        context : dict, optional
+            extra keys added to every question
+        checkpoint : SessionCheckpoint, optional
+            the journal of the session, which is only kept for the top level flow
+        collect_items : bool, optional
+            call the collection functions of SubADMBLFs rather than asking for their items
+        """
+        self.adf = adf
+        self.case = list(case) if case is not None else list(getattr(adf, 'case', []) or [])
+        if question_order is None:
+            question_order = adf.questionOrder
+        self.question_order = list(question_order or [])
+        self.context = context or {}
+        self.checkpoint = checkpoint
+        self.collect_items = collect_items
+        self.statements = []
+        self.notes = []
+        self.done = False
+
+    def questions(self):
+        """
+        generator which yields each Question and expects the answer to be sent back
+
+        An invalid answer yields the same question again with its error set.
+        """
+        while self.question_order:
+            yield from self._step(self.question_order[0])
+            name = self.question_order.pop(0)
+
+            if self.checkpoint is not None:
+                self.checkpoint.record_question(name, self.case, getattr(self.adf, 'facts', {}))
+
+        # as in CLI.show_outcome the finished case is evaluated to produce the explanation
+        self.statements = self.adf.evaluateTree(self.case)
+        self.done = True
+
+    async def aquestions(self):
+        """
+        async generator which yields each Question and expects the answer to be sent back with asend()
+
+        The flow itself never waits, so this only hands control back to the event
+        loop between questions while the caller awaits its answer.
+        """
+        questions = self.questions()
+        try:
+            question = next(questions)
+            while True:
+                answer = yield question
+                question = questions.send(answer)
+        except StopIteration:
+            return
+
+    def _ask(self, question):
+        """
+        yields a question until a valid answer is sent back
+        """
+        question.context.update(self.context)
+        #the notes list is shared with any nested flows, so it is emptied rather than replaced
+        question.notes = list(self.notes)
+        del self.notes[:]
+        while True:
+            answer = yield question
+            try:
+                return question.parse(answer)
+            except ValueError as e:
+                question = question.retry(str(e))
+
+    def _step(self, current_question):
+        """
+        processes a single question from the question order
+        """
+        adf = self.adf
+
+        if current_question in adf.question_instantiators:
+            instantiator = adf.question_instantiators[current_question]
+
+            if instantiator.get('dependency_node'):
+                if not self._dependenciesSatisfied(instantiator['dependency_node'], current_question):
+                    self._note(f"Skipping {current_question} - dependencies cannot be satisfied")
+                    return
+
+            yield from self._askInstantiator(current_question, instantiator)
+
+        elif current_question in adf.nodes:
+            current_node = adf.nodes[current_question]
+            kind = adf.nodeTable()[current_question]['kind']
+
+            if kind == 'dependent':
+                # DependentBLF
+                if not self._dependenciesSatisfied(current_node.dependency_node, current_question):
+                    self._note(f"Skipping {current_question} - dependencies cannot be satisfied")
+                    return
+                yield from self._askBLF(current_question, current_node)
+
+            elif kind == 'sub_adm':
+                if not self._dependenciesSatisfied(current_node.dependency_node, current_question):
+                    self._note(f"Skipping {current_question} - dependencies cannot be satisfied")
+                    return
+                accepted = yield from self._evaluateSubADMs(current_question, current_node)
+                if accepted:
+                    self._addToCase(current_question)
+
+            elif kind == 'evaluation':
+                if current_node.evaluateResults(adf):
+                    self._addToCase(current_question)
+
+            else:
+                yield from self._askBLF(current_question, current_node)
+
+        elif current_question in getattr(adf, 'information_questions', {}):
+            answer = yield from self._ask(InformationQuestion(current_question, adf.information_questions[current_question]))
+            adf.setFact('INFORMATION', current_question, answer)
+
+    def _note(self, message):
+        """
+        reports something the caller should know about, on the next question and the log
+        """
+        logger.info(message)
+        self.notes.append(message)
+
+    def _dependenciesSatisfied(self, dependency_node, current_question):
+        """
+        checks every dependency is in the case, evaluating any which are not yet
+        """
+        if isinstance(dependency_node, str):
+            dependency_node = [dependency_node]
+
+        for dependency_node_name in dependency_node or []:
+            if dependency_node_name not in self.case:
+                if not self.evaluateDependency(dependency_node_name, current_question):
+                    if dependency_node_name not in self.case:
+                        return False
+        return True
+
+    def evaluateDependency(self, dependency_node_name, current_question):
+        """
+        evaluates a dependency node against the case built so far
+        """
+        return self.adf.evaluateDependency(dependency_node_name, current_question, self.case)
+
+    def _addToCase(self, blf_name):
+        """
+        adds a BLF to the case unless it has reject conditions
+        """
+        if blf_name in self.adf.nodes and self.adf.nodeTable()[blf_name]['has_reject']:
+            self._note(f"{blf_name} has reject conditions and will not be added to case")
+            return False
+
+        if blf_name not in self.case:
+            self.case.append(blf_name)
+        return True
+
+    def _askBLF(self, current_question, current_node):
+        """
+        asks the yes/no question of a base-level factor
+        """
+        if not getattr(current_node, 'question', None):
+            self._addToCase(current_question)
+            return
+
+        answer = yield from self._ask(YesNoQuestion(current_question, self.adf.resolveQuestionTemplate(current_node.question)))
+        if answer:
+            self._addToCase(current_question)
+
+    def _askInstantiator(self, current_question, instantiator):
+        """
+        asks a question instantiator and any factual ascription questions for the chosen BLFs
+        """
+        resolved_question = self.adf.resolveQuestionTemplate(instantiator['question'])
+
+        # placeholders can also be filled by facts inherited from the dependency nodes
+        dependency_node = instantiator.get('dependency_node')
+        if dependency_node:
+            if isinstance(dependency_node, str):
+                dependency_node = [dependency_node]
+            inherited_facts = {}
+            for dep_node in dependency_node:
+                inherited_facts.update(self.adf.getInheritedFacts(dep_node, self.case))
+            for fact_name, value in inherited_facts.items():
+                resolved_question = resolved_question.replace("{" + fact_name + "}", str(value))
+
+        selected_answer = yield from self._ask(ChoiceQuestion(current_question, resolved_question, instantiator['blf_mapping'].keys()))
+
+        blf_names = instantiator['blf_mapping'][selected_answer]
+        if isinstance(blf_names, str):
+            blf_names = [blf_names]
+
+        for blf_name in blf_names:
+            # Skip empty string BLFs - they're just placeholders
+            if blf_name == "":
+                continue
+            if not self._addToCase(blf_name):
+                continue
+
+            factual_ascription = instantiator.get('factual_ascription') or {}
+            for fact_name, question in factual_ascription.get(blf_name, {}).items():
+                answer = yield from self._ask(FactQuestion(current_question, question, blf_name, fact_name))
+                if answer:
+                    self.adf.setFact(blf_name, fact_name, answer)
+
+    def _sourceItems(self, current_question, current_node):
+        """
+        gives the items a SubADMBLF evaluates, asking for them unless they are a list
+        or the flow calls collection functions
+        """
+        if isinstance(current_node.function, list):
+            return list(current_node.function)
+        if self.collect_items:
+            return current_node._get_source_items(self)
+        items = yield from self._ask(ItemsQuestion(
+            current_question, f"Which items should be evaluated for {current_question}? (comma-separated list)"))
+        return items
+
+    def _evaluateSubADMs(self, current_question, current_node):
+        """
+        evaluates a SubADMBLF by running a nested flow over a sub-ADM for each item
+
+        A checkpointed session journals the items and each finished item, so a
+        resumed session neither collects the items again nor re-asks finished items
+        """
+        checkpoint = self.checkpoint
+        items = checkpoint.items(current_question) if checkpoint is not None else None
+        if items is None:
+            items = yield from self._sourceItems(current_question, current_node)
+            if checkpoint is not None and items:
+                checkpoint.record_items(current_question, items)
+
+        if not items:
+            self._note(f"No items found to evaluate for {current_question}")
+            return False
+
+        self._note(f"Evaluating {current_question} for {len(items)} item(s)")
+        key_facts = current_node._collect_key_facts(self)
+
+        accepted_count = 0
+        rejected_count = 0
+        item_results = []
+        sub_adf_instances = []
+        sub_adf_results = {}
+
+        for i, item in enumerate(items, 1):
+            restored = checkpoint.item_result(current_question, i) if checkpoint is not None else None
+            if restored is not None:
+                sub_result, sub_case = restored
+                self._note(f"Restored {item} from checkpoint")
+                #no sub-ADM instance is rebuilt for restored items
+                sub_adf_instances.append(None)
+            else:
+                self._note(f"Item {i}/{len(items)}: {item}")
+                sub_adf = current_node.sub_adf_creator(item, key_facts)
+                sub_adf.setFact('ITEM', 'name', item)
+                if key_facts:
+                    sub_adf.facts.update(key_facts)
+                sub_adf_instances.append(sub_adf)
+
+                sub_flow = QuestionFlow(sub_adf, sub_adf.case, context=dict(self.context, blf=current_question, item=item),
+                                        collect_items=self.collect_items)
+                sub_flow.notes = self.notes
+                yield from sub_flow.questions()
+
+                root_node = current_node.rootNode(sub_adf)
+                if root_node and root_node in sub_flow.case:
+                    sub_result = 'ACCEPTED'
+                elif root_node:
+                    sub_result = 'REJECTED'
+                else:
+                    sub_result = 'UNKNOWN'
+                sub_case = sub_flow.case
+
+                if checkpoint is not None:
+                    checkpoint.record_item(current_question, i, item, sub_result, sub_case)
+                self._note(f"{item}: {sub_result}")
+
+            if sub_result == 'ACCEPTED':
+                accepted_count += 1
+            elif sub_result == 'REJECTED':
+                rejected_count += 1
+            sub_adf_results[item] = sub_result
+            item_results.append(sub_case)
+
+        current_node.storeResults(self.adf, items, item_results, accepted_count, rejected_count, sub_adf_instances,
+                                  sub_adf_results)
+        accepted = current_node.isAccepted(accepted_count, rejected_count)
+        self._note(f"{current_question} is {'ACCEPTED' if accepted else 'REJECTED'} "
+                   f"({accepted_count} of {len(items)} item(s) accepted)")
+        return accepted
+
+
+
+async def replay(flow, answers):
+    """
+    drives a flow with a fixed list of answers, e.g. to re-run a recorded session
+
+    Parameters
+    ----------
+    flow : QuestionFlow
+        the flow to drive
+    answers : iterable
+        the answers, in the order the questions are asked
+
+    Returns
+    -------
+    list: the questions that were asked, the flow having finished if the answers sufficed
+    """
+    answers = iter(answers)
+    asked = []
+    questions = flow.aquestions()
+    try:
+        question = await questions.__anext__()
+        while True:
+            asked.append(question)
+            try:
+                answer = next(answers)
+            except StopIteration:
+                break
+            question = await questions.asend(answer)
+    except StopAsyncIteration:
+        pass
+    finally:
+        await questions.aclose()
+    return asked
@@ -0,0 +1,147 @@
+"""
+Render Pipeline
+Renders DOT graphs to every output format with one Graphviz layout per graph, in parallel,
+skipping graphs whose DOT source has not changed since they were last rendered
+"""
+
+import hashlib
+import io
+import os
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+
+def dot_source(graph):
+    """
+    returns the DOT source of a graph
+
+    Parameters
+    ----------
+    graph : str, pydot.Dot or ADF
+        DOT source, a pydot graph, or an ADF which is streamed with writeDot()
+    """
+    if isinstance(graph, str):
+        return graph
+    if hasattr(graph, 'writeDot'):
+        out = io.StringIO()
+        graph.writeDot(out)
+        return out.getvalue()
+    return graph.to_string()
+
+
+def source_hash(source, formats, program='dot'):
+    """
+    returns the hash identifying a render of some DOT source
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{program}\0{','.join(formats)}\0".encode('utf-8'))
+    digest.update(source.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def outputs(output_base, formats):
+    """
+    returns the files a render writes, e.g. name.png and name.svg
+    """
+    return [f"{output_base}.{fmt}" for fmt in formats]
+
+
+def is_current(source, output_base, formats=('png', 'svg'), program='dot'):
+    """
+    whether every output exists and was rendered from this exact DOT source
+    """
+    try:
+        with open(f"{output_base}.dothash", encoding='utf-8') as f:
+            recorded = f.read().strip()
+    except OSError:
+        return False
+    if recorded != source_hash(source, formats, program):
+        return False
+    return all(os.path.exists(path) for path in outputs(output_base, formats))
+
+
+def render(graph, output_base, formats=('png', 'svg'), program='dot', force=False):
+    """
+    renders a graph to every format with a single Graphviz process, so layout runs once
+
+    The hash of the DOT source is stored next to the outputs in output_base.dothash
+    and the render is skipped if it still matches.
+
+    Parameters
+    ----------
+    graph : str, pydot.Dot or ADF
+        the graph to render
+    output_base : str
+        the output filename without extension
+    formats : tuple, default ('png', 'svg')
+        the Graphviz output formats
+    program : str, default 'dot'
+        the Graphviz layout program
+    force : bool, default False
+        render even if the outputs are current
+
+    Returns
+    -------
+    bool: True if the graph was rendered, False if it was skipped
+    """
+    source = dot_source(graph)
+    formats = tuple(formats)
+
+    if not force and is_current(source, output_base, formats, program):
+        return False
+
+    #Graphviz lays the graph out once and writes each -T/-o pair from that layout
+    command = [program]
+    for fmt, path in zip(formats, outputs(output_base, formats)):
+        command += [f'-T{fmt}', '-o', path]
+
+    result = subprocess.run(command, input=source, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{program} failed rendering {output_base}: {result.stderr.strip()}")
+
+    with open(f"{output_base}.dothash", 'w', encoding='utf-8') as f:
+        f.write(source_hash(source, formats, program) + '\n')
+    return True
+
+
+def _render_job(job):
+    return render(*job)
+
+
+def render_all(jobs, workers=None, force=False):
+    """
+    renders independent graphs in parallel worker processes
+
+    Parameters
+    ----------
+    jobs : list
+        (graph, output_base, formats) tuples, formats being optional
+    workers : int, optional
+        the number of worker processes, by default one per CPU
+    force : bool, default False
+        render even if the outputs are current
+
+    Returns
+    -------
+    dict: output_base -> True if rendered, False if skipped
+    """
+    prepared = []
+    for job in jobs:
+        graph, output_base = job[0], job[1]
+        formats = tuple(job[2]) if len(job) > 2 else ('png', 'svg')
+        #DOT is produced here so workers only receive strings rather than graphs
+        prepared.append((dot_source(graph), output_base, formats, 'dot', force))
+
+    #current outputs are skipped without starting a worker
+    pending = [job for job in prepared if force or not is_current(job[0], job[1], job[2])]
+    results = {job[1]: False for job in prepared}
+
+    if len(pending) == 1 or workers == 1:
+        for job in pending:
+            results[job[1]] = _render_job(job)
+    elif pending:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for job, rendered in zip(pending, executor.map(_render_job, pending)):
+                results[job[1]] = rendered
+
+    return results
@@ -0,0 +1,242 @@
+"""
+Selectivity
+Reorders the operands and conditions of a compiled ADF from observed cases so evaluation short-circuits sooner
+"""
+
+import json
+
+from bdd import BDD, FALSE
+from compiled_adf import CompiledADF, evaluate_expression, expression_variables, popcount
+
+
+class OrderedADF(CompiledADF):
+    """
+    A compiled ADF whose conditions are tried in the cheapest order for a sample of cases
+
+    The sample is evaluated once to find, for every node, the cases in which it
+    is present, kept as a bitset with a bit per case. From these the exact
+    number of lookups an expression takes over the sample can be worked out for
+    any order of its operands, since an operand of an and is only read in the
+    cases where those before it hold, and of an or where they fail. The
+    operands of each chain of ands or ors are then ordered greedily, taking
+    next the operand with the fewest lookups per case it short-circuits.
+
+    The conditions of a node can only be reordered without changing the
+    statement given when they cannot hold together, so two conditions keep
+    their declared order unless their BDDs show they are mutually exclusive.
+    Each condition keeps its original index, and the last declared condition's
+    reject flag still decides the outcome when none holds. The reject flag of
+    any other condition is only read when that condition holds.
+
+    Attributes
+    ----------
+    attempts : dict
+        node name -> list of (statement index, expression, reject expression) in the order tried
+    sample_size : int
+        the number of cases the order was chosen for
+    operations : int
+        the number of node lookups made by evaluateNode so far
+
+    Methods
+    -------
+    evaluateNode(name, present)
+        evaluates a node's conditions in the chosen order
+    """
+
+    def __init__(self, adf, cases, results=None):
+        """
+        Parameters
+        ----------
+        adf : ADF
+            the ADF to compile
+        cases : iterable
+            the sample of cases, each a list of the factors given
+        results : dict, optional
+            EvaluationBLF name -> its result for every case, by default from evaluateResults
+        """
+        super().__init__(adf)
+        self.operations = 0
+        #the sample is evaluated with the conditions in their declared order
+        self.attempts = {name: [(index, expression, reject) for index, (expression, reject) in enumerate(conditions)]
+                         for name, conditions in self.conditions.items()}
+        self._truth = {}
+        cases = [list(case) for case in cases]
+        self.sample_size = len(cases)
+        for bit, case in enumerate(cases):
+            values = self.evaluate(case, results)
+            for name in self.accepted(case, values):
+                self._truth[name] = self._truth.get(name, 0) | 1 << bit
+        self._all = (1 << self.sample_size) - 1
+
+        for name, conditions in self.conditions.items():
+            ordered = [(index, self._order(expression), reject) for index, (expression, reject) in enumerate(conditions)]
+            self.attempts[name] = self._orderConditions(ordered)
+        self.evaluations = 0
+        self.operations = 0
+
+    def evaluateNode(self, name, present):
+        """
+        evaluates a node's acceptance conditions in the chosen order, giving the
+        outcome CompiledADF.evaluateNode gives
+
+        Returns
+        -------
+        tuple: (accepted, index of the statement given)
+        """
+        self.evaluations += 1
+
+        def counted(node):
+            self.operations += 1
+            return present(node)
+
+        for index, expression, reject in self.attempts[name]:
+            if evaluate_expression(expression, counted):
+                return (not (reject is not None and evaluate_expression(reject, counted)), index)
+        conditions = self.conditions[name]
+        #the last declared condition's reject flag decides between its own statement and the rejection statement
+        if conditions and conditions[-1][1] is not None and evaluate_expression(conditions[-1][1], counted):
+            return (False, len(conditions) - 1)
+        return (False, self.statement_counts[name] - 1)
+
+    def truth(self, expression):
+        """
+        returns the bitset of the sample cases in which an expression holds
+        """
+        op = expression[0]
+        if op == 'var':
+            return self._truth.get(expression[1], 0)
+        if op == 'const':
+            return self._all if expression[1] else 0
+        if op == 'not':
+            return self._all & ~self.truth(expression[1])
+        if op == 'and':
+            return self.truth(expression[1]) & self.truth(expression[2])
+        return self.truth(expression[1]) | self.truth(expression[2])
+
+    def cost(self, expression, cases=None):
+        """
+        returns the number of lookups an expression makes over some of the sample cases, by default all of them
+        """
+        cases = self._all if cases is None else cases
+        op = expression[0]
+        if op == 'var':
+            return popcount(cases)
+        if op == 'const':
+            return 0
+        if op == 'not':
+            return self.cost(expression[1], cases)
+        #the second operand is only read in the cases the first does not decide
+        first = self.truth(expression[1])
+        rest = cases & first if op == 'and' else cases & ~first
+        return self.cost(expression[1], cases) + self.cost(expression[2], rest)
+
+    def _order(self, expression):
+        """
+        returns an expression with the operands of each chain of ands or ors in the cheapest order found
+        """
+        op = expression[0]
+        if op in ('var', 'const') or not self.sample_size:
+            return expression
+        if op == 'not':
+            return ('not', self._order(expression[1]))
+
+        operands = [self._order(operand) for operand in _chain(expression, op)]
+        ordered = []
+        remaining = self._all
+        while operands:
+            def rank(operand):
+                truth = self.truth(operand)
+                decided = popcount(remaining & ~truth if op == 'and' else remaining & truth)
+                cost = self.cost(operand, remaining)
+                #operands which never decide go last, cheapest first
+                return (0, cost / decided) if decided else (1, cost)
+            best = min(operands, key=rank)
+            operands.remove(best)
+            ordered.append(best)
+            truth = self.truth(best)
+            remaining &= truth if op == 'and' else ~truth
+
+        result = ordered[0]
+        for operand in ordered[1:]:
+            result = (op, result, operand)
+        return result
+
+    def _orderConditions(self, conditions):
+        """
+        returns the conditions in the cheapest order found which keeps every pair
+        that can hold together in its declared order
+        """
+        if len(conditions) < 2 or not self.sample_size:
+            return conditions
+
+        variables = sorted(set().union(*(expression_variables(expression) for _, expression, _ in conditions)))
+        bdd = BDD(variables)
+        diagrams = [bdd.expression(expression) for _, expression, _ in conditions]
+        #conditions which must stay after each condition
+        before = {i: {j for j in range(i) if bdd.conjoin(diagrams[i], diagrams[j]) != FALSE}
+                  for i in range(len(conditions))}
+
+        ordered = []
+        placed = set()
+        remaining = self._all
+        while len(ordered) < len(conditions):
+            ready = [i for i in range(len(conditions)) if i not in placed and before[i] <= placed]
+
+            def rank(i):
+                expression = conditions[i][1]
+                holds = popcount(remaining & self.truth(expression))
+                cost = self.cost(expression, remaining)
+                return ((0, cost / holds) if holds else (1, cost), i)
+
+            best = min(ready, key=rank)
+            placed.add(best)
+            ordered.append(conditions[best])
+            remaining &= ~self.truth(conditions[best][1])
+        return ordered
+
+
+def _chain(expression, op):
+    """
+    returns the operands of a chain of the same operator, e.g. a, b and c of (a and b) and c
+    """
+    if expression[0] != op:
+        return [expression]
+    return _chain(expression[1], op) + _chain(expression[2], op)
+
+
+def count_operations(compiled, cases, results=None):
+    """
+    returns the number of node lookups a compiled ADF makes evaluating a sample of cases,
+    to compare an OrderedADF with a CompiledADF trying the conditions as declared
+    """
+    total = 0
+
+    def counted(present):
+        def lookup(name):
+            nonlocal total
+            total += 1
+            return present(name)
+        return lookup
+
+    for case in cases:
+        present = set(case)
+        for name in compiled.order:
+            if name in compiled.evaluation_nodes:
+                accepted = compiled._evaluationResult(name, results)
+            else:
+                accepted = compiled.evaluateNode(name, counted(present.__contains__))[0]
+            if accepted:
+                present.add(name)
+    return total
+
+
+def store_cases(store, model=None):
+    """
+    returns the factors each case in a CaseStore was given, as a sample for OrderedADF
+    """
+    query = "SELECT given FROM cases"
+    parameters = []
+    if model is not None:
+        query += " WHERE model = ?"
+        parameters.append(model)
+    return [json.loads(given) for given, in store.connection.execute(query + " ORDER BY id", parameters)]
@@ -0,0 +1,261 @@
+"""
+Shared Expressions
+Hash-conses the acceptance conditions of a model and its sub-ADMs into one DAG of distinct sub-expressions
+"""
+
+from compiled_adf import CompiledADF
+
+
+class ExpressionPool:
+    """
+    A table of distinct sub-expressions, each stored once and referred to by id
+
+    Expressions from compile_condition are interned bottom up, so two
+    sub-expressions get the same id whenever they are the same up to the order
+    of the operands of and/or, wherever they appear. Together the ids form a
+    DAG whose roots are the conditions, which can be inspected with table() and
+    shared().
+
+    Attributes
+    ----------
+    nodes : list
+        id -> ('var', name), ('const', bool), ('not', id) or (op, id, id)
+    uses : list
+        id -> the number of expressions and conditions which refer to it
+    evaluations : int
+        the number of sub-expressions evaluated so far, to measure the work done
+    hits : int
+        the number of times a sub-expression's value was reused rather than evaluated
+
+    Methods
+    -------
+    intern(expression)
+        returns the id of an expression tree, adding any sub-expressions not yet in the pool
+    expression(i)
+        returns the expression tree of an id
+    evaluate(i, present, memo)
+        evaluates an expression, reusing the values in the memo
+    text(i)
+        returns an expression written out in infix
+    shared()
+        returns the ids referred to more than once
+    table()
+        returns a row per sub-expression
+    """
+
+    def __init__(self):
+        self.nodes = []
+        self.uses = []
+        self._ids = {}
+        self.evaluations = 0
+        self.hits = 0
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def intern(self, expression, root=True):
+        """
+        returns the id of an expression tree
+
+        Parameters
+        ----------
+        expression : tuple
+            a tree from compile_condition
+        root : bool, default True
+            whether the expression is referred to from outside the pool, e.g. a condition,
+            so the reference is counted in its uses
+        """
+        op = expression[0]
+        if op in ('var', 'const'):
+            key = expression
+        elif op == 'not':
+            key = ('not', self.intern(expression[1], False))
+        else:
+            #and/or are commutative, so their operands are kept in id order
+            operands = sorted((self.intern(expression[1], False), self.intern(expression[2], False)))
+            key = (op, operands[0], operands[1])
+
+        i = self._ids.get(key)
+        if i is None:
+            i = len(self.nodes)
+            self._ids[key] = i
+            self.nodes.append(key)
+            self.uses.append(0)
+            if op not in ('var', 'const'):
+                for operand in key[1:]:
+                    self.uses[operand] += 1
+        if root:
+            self.uses[i] += 1
+        return i
+
+    def expression(self, i):
+        """
+        returns the expression tree of an id
+        """
+        node = self.nodes[i]
+        if node[0] in ('var', 'const'):
+            return node
+        return (node[0],) + tuple(self.expression(operand) for operand in node[1:])
+
+    def evaluate(self, i, present, memo):
+        """
+        evaluates an expression, reading and filling a memo of the values of the sub-expressions
+
+        Parameters
+        ----------
+        i : int
+            the id of the expression
+        present : callable
+            name -> whether the node is in the case
+        memo : dict
+            id -> value, for the sub-expressions already evaluated for the case
+        """
+        if i in memo:
+            self.hits += 1
+            return memo[i]
+        self.evaluations += 1
+        node = self.nodes[i]
+        op = node[0]
+        if op == 'var':
+            value = present(node[1])
+        elif op == 'const':
+            value = node[1]
+        elif op == 'not':
+            value = not self.evaluate(node[1], present, memo)
+        elif op == 'and':
+            value = self.evaluate(node[1], present, memo) and self.evaluate(node[2], present, memo)
+        else:
+            value = self.evaluate(node[1], present, memo) or self.evaluate(node[2], present, memo)
+        memo[i] = value
+        return value
+
+    def text(self, i):
+        """
+        returns an expression written out in infix, e.g. '(A and B)'
+        """
+        node = self.nodes[i]
+        op = node[0]
+        if op == 'var':
+            return node[1]
+        if op == 'const':
+            return 'accept' if node[1] else 'false'
+        if op == 'not':
+            return f"not {self.text(node[1])}"
+        return f"({self.text(node[1])} {op} {self.text(node[2])})"
+
+    def shared(self):
+        """
+        returns the ids of the and/or/not expressions referred to more than once, the most used first
+        """
+        ids = [i for i, node in enumerate(self.nodes) if node[0] not in ('var', 'const') and self.uses[i] > 1]
+        return sorted(ids, key=lambda i: (-self.uses[i], i))
+
+    def table(self):
+        """
+        returns a dict per sub-expression with its 'id', 'op', 'operands', 'uses' and 'text'
+        """
+        rows = []
+        for i, node in enumerate(self.nodes):
+            operands = list(node[1:]) if node[0] not in ('var', 'const') else []
+            rows.append({'id': i, 'op': node[0], 'operands': operands, 'uses': self.uses[i], 'text': self.text(i)})
+        return rows
+
+
+class SharedADF(CompiledADF):
+    """
+    A compiled ADF whose conditions are ids in an ExpressionPool, which may be
+    shared with other models, such as the sub-ADMs of a model
+
+    evaluate() keeps one memo for the whole case, so a sub-expression appearing
+    in the conditions of several nodes is evaluated at most once. This is sound
+    because every node a condition reads is evaluated before it.
+
+    Attributes
+    ----------
+    pool : ExpressionPool
+        the pool holding the conditions
+    shared_conditions : dict
+        node name -> list of (expression id, reject expression id or None), one per acceptance condition
+
+    Methods
+    -------
+    evaluateNode(name, present, memo=None)
+        evaluates one node's acceptance conditions, reusing the values in the memo
+    """
+
+    def __init__(self, adf, pool=None):
+        super().__init__(adf)
+        self.pool = pool if pool is not None else ExpressionPool()
+        self.shared_conditions = {
+            name: [(self.pool.intern(expression), None if reject is None else self.pool.intern(reject))
+                   for expression, reject in conditions]
+            for name, conditions in self.conditions.items()}
+
+    def evaluateNode(self, name, present, memo=None):
+        """
+        evaluates a node's acceptance conditions as evaluateNode does
+
+        Returns
+        -------
+        tuple: (accepted, index of the statement given)
+        """
+        self.evaluations += 1
+        memo = memo if memo is not None else {}
+        index = -1
+        flag = False
+        for index, (expression, reject) in enumerate(self.shared_conditions[name]):
+            result = self.pool.evaluate(expression, present, memo)
+            flag = reject is not None and self.pool.evaluate(reject, present, memo)
+            if result:
+                return (not flag, index)
+        if flag:
+            return (False, index)
+        return (False, self.statement_counts[name] - 1)
+
+    def evaluate(self, case, results=None):
+        """
+        evaluates every non-leaf node for a case, each distinct sub-expression at most once
+
+        Returns
+        -------
+        dict: node name -> (accepted, statement index), in evaluation order
+        """
+        present = set(case)
+        memo = {}
+        values = {}
+        for name in self.order:
+            if name in self.evaluation_nodes:
+                accepted = self._evaluationResult(name, results)
+                values[name] = (accepted, 0 if accepted or self.statement_counts[name] < 2 else 1)
+            else:
+                values[name] = self.evaluateNode(name, present.__contains__, memo)
+            if values[name][0]:
+                present.add(name)
+        return values
+
+
+def share_model(adf, item_name='item', pool=None):
+    """
+    compiles a model and the sub-ADM of each of its SubADMBLFs into one pool
+
+    Parameters
+    ----------
+    adf : ADF
+        the model
+    item_name : str, default 'item'
+        the item the sub-ADMs are created for, since only their structure is compiled
+    pool : ExpressionPool, optional
+        the pool to add to, by default a new one
+
+    Returns
+    -------
+    ExpressionPool: the pool
+    dict: the model's name and each SubADMBLF's name -> its SharedADF
+    """
+    pool = pool if pool is not None else ExpressionPool()
+    models = {adf.name: SharedADF(adf, pool)}
+    node_table = adf.nodeTable()
+    for name, node in adf.nodes.items():
+        if node_table[name]['kind'] == 'sub_adm':
+            models[name] = SharedADF(node.sub_adf_creator(item_name), pool)
+    return pool, models
@@ -40,8 +40,9 @@ def create_split_visualizations(adf, adf_name):
     sub_adm_mapping = {}
     
     # Find all sub-ADM creators
+    node_table = adf.nodeTable()
     for node_name, node in adf.nodes.items():
-        if hasattr(node, 'sub_adf_creator'):
+        if node_table[node_name]['kind'] == 'sub_adm':
             sub_adm_key = str(node.sub_adf_creator)
             if sub_adm_key not in sub_adm_mapping:
                 sub_adm_count += 1
@@ -36,8 +36,9 @@ def create_main_adm_with_all_dependencies(adf):
     node_to_sub_model = {}
     
     # First pass: identify all sub-ADM creators and create connection boxes
+    node_table = adf.nodeTable()
     for node_name, node in adf.nodes.items():
-        if hasattr(node, 'sub_adf_creator'):
+        if node_table[node_name]['kind'] == 'sub_adm':
             sub_adm_key = str(node.sub_adf_creator)
             if sub_adm_key not in sub_adm_mapping:
                 sub_adm_count += 1
@@ -232,8 +233,9 @@ def create_inventive_step_split_with_bottom_skilled_person():
     sub_adm_mapping = {}
     
     # Find all sub-ADM creators
+    node_table = adf.nodeTable()
     for node_name, node in adf.nodes.items():
-        if hasattr(node, 'sub_adf_creator'):
+        if node_table[node_name]['kind'] == 'sub_adm':
             sub_adm_key = str(node.sub_adf_creator)
             if sub_adm_key not in sub_adm_mapping:
                 sub_adm_count += 1
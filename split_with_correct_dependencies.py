@@ -8,6 +8,7 @@ import sys
 import os
 from MainClasses import *
 import inventive_step_ADM
+from render_pipeline import render_all
 
 def create_main_adm_with_all_dependencies(adf):
     """
@@ -36,8 +37,9 @@ def create_main_adm_with_all_dependencies(adf):
     node_to_sub_model = {}
     
     # First pass: identify all sub-ADM creators and create connection boxes
+    node_table = adf.nodeTable()
     for node_name, node in adf.nodes.items():
-        if hasattr(node, 'sub_adf_creator'):
+        if node_table[node_name]['kind'] == 'sub_adm':
             sub_adm_key = str(node.sub_adf_creator)
             if sub_adm_key not in sub_adm_mapping:
                 sub_adm_count += 1
@@ -217,20 +219,17 @@ def create_inventive_step_split_with_correct_dependencies():
     print("Creating main ADM with all dependencies...")
     main_graph = create_main_adm_with_all_dependencies(adf)
     
-    # Save main ADM
-    main_png = "inventive_step_main_with_dependencies.png"
-    main_svg = "inventive_step_main_with_dependencies.svg"
-    main_graph.write_png(main_png)
-    main_graph.write_svg(main_svg)
-    print(f"✓ Saved main ADM with all dependencies: {main_png}, {main_svg}")
+    # Graphs are rendered together at the end, in parallel
+    jobs = [(main_graph, "inventive_step_main_with_dependencies", ('png', 'svg'))]
     
     # 2. Find and create sub-ADM visualizations
     sub_adm_count = 0
     sub_adm_mapping = {}
     
     # Find all sub-ADM creators
+    node_table = adf.nodeTable()
     for node_name, node in adf.nodes.items():
-        if hasattr(node, 'sub_adf_creator'):
+        if node_table[node_name]['kind'] == 'sub_adm':
             sub_adm_key = str(node.sub_adf_creator)
             if sub_adm_key not in sub_adm_mapping:
                 sub_adm_count += 1
@@ -248,16 +247,18 @@ def create_inventive_step_split_with_correct_dependencies():
                     else:
                         sub_graph = create_sub_adm_1_with_subadm_style(adf, sub_adf, sub_adm_count)
                     
-                    # Save sub-ADM
-                    sub_png = f"inventive_step_sub_adm_{sub_adm_count}.png"
-                    sub_svg = f"inventive_step_sub_adm_{sub_adm_count}.svg"
-                    sub_graph.write_png(sub_png)
-                    sub_graph.write_svg(sub_svg)
-                    print(f"✓ Saved Sub-ADM {sub_adm_count}: {sub_png}, {sub_svg}")
+                    jobs.append((sub_graph, f"inventive_step_sub_adm_{sub_adm_count}", ('png', 'svg')))
                     
                 except Exception as e:
                     print(f"❌ Error creating Sub-ADM {sub_adm_count}: {e}")
     
+    # Save main ADM and sub-ADMs, skipping any which are unchanged
+    for output_base, rendered in render_all(jobs).items():
+        if rendered:
+            print(f"✓ Saved {output_base}.png, {output_base}.svg")
+        else:
+            print(f"✓ Unchanged, skipped: {output_base}")
+    
     print(f"\n✅ Generated {1 + sub_adm_count} separate visualizations:")
     print(f"  • 1 main ADM image (with all dependencies)")
     print(f"  • {sub_adm_count} sub-ADM images")
@@ -0,0 +1,176 @@
+"""
+SQL Compiler
+Compiles an ADF into SQL so a whole table of cases is evaluated inside the database in one pass
+"""
+
+from compiled_adf import CompiledADF
+from counterfactual import relevant_factors
+
+#suffixes of the columns added for each abstract factor
+STATEMENT = '__statement'
+GIVEN = '__given'
+
+
+def quote(name):
+    """
+    returns a name as a quoted SQL identifier
+    """
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def expression_sql(expression):
+    """
+    returns the SQL of an expression tree from compile_condition, over 0/1 columns
+    """
+    op = expression[0]
+    if op == 'var':
+        return quote(expression[1])
+    if op == 'const':
+        return '1' if expression[1] else '0'
+    if op == 'not':
+        return f"(NOT {expression_sql(expression[1])})"
+    return f"({expression_sql(expression[1])} {op.upper()} {expression_sql(expression[2])})"
+
+
+def node_sql(compiled, name):
+    """
+    returns the SQL of whether a node is accepted and of the index of its statement
+
+    the conditions are tried in order as evaluateNode does: the first true one
+    decides, rejecting if its reject flag is set; if none is, the last
+    condition's reject flag picks between its statement and the rejection statement
+    """
+    conditions = compiled.conditions[name]
+    if not conditions:
+        return '0', str(compiled.statement_counts[name] - 1)
+
+    accepted = []
+    statement = []
+    for index, (expression, reject) in enumerate(conditions):
+        condition = expression_sql(expression)
+        flag = expression_sql(reject) if reject is not None else '0'
+        accepted.append(f"WHEN {condition} THEN (NOT {flag})")
+        statement.append(f"WHEN {condition} THEN {index}")
+
+    last_index = len(conditions) - 1
+    last_reject = conditions[-1][1]
+    if last_reject is None:
+        fallback = str(compiled.statement_counts[name] - 1)
+    else:
+        fallback = f"CASE WHEN {expression_sql(last_reject)} THEN {last_index} ELSE {compiled.statement_counts[name] - 1} END"
+
+    return (f"CASE {' '.join(accepted)} ELSE 0 END",
+            f"CASE {' '.join(statement)} ELSE {fallback} END")
+
+
+def compile_sql(adf, source, key='id', columns=None, target=None, compiled=None):
+    """
+    compiles an ADF into a query evaluating every row of a table of cases
+
+    The source has a 0/1 column per base-level factor. Each abstract factor
+    becomes a column, 1 if the factor is in the final case, and a column named
+    with the suffix __statement holding the index of its statement. The
+    abstract factors are added by a chain of common table expressions, one per
+    level of the graph, so each level reads the columns of the levels below.
+
+    Parameters
+    ----------
+    adf : ADF
+        the ADF to compile
+    source : str
+        the table, view or parenthesised subquery holding the cases
+    key : str, default 'id'
+        the column identifying a case
+    columns : iterable, optional
+        the columns of the source. Factors without a column are taken as absent,
+        and abstract factors or EvaluationBLFs with one are present when it is 1,
+        as when given in the case. By default every factor has a column and
+        nothing else does
+    target : str, optional
+        only compile the nodes this node depends on
+    compiled : CompiledADF, optional
+        the compiled ADF, to reuse it across calls
+
+    Returns
+    -------
+    str: the query, with the key, the factors and two columns per abstract factor
+    """
+    compiled = compiled if compiled is not None else CompiledADF(adf)
+    names = compiled.closure(target) if target is not None else list(compiled.order)
+    if target is not None:
+        factors = relevant_factors(compiled, target)
+    else:
+        factors = [name for name in dict.fromkeys(
+            child for node in compiled.conditions for child in adf.nodes[node].children)
+            if name not in compiled.conditions and name not in compiled.evaluation_nodes]
+    columns = set(columns) if columns is not None else set(factors)
+
+    #the base selects the factors, renaming the given abstract factors so they do not clash
+    base = [quote(key)]
+    for factor in factors:
+        base.append(f"{quote(factor)} AS {quote(factor)}" if factor in columns else f"0 AS {quote(factor)}")
+    for name in names:
+        if name in columns:
+            base.append(f"{quote(name)} AS {quote(name + GIVEN)}")
+
+    levels = _levels(compiled, names)
+    ctes = [f"level_0 AS (SELECT {', '.join(base)} FROM {source})"]
+    for depth, level in enumerate(levels, start=1):
+        selected = ['*']
+        for name in level:
+            given = f" OR {quote(name + GIVEN)}" if name in columns else ''
+            if name in compiled.evaluation_nodes:
+                #the sub-ADM results are not in the table, so an EvaluationBLF is only present if given
+                accepted = quote(name + GIVEN) if name in columns else '0'
+                count = compiled.statement_counts[name]
+                statement = f"CASE WHEN {accepted} THEN 0 ELSE {1 if count > 1 else 0} END"
+                selected.append(f"{accepted} AS {quote(name)}")
+            else:
+                accepted, statement = node_sql(compiled, name)
+                selected.append(f"(({accepted}){given}) AS {quote(name)}")
+            selected.append(f"{statement} AS {quote(name + STATEMENT)}")
+        ctes.append(f"level_{depth} AS (SELECT {', '.join(selected)} FROM level_{depth - 1})")
+
+    output = [quote(key)] + [quote(factor) for factor in factors]
+    for name in names:
+        output += [quote(name), quote(name + STATEMENT)]
+    return "WITH " + ",\n".join(ctes) + f"\nSELECT {', '.join(output)} FROM level_{len(levels)}"
+
+
+def factor_table_sql(factors, table='factors', key='case_id'):
+    """
+    returns a subquery turning rows of (case, factor), such as the factors table of
+    a CaseStore, into a table with a 0/1 column per factor, for use as a source
+    """
+    columns = [f"MAX(factor = '{factor.replace(chr(39), chr(39) * 2)}') AS {quote(factor)}" for factor in factors]
+    return f"(SELECT {quote(key)} AS id, {', '.join(columns)} FROM {table} GROUP BY {quote(key)})"
+
+
+def evaluate_table(connection, adf, source, key='id', columns=None, target=None, compiled=None):
+    """
+    evaluates every case of a table with a single query
+
+    Returns
+    -------
+    list: a dict per case of key -> value, node -> 0/1 and node__statement -> statement index
+    """
+    cursor = connection.execute(compile_sql(adf, source, key, columns, target, compiled))
+    names = [description[0] for description in cursor.description]
+    return [dict(zip(names, row)) for row in cursor]
+
+
+def _levels(compiled, names):
+    """
+    groups the nodes by the length of the longest path below them, so each group only reads earlier ones
+    """
+    wanted = set(names)
+    depth = {}
+    for name in compiled.order:
+        if name not in wanted:
+            continue
+        children = compiled.adf.nodes[name].children if name in compiled.conditions else []
+        depth[name] = 1 + max((depth[child] for child in children if child in depth), default=0)
+    levels = [[] for _ in range(max(depth.values(), default=0))]
+    for name in names:
+        levels[depth[name] - 1].append(name)
+    return levels
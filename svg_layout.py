@@ -0,0 +1,311 @@
+"""
+SVG Layout
+A pure-Python layered (Sugiyama-style) layout and SVG writer for ADF graphs, needing no Graphviz
+"""
+
+from html import escape
+
+#sizes in points, roughly matching Graphviz's defaults
+CHAR_WIDTH = 7.5
+NODE_HEIGHT = 36
+MIN_NODE_WIDTH = 54
+LAYER_GAP = 90
+NODE_GAP = 24
+MARGIN = 20
+
+
+def layered_layout(nodes, edges, widths, sweeps=4):
+    """
+    lays out a directed graph in layers, parents above their children
+
+    The steps are the usual Sugiyama ones: break cycles, assign layers by
+    longest path (leaves on the bottom layer, as _assign_node_ranks does for
+    BLFs), add dummy nodes so edges only join adjacent layers, reduce
+    crossings with barycentre sweeps, then place nodes horizontally near the
+    average of their neighbours.
+
+    Parameters
+    ----------
+    nodes : list
+        the node names
+    edges : list
+        (parent, child) pairs which decide the layers
+    widths : dict
+        node name -> width of the node
+    sweeps : int, default 4
+        the number of crossing reduction sweeps each way
+
+    Returns
+    -------
+    dict: node name -> (x, y) of its centre
+    dict: edge index -> list of (x, y) bend points through the dummy nodes
+    tuple: the (width, height) of the drawing
+    """
+    children = {name: [] for name in nodes}
+    for parent, child in edges:
+        if parent in children and child in children:
+            children[parent].append(child)
+
+    acyclic = _breakCycles(nodes, children)
+    layer = _assignLayers(nodes, acyclic)
+
+    #adds dummy nodes so every edge joins adjacent layers
+    layers = [[] for _ in range(max(layer.values(), default=0) + 1)]
+    for name in nodes:
+        layers[layer[name]].append(name)
+
+    up = {name: [] for name in nodes}
+    down = {name: [] for name in nodes}
+    chains = {}
+    for index, (parent, child) in enumerate(edges):
+        if parent not in layer or child not in layer:
+            continue
+        top, bottom = (parent, child) if layer[parent] < layer[child] else (child, parent)
+        previous = top
+        chain = []
+        for level in range(layer[top] + 1, layer[bottom]):
+            dummy = ('dummy', index, level)
+            layers[level].append(dummy)
+            up[dummy] = [previous]
+            down[dummy] = []
+            down[previous].append(dummy)
+            chain.append(dummy)
+            previous = dummy
+        if previous != bottom:
+            down[previous].append(bottom)
+            up[bottom].append(previous)
+        chains[index] = chain if top == parent else list(reversed(chain))
+
+    _orderLayers(layers, up, down, sweeps)
+
+    #dummy nodes take no space
+    width = {name: 0 if isinstance(name, tuple) else widths.get(name, MIN_NODE_WIDTH)
+             for layer_nodes in layers for name in layer_nodes}
+    x = _placeLayers(layers, up, down, width)
+
+    positions = {}
+    for level, layer_nodes in enumerate(layers):
+        y = MARGIN + NODE_HEIGHT / 2 + level * LAYER_GAP
+        for name in layer_nodes:
+            positions[name] = (x[name], y)
+
+    #shifts the drawing so its left edge is at the margin
+    left = min((positions[name][0] - width[name] / 2 for name in positions), default=0)
+    shift = MARGIN - left
+    positions = {name: (px + shift, py) for name, (px, py) in positions.items()}
+    right = max((positions[name][0] + width[name] / 2 for name in positions), default=0)
+
+    routes = {index: [positions[dummy] for dummy in chain] for index, chain in chains.items()}
+    node_positions = {name: positions[name] for name in nodes}
+    size = (right + MARGIN, 2 * MARGIN + NODE_HEIGHT + (len(layers) - 1) * LAYER_GAP)
+    return node_positions, routes, size
+
+
+def _breakCycles(nodes, children):
+    """
+    returns the children of each node with the edges closing a cycle removed
+    """
+    acyclic = {name: [] for name in nodes}
+    state = {}
+    for start in nodes:
+        if start in state:
+            continue
+        state[start] = 'open'
+        stack = [(start, iter(children[start]))]
+        while stack:
+            name, remaining = stack[-1]
+            child = next(remaining, None)
+            if child is None:
+                state[name] = 'done'
+                stack.pop()
+            elif state.get(child) == 'open':
+                continue
+            else:
+                acyclic[name].append(child)
+                if child not in state:
+                    state[child] = 'open'
+                    stack.append((child, iter(children[child])))
+    return acyclic
+
+
+def _assignLayers(nodes, children):
+    """
+    assigns each node the length of the longest path to it from a root, with leaves on the bottom layer
+    """
+    indegree = {name: 0 for name in nodes}
+    for name in nodes:
+        for child in children[name]:
+            indegree[child] += 1
+
+    layer = {name: 0 for name in nodes}
+    ready = [name for name in nodes if indegree[name] == 0]
+    while ready:
+        name = ready.pop()
+        for child in children[name]:
+            layer[child] = max(layer[child], layer[name] + 1)
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                ready.append(child)
+
+    bottom = max(layer.values(), default=0)
+    for name in nodes:
+        if not children[name]:
+            layer[name] = bottom
+    return layer
+
+
+def _orderLayers(layers, up, down, sweeps):
+    """
+    reorders each layer by the barycentre of its neighbours to reduce edge crossings
+    """
+    def reorder(layer_nodes, neighbours, previous_layer):
+        index = {name: i for i, name in enumerate(previous_layer)}
+        def barycentre(item):
+            i, name = item
+            placed = [index[other] for other in neighbours[name] if other in index]
+            return (sum(placed) / len(placed)) if placed else i
+        layer_nodes[:] = [name for _, name in sorted(enumerate(layer_nodes), key=barycentre)]
+
+    for _ in range(sweeps):
+        for level in range(1, len(layers)):
+            reorder(layers[level], up, layers[level - 1])
+        for level in range(len(layers) - 2, -1, -1):
+            reorder(layers[level], down, layers[level + 1])
+
+
+def _placeLayers(layers, up, down, width):
+    """
+    gives each node an x coordinate, keeping the layer order and spacing while
+    pulling nodes towards the average x of their neighbours
+    """
+    x = {}
+    for layer_nodes in layers:
+        cursor = 0
+        for name in layer_nodes:
+            x[name] = cursor + width[name] / 2
+            cursor += width[name] + NODE_GAP
+
+    def separate(layer_nodes, wanted):
+        #places nodes as close to where they want to be as the spacing allows, from both sides
+        forward = {}
+        limit = float('-inf')
+        for name in layer_nodes:
+            forward[name] = max(wanted[name], limit + width[name] / 2)
+            limit = forward[name] + width[name] / 2 + NODE_GAP
+        backward = {}
+        limit = float('inf')
+        for name in reversed(layer_nodes):
+            backward[name] = min(wanted[name], limit - width[name] / 2)
+            limit = backward[name] - width[name] / 2 - NODE_GAP
+        for name in layer_nodes:
+            x[name] = (forward[name] + backward[name]) / 2
+        #averaging can leave overlaps, so a last forward pass restores the spacing
+        limit = float('-inf')
+        for name in layer_nodes:
+            x[name] = max(x[name], limit + width[name] / 2)
+            limit = x[name] + width[name] / 2 + NODE_GAP
+
+    for _ in range(4):
+        for level in range(1, len(layers)):
+            separate(layers[level], {name: _mean([x[other] for other in up[name]], x[name]) for name in layers[level]})
+        for level in range(len(layers) - 2, -1, -1):
+            separate(layers[level], {name: _mean([x[other] for other in down[name]], x[name]) for name in layers[level]})
+    return x
+
+
+def _mean(values, default):
+    return sum(values) / len(values) if values else default
+
+
+def node_width(label):
+    """
+    returns the width of a node for a label, the longest line deciding it
+    """
+    longest = max((len(line) for line in label.split('\\n')), default=0)
+    return max(MIN_NODE_WIDTH, longest * CHAR_WIDTH + 24)
+
+
+def write_svg(elements, out, title=''):
+    """
+    lays out graph elements and writes them as SVG
+
+    Parameters
+    ----------
+    elements : iterable
+        ('node', name, attributes) and ('edge', (source, target), attributes) as
+        yielded by ADF._graphElements
+    out : file-like
+        where the SVG is written
+    title : str, optional
+        the title of the drawing
+    """
+    nodes = {}
+    edges = []
+    for kind, key, attrs in elements:
+        if kind == 'node':
+            nodes[key] = attrs
+        else:
+            edges.append((key, attrs))
+
+    #dotted dependency edges are drawn but do not decide the layers
+    structural = [key if attrs.get('style') != 'dotted' else (None, None) for key, attrs in edges]
+    widths = {name: node_width(str(attrs.get('label', name))) for name, attrs in nodes.items()}
+    positions, routes, (width, height) = layered_layout(list(nodes), structural, widths)
+
+    out.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.0f}pt" height="{height:.0f}pt" '
+              f'viewBox="0 0 {width:.1f} {height:.1f}">\n')
+    if title:
+        out.write(f'<title>{escape(title)}</title>\n')
+    out.write('<g font-family="Times,serif" font-size="14" text-anchor="middle">\n')
+
+    for index, ((source, target), attrs) in enumerate(edges):
+        if source not in positions or target not in positions:
+            continue
+        points = [_boundary(positions[source], positions[target])] + routes.get(index, []) + \
+                 [_boundary(positions[target], positions[source])]
+        dash = ' stroke-dasharray="2,4"' if attrs.get('style') in ('dotted', 'dashed') else ''
+        colour = escape(str(attrs.get('color', 'black')))
+        out.write(f'<polyline fill="none" stroke="{colour}"{dash} points="{_points(points)}"/>\n')
+        if attrs.get('label'):
+            mx, my = _midpoint(points)
+            out.write(f'<text x="{mx + 6:.1f}" y="{my:.1f}">{escape(str(attrs["label"]))}</text>\n')
+
+    for name, attrs in nodes.items():
+        cx, cy = positions[name]
+        colour = escape(str(attrs.get('color', 'black')))
+        dash = ' stroke-dasharray="4,3"' if attrs.get('style') == 'dashed' else ''
+        half = widths[name] / 2
+        if attrs.get('shape') in ('box', 'folder'):
+            out.write(f'<rect x="{cx - half:.1f}" y="{cy - NODE_HEIGHT / 2:.1f}" width="{2 * half:.1f}" '
+                      f'height="{NODE_HEIGHT}" fill="white" stroke="{colour}"{dash}/>\n')
+        else:
+            out.write(f'<ellipse cx="{cx:.1f}" cy="{cy:.1f}" rx="{half:.1f}" ry="{NODE_HEIGHT / 2:.1f}" '
+                      f'fill="white" stroke="{colour}"{dash}/>\n')
+        lines = str(attrs.get('label', name)).split('\\n')
+        first = cy - (len(lines) - 1) * 8 + 5
+        for i, line in enumerate(lines):
+            out.write(f'<text x="{cx:.1f}" y="{first + i * 16:.1f}">{escape(line)}</text>\n')
+
+    out.write('</g>\n</svg>\n')
+
+
+def _boundary(centre, towards):
+    """
+    returns where the line from a node's centre towards a point leaves the top or bottom of the node
+    """
+    cx, cy = centre
+    if towards[1] > cy:
+        return (cx, cy + NODE_HEIGHT / 2)
+    if towards[1] < cy:
+        return (cx, cy - NODE_HEIGHT / 2)
+    return (cx, cy)
+
+
+def _midpoint(points):
+    middle = len(points) // 2
+    (x1, y1), (x2, y2) = points[middle - 1], points[middle]
+    return (x1 + x2) / 2, (y1 + y2) / 2
+
+
+def _points(points):
+    return ' '.join(f'{x:.1f},{y:.1f}' for x, y in points)
@@ -9,9 +9,12 @@ from MainClasses import *
 from inventive_step_ADM import create_sub_adm_1, create_sub_adm_2, adf
 import UI
 from UI import CLI
+import academic_research_ADM
+import inventive_step_ADM
 import builtins
 import sys
 import io
+import json
 from contextlib import redirect_stdout
 
 class TestSubADMEvaluation(unittest.TestCase):
@@ -2587,6 +2590,1603 @@ class TestDependencyEvaluation(unittest.TestCase):
     # Note: Sub-ADM tests removed because those nodes are in sub_adf, not the main adf
     # The evaluateDependency method only works with nodes in the main ADF
 
+class TestSessionCheckpoint(unittest.TestCase):
+    """Unit tests for checkpointing and resuming an interactive session"""
+    
+    # research type, two methods, NOVELTY, DATA_ANALYSIS, sources, then two questions per item
+    ANSWERS = ["3", "survey", "interviews", "y", "y", "a", "b, c", "y", "n", "n", "y"]
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        import tempfile
+        self.original_input = builtins.input
+        handle, self.path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(handle)
+    
+    def tearDown(self):
+        """Clean up after tests"""
+        builtins.input = self.original_input
+        os.remove(self.path)
+    
+    def run_session(self, answers, cli, resume=False):
+        """Runs a session, stopping with KeyboardInterrupt when the answers run out"""
+        answers = iter(answers)
+        def mock_input(prompt=""):
+            try:
+                return next(answers)
+            except StopIteration:
+                raise KeyboardInterrupt()
+        builtins.input = mock_input
+        
+        with redirect_stdout(io.StringIO()):
+            if resume:
+                cli.resume_session(self.path)
+            else:
+                cli.adf = academic_research_ADM.adf()
+                cli.domain = 'academic_research'
+                cli.query_domain()
+        return cli
+    
+    def test_resume_after_crash_matches_uninterrupted_session(self):
+        """Test: a session killed mid sub-ADM resumes to the same final case"""
+        full = self.run_session(self.ANSWERS, CLI(self.path))
+        
+        # Dies while answering the second sub-ADM item
+        with self.assertRaises(KeyboardInterrupt):
+            self.run_session(self.ANSWERS[:9], CLI(self.path))
+        
+        # Only the two answers for the unfinished item are needed to finish
+        resumed = self.run_session(self.ANSWERS[9:], CLI(), resume=True)
+        
+        self.assertEqual(set(resumed.case), set(full.case))
+        self.assertEqual(resumed.adf.getFact('INFORMATION', 'research_type'), None)
+        self.assertEqual(resumed.adf.getFact('QUANTITATIVE', 'QUANTITATIVE_method'), 'survey')
+        self.assertEqual(resumed.adf.getFact('PRIMARY_SOURCES', 'items'), ['b', 'c'])
+    
+    def test_journal_records_only_changes(self):
+        """Test: each question line carries only the factors it added"""
+        import json
+        self.run_session(self.ANSWERS, CLI(self.path))
+        
+        with open(self.path) as f:
+            records = [json.loads(line) for line in f]
+        
+        self.assertEqual(records[0]['event'], 'start')
+        questions = [r for r in records if r['event'] == 'question']
+        self.assertEqual(questions[0]['name'], 'research_type')
+        self.assertEqual(set(questions[0]['case']), {'QUANTITATIVE', 'QUALITATIVE'})
+        self.assertEqual(questions[1]['case'], ['NOVELTY'])
+        self.assertEqual(len([r for r in records if r['event'] == 'item']), 2)
+    
+    def test_partial_final_line_is_ignored(self):
+        """Test: a truncated last line from a crash does not break loading"""
+        from checkpoint import SessionCheckpoint
+        with self.assertRaises(KeyboardInterrupt):
+            self.run_session(self.ANSWERS[:4], CLI(self.path))
+        with open(self.path, 'a') as f:
+            f.write('{"event": "question", "na')
+        
+        checkpoint = SessionCheckpoint.load(self.path)
+        checkpoint.close()
+        self.assertEqual(checkpoint.state['completed'], ['research_type', 'NOVELTY'])
+        with open(self.path) as f:
+            self.assertTrue(f.read().endswith('\n'))
+    
+    def test_flow_notes_are_printed(self):
+        """Test: the CLI prints what the question flow reports between questions"""
+        # quantitative only, so DATA_ANALYSIS is skipped, then no sources are given
+        answers = iter(["1", "survey", "n", "", ""])
+        builtins.input = lambda prompt="": next(answers)
+        cli = CLI()
+        cli.adf = academic_research_ADM.adf()
+        
+        output = io.StringIO()
+        with redirect_stdout(output):
+            cli.query_domain()
+        
+        self.assertIn("Skipping DATA_ANALYSIS - dependencies cannot be satisfied", output.getvalue())
+        self.assertIn("No items found to evaluate for PRIMARY_SOURCES", output.getvalue())
+        self.assertEqual(cli.case, ['QUANTITATIVE'])
+
+class TestAssessmentService(unittest.TestCase):
+    """Unit tests for the non-blocking question flow and the assessment service"""
+    
+    # as TestSessionCheckpoint, but the sub-ADM items are given as a list directly
+    ANSWERS = ["3", "survey", "interviews", "y", "y", "b, c", "y", "n", "n", "y"]
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        from assessment_service import AssessmentService
+        self.service = AssessmentService()
+    
+    def answer_all(self, session_id, answers):
+        """Answers each question in turn, returning the final state"""
+        state = self.service.next_question(session_id)
+        with redirect_stdout(io.StringIO()):
+            for answer in answers:
+                state = self.service.answer(session_id, answer)
+        return state
+    
+    def test_session_matches_cli(self):
+        """Test: a service session reaches the same case as the CLI with the same answers"""
+        original_input = builtins.input
+        cli_answers = iter(TestSessionCheckpoint.ANSWERS)
+        builtins.input = lambda prompt="": next(cli_answers)
+        try:
+            cli = CLI()
+            cli.adf = academic_research_ADM.adf()
+            with redirect_stdout(io.StringIO()):
+                cli.query_domain()
+        finally:
+            builtins.input = original_input
+        
+        session_id = self.service.create_session('academic_research')['session']
+        state = self.answer_all(session_id, self.ANSWERS)
+        
+        self.assertTrue(state['done'])
+        self.assertEqual(set(self.service.outcome(session_id)['case']), set(cli.case))
+        with redirect_stdout(io.StringIO()):
+            explanation = self.service.explanation(session_id)
+        self.assertEqual(explanation['facts']['PRIMARY_SOURCES']['items'], ['b', 'c'])
+        self.assertEqual(explanation['minimal']['statements'][-1], explanation['statements'][-1])
+        self.assertTrue(set(explanation['minimal']['present']) <= set(explanation['case']))
+    
+    def test_sessions_do_not_share_state(self):
+        """Test: interleaved sessions on one shared model keep their own case and facts"""
+        first = self.service.create_session('academic_research')['session']
+        second = self.service.create_session('academic_research')['session']
+        
+        with redirect_stdout(io.StringIO()):
+            self.service.answer(first, "1")
+            self.service.answer(second, "2")
+            self.service.answer(first, "survey")
+            self.service.answer(second, "interviews")
+        
+        model = self.service.model('academic_research')
+        first_adf = self.service.sessions[first].adf
+        second_adf = self.service.sessions[second].adf
+        self.assertEqual(self.service.sessions[first].flow.case, ['QUANTITATIVE'])
+        self.assertEqual(self.service.sessions[second].flow.case, ['QUALITATIVE'])
+        self.assertEqual(first_adf.getFact('QUANTITATIVE', 'QUANTITATIVE_method'), 'survey')
+        self.assertIsNone(second_adf.getFact('QUANTITATIVE', 'QUANTITATIVE_method'))
+        self.assertIsNone(model.getFact('QUANTITATIVE', 'QUANTITATIVE_method'))
+        self.assertIs(first_adf.nodes, model.nodes)
+        self.assertIs(first_adf.compiledADF(), model.compiledADF())
+        self.assertIs(second_adf.compiledADF(), model.compiledADF())
+    
+    def test_sub_adm_results_stay_in_session(self):
+        """Test: the sub-ADM results of one session reach neither the shared nodes nor another session"""
+        first = self.service.create_session('academic_research')['session']
+        second = self.service.create_session('academic_research')['session']
+        self.answer_all(first, self.ANSWERS)
+        
+        model = self.service.model('academic_research')
+        first_facts = self.service.sessions[first].adf.facts
+        self.assertEqual(set(first_facts['PRIMARY_SOURCES']['sub_adf_results']), {'b', 'c'})
+        self.assertNotIn('PRIMARY_SOURCES', self.service.sessions[second].adf.facts)
+        self.assertNotIn('PRIMARY_SOURCES', getattr(model, 'facts', {}))
+        self.assertFalse(hasattr(model.nodes['PRIMARY_SOURCES'], 'sub_adf_results'))
+    
+    def test_facts_copied_all_the_way_down(self):
+        """Test: a session changing a fact in place leaves the model's copy alone"""
+        model = self.service.model('academic_research')
+        model.setFact('INFORMATION', 'sources', ['a'])
+        view = model.sessionView()
+        view.facts['INFORMATION']['sources'].append('b')
+        self.assertEqual(model.getFact('INFORMATION', 'sources'), ['a'])
+    
+    def test_explanation_shares_plan(self):
+        """Test: the explanation reuses the model's plan but reads the session's own facts"""
+        from compiled_adf import CompiledADF
+        from explanation import explain
+        session_id = self.service.create_session('academic_research')['session']
+        self.answer_all(session_id, self.ANSWERS)
+        session = self.service.sessions[session_id]
+        adf = session.adf
+        model = self.service.model('academic_research')
+        with redirect_stdout(io.StringIO()):
+            explanation = self.service.explanation(session_id)
+            own = CompiledADF(adf)
+            expected = explain(adf, [factor for factor in session.flow.case if factor not in own.conditions], compiled=own)
+        
+        self.assertIs(adf.compiledADF(), model.compiledADF())
+        self.assertEqual(explanation['minimal']['statements'], expected['statements'])
+        self.assertEqual(explanation['minimal']['present'], expected['present'])
+    
+    def test_invalid_answer_repeats_question(self):
+        """Test: an invalid answer returns the same question with an error"""
+        session_id = self.service.create_session('academic_research')['session']
+        state = self.service.answer(session_id, "7")
+        
+        self.assertEqual(state['question']['name'], 'research_type')
+        self.assertIn('error', state['question'])
+        with self.assertRaises(ValueError):
+            self.service.outcome(session_id)
+    
+    def test_close_and_unknown_sessions(self):
+        """Test: closed or unknown sessions raise KeyError"""
+        session_id = self.service.create_session('wild_animals')['session']
+        self.service.close(session_id)
+        
+        with self.assertRaises(KeyError):
+            self.service.next_question(session_id)
+        with self.assertRaises(KeyError):
+            self.service.create_session('unknown_domain')
+
+class TestAsyncQuestionFlow(unittest.TestCase):
+    """Unit tests for driving the question flow from an event loop"""
+    
+    def test_typed_questions_are_yielded(self):
+        """Test: each kind of question is yielded as its own type"""
+        import asyncio
+        from question_flow import QuestionFlow, ChoiceQuestion, FactQuestion, YesNoQuestion, ItemsQuestion, replay
+        
+        flow = QuestionFlow(academic_research_ADM.adf())
+        with redirect_stdout(io.StringIO()):
+            asked = asyncio.run(replay(flow, TestAssessmentService.ANSWERS))
+        
+        self.assertEqual([type(question) for question in asked[:6]],
+                         [ChoiceQuestion, FactQuestion, FactQuestion, YesNoQuestion, YesNoQuestion, ItemsQuestion])
+        self.assertEqual(asked[0].to_dict()['options'], ['quantitative', 'qualitative', 'both'])
+        self.assertEqual(asked[6].context, {'blf': 'PRIMARY_SOURCES', 'item': 'b'})
+        self.assertTrue(flow.done)
+        self.assertIn('PRIMARY_SOURCES', flow.case)
+    
+    def test_many_sessions_on_one_loop(self):
+        """Test: many interleaved flows on one event loop reach the expected cases"""
+        import asyncio
+        from question_flow import QuestionFlow, replay
+        
+        model = academic_research_ADM.adf()
+        answers = {"1": ['QUANTITATIVE'], "2": ['QUALITATIVE']}
+        
+        async def run_all():
+            flows = [QuestionFlow(model.sessionView()) for _ in range(50)]
+            # answers run out before the sub-ADM items so the sessions are left mid-flow
+            await asyncio.gather(*[replay(flow, [str(i % 2 + 1), "x", "n", "n"])
+                                   for i, flow in enumerate(flows)])
+            return flows
+        
+        with redirect_stdout(io.StringIO()):
+            flows = asyncio.run(run_all())
+        
+        for i, flow in enumerate(flows):
+            self.assertEqual(flow.case, answers[str(i % 2 + 1)])
+            self.assertFalse(flow.done)
+    
+    def test_invalid_answer_is_asked_again(self):
+        """Test: an invalid answer yields the same question with an error"""
+        import asyncio
+        from question_flow import QuestionFlow, replay
+        
+        flow = QuestionFlow(academic_research_ADM.adf())
+        asked = asyncio.run(replay(flow, ["maybe"]))
+        
+        self.assertEqual(asked[1].name, 'research_type')
+        self.assertEqual(asked[1].error, "Invalid input. Please enter a number.")
+        self.assertIsNone(asked[0].error)
+    
+    def test_skips_are_noted_on_the_next_question(self):
+        """Test: what the flow skips is carried by the next question rather than printed"""
+        import asyncio
+        from question_flow import QuestionFlow, replay
+        
+        flow = QuestionFlow(academic_research_ADM.adf())
+        output = io.StringIO()
+        with redirect_stdout(output):
+            # quantitative only, so DATA_ANALYSIS cannot have its dependency, then no items
+            asked = asyncio.run(replay(flow, ["1", "survey", "n", ""]))
+        
+        self.assertEqual(asked[3].to_dict()['notes'], ["Skipping DATA_ANALYSIS - dependencies cannot be satisfied"])
+        self.assertNotIn('notes', asked[2].to_dict())
+        self.assertEqual(flow.notes, ["No items found to evaluate for PRIMARY_SOURCES"])
+        self.assertNotIn("Skipping", output.getvalue())
+
+class TestVisualiseNetwork(unittest.TestCase):
+    """Unit tests for building the graph of an ADF"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        with redirect_stdout(io.StringIO()):
+            self.adf = inventive_step_ADM.adf()
+    
+    def test_each_node_added_once(self):
+        """Test: every node and child appears exactly once in the graph"""
+        with redirect_stdout(io.StringIO()):
+            G = self.adf.visualiseNetwork()
+        
+        names = [node.get_name() for node in G.get_node_list()]
+        self.assertEqual(len(names), len(set(names)))
+        self.assertTrue(set(self.adf.nodes).issubset(names))
+    
+    def test_edges_match_children_and_dependencies(self):
+        """Test: one edge per child and one dotted edge per dependency"""
+        with redirect_stdout(io.StringIO()):
+            G = self.adf.visualiseNetwork()
+        
+        children = sum(len(node.children or []) for node in self.adf.nodes.values())
+        edges = G.get_edge_list()
+        dotted = [edge for edge in edges if edge.get_style() == 'dotted']
+        self.assertEqual(len(edges) - len(dotted), children)
+        self.assertEqual(len(dotted), len(self.adf._dependencyEdges()))
+    
+    def test_case_colours_nodes(self):
+        """Test: with a case, accepted nodes are green and the rest red"""
+        case = ['ReliableTechnicalEffect']
+        with redirect_stdout(io.StringIO()):
+            G = self.adf.visualiseNetwork(list(case))
+        
+        colours = {node.get_name(): node.get_color() for node in G.get_node_list()}
+        self.assertEqual(colours['ReliableTechnicalEffect'], 'green')
+        self.assertEqual(colours['InvStep'], 'red')
+
+class TestDotWriter(unittest.TestCase):
+    """Unit tests for streaming DOT output"""
+    
+    def test_statements_and_quoting(self):
+        """Test: nodes, edges and clusters are written with quoted names"""
+        from dot_writer import DotWriter
+        out = io.StringIO()
+        with DotWriter(out, 'G', rankdir='TB') as writer:
+            with writer.cluster('cluster_a', label='A'):
+                writer.node('say "hi"', color='red')
+            writer.edge('x', 'y', label='+')
+            writer.rank(['x', 'y'])
+        
+        self.assertEqual(out.getvalue(),
+                         'graph "G" {\n'
+                         '\trankdir="TB";\n'
+                         '\tsubgraph "cluster_a" {\n'
+                         '\t\tlabel="A";\n'
+                         '\t\t"say \\"hi\\"" [color="red"];\n'
+                         '\t}\n'
+                         '\t"x" -- "y" [label="+"];\n'
+                         '\t{rank=same; "x"; "y";}\n'
+                         '}\n')
+    
+    def test_write_dot_matches_visualise_network(self):
+        """Test: the streamed graph has the same nodes, colours and edges as visualiseNetwork"""
+        case = ['ReliableTechnicalEffect']
+        with redirect_stdout(io.StringIO()):
+            G = inventive_step_ADM.adf().visualiseNetwork(list(case))
+            out = io.StringIO()
+            inventive_step_ADM.adf().writeDot(out, list(case))
+        H = pydot.graph_from_dot_data(out.getvalue())[0]
+        
+        def colours(graph):
+            return {node.get_name().strip('"'): node.get_color().strip('"') for node in graph.get_node_list()}
+        
+        def edges(graph):
+            return sorted((edge.get_source().strip('"'), edge.get_destination().strip('"'),
+                           str(edge.get_label()).strip('"'), str(edge.get_style()).strip('"'))
+                          for edge in graph.get_edge_list())
+        
+        self.assertEqual(colours(H), colours(G))
+        self.assertEqual(edges(H), edges(G))
+    
+    def test_write_dot_with_sub_adms(self):
+        """Test: sub-ADMs are streamed as clusters linked from their SubADMBLFs"""
+        out = io.StringIO()
+        with redirect_stdout(io.StringIO()):
+            academic_research_ADM.adf().writeDot(out, sub_adms=True)
+        dot = out.getvalue()
+        
+        self.assertIn('subgraph "cluster_sub_1" {', dot)
+        self.assertIn('"PRIMARY_SOURCES" -- "sub_model_label_1" [style="dashed", color="red", penwidth="0.5"];', dot)
+        self.assertTrue(dot.endswith('}\n'))
+
+class TestRenderPipeline(unittest.TestCase):
+    """Unit tests for skipping unchanged renders"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        import tempfile
+        self.directory = tempfile.mkdtemp()
+        self.base = os.path.join(self.directory, 'graph')
+        self.source = 'graph "G" {\n\t"a" -- "b";\n}\n'
+    
+    def tearDown(self):
+        """Clean up after tests"""
+        import shutil
+        shutil.rmtree(self.directory)
+    
+    def record_render(self, source, formats):
+        """Writes outputs and a hash as a previous render would have"""
+        from render_pipeline import source_hash
+        for fmt in formats:
+            with open(f"{self.base}.{fmt}", 'w') as f:
+                f.write('image')
+        with open(f"{self.base}.dothash", 'w') as f:
+            f.write(source_hash(source, formats) + '\n')
+    
+    def test_unchanged_source_is_skipped(self):
+        """Test: a graph whose DOT source matches the recorded hash is not rendered again"""
+        from render_pipeline import render, render_all
+        self.record_render(self.source, ('png', 'svg'))
+        
+        self.assertFalse(render(self.source, self.base, ('png', 'svg')))
+        self.assertEqual(render_all([(self.source, self.base, ('png', 'svg'))]), {self.base: False})
+    
+    def test_changes_invalidate_hash(self):
+        """Test: a changed source, a new format or a missing output needs a new render"""
+        from render_pipeline import is_current
+        self.record_render(self.source, ('png', 'svg'))
+        
+        self.assertTrue(is_current(self.source, self.base, ('png', 'svg')))
+        self.assertFalse(is_current(self.source.replace('"b"', '"c"'), self.base, ('png', 'svg')))
+        self.assertFalse(is_current(self.source, self.base, ('png', 'svg', 'pdf')))
+        os.remove(f"{self.base}.svg")
+        self.assertFalse(is_current(self.source, self.base, ('png', 'svg')))
+    
+    def test_dot_source_of_graphs(self):
+        """Test: pydot graphs and ADFs are converted to DOT source"""
+        from render_pipeline import dot_source
+        with redirect_stdout(io.StringIO()):
+            adf = academic_research_ADM.adf()
+            self.assertTrue(dot_source(adf).startswith('graph "Academic Research Project" {'))
+        self.assertIn('"a" -- "b"', dot_source(pydot.graph_from_dot_data(self.source)[0]))
+
+class TestLayoutCache(unittest.TestCase):
+    """Unit tests for reusing one layout across case renders"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        import tempfile
+        self.directory = tempfile.mkdtemp()
+        with redirect_stdout(io.StringIO()):
+            self.adf = academic_research_ADM.adf()
+    
+    def tearDown(self):
+        """Clean up after tests"""
+        import shutil
+        shutil.rmtree(self.directory)
+    
+    def test_structural_hash(self):
+        """Test: the hash is stable for a model and changes when its structure changes"""
+        with redirect_stdout(io.StringIO()):
+            other = academic_research_ADM.adf()
+        self.assertEqual(self.adf.structuralHash(), other.structuralHash())
+        
+        other.addNodes("EXTRA", ["NOVELTY"], ["extra", "no extra"])
+        self.assertNotEqual(self.adf.structuralHash(), other.structuralHash())
+    
+    def test_parse_layout(self):
+        """Test: node positions and edge splines are read from Graphviz JSON in edge order"""
+        from layout_cache import parseLayout
+        layout = parseLayout({
+            'bb': '0,0,100,100',
+            'objects': [{'_gvid': 0, 'name': '%3', 'rank': 'same', 'nodes': [1]},
+                        {'_gvid': 1, 'name': 'a', 'pos': '10,20', 'width': '0.75', 'height': '0.5'},
+                        {'_gvid': 2, 'name': 'b', 'pos': '30,40', 'width': '0.75', 'height': '0.5'}],
+            'edges': [{'_gvid': 1, 'tail': 2, 'head': 1, 'pos': 'e,2'},
+                      {'_gvid': 0, 'tail': 1, 'head': 2, 'pos': 'e,1', 'lp': '5,5'}]
+        })
+        
+        self.assertEqual(layout['nodes']['a'], {'pos': '10,20', 'width': '0.75', 'height': '0.5'})
+        self.assertNotIn('%3', layout['nodes'])
+        self.assertEqual(layout['edges'], [{'pos': 'e,1', 'lp': '5,5'}, {'pos': 'e,2'}])
+    
+    def test_case_dot_reuses_cached_layout(self):
+        """Test: a case is written with the cached positions and its own colours"""
+        import json
+        from layout_cache import LayoutCache
+        cache = LayoutCache(self.directory)
+        
+        edge_count = len(self.adf._childEdges()) + len(self.adf._dependencyEdges())
+        layout = {'bb': '0,0,500,300',
+                  'nodes': {name: {'pos': f'{i},0', 'width': '1', 'height': '0.5'}
+                            for i, name in enumerate(self.adf._graphNodeNames())},
+                  'edges': [{'pos': f'e,{i}'} for i in range(edge_count)]}
+        with open(cache.path(self.adf), 'w') as f:
+            json.dump(layout, f)
+        
+        out = io.StringIO()
+        with redirect_stdout(io.StringIO()):
+            cache.writeCaseDot(self.adf, out, ['NOVELTY'])
+        dot = out.getvalue()
+        
+        self.assertIn('bb="0,0,500,300";', dot)
+        self.assertIn('"NOVELTY" [label="NOVELTY", color="green", pos="3,0", width="1", height="0.5"];', dot)
+        self.assertIn('"QUANTITATIVE" [label="QUANTITATIVE", color="red", pos="1,0"', dot)
+        self.assertIn(f'pos="e,{edge_count - 1}"', dot)
+
+class TestEdgePolarity(unittest.TestCase):
+    """Unit tests for the static support/attack polarity of edges"""
+    
+    def test_attacking_children(self):
+        """Test: only direct operands of not and reject attack"""
+        self.assertEqual(Node.attackingChildren('a not b and'), {'a'})
+        self.assertEqual(Node.attackingChildren('a reject'), {'a'})
+        self.assertEqual(Node.attackingChildren('a b and not'), set())
+        self.assertEqual(Node.attackingChildren('accept'), set())
+    
+    def test_polarity_is_per_edge(self):
+        """Test: a child negated under one parent still supports another"""
+        import WildAnimals
+        adf = WildAnimals.adf()
+        table = {(parent, child): polarity for parent, child, polarity in adf.edgeTable()}
+        
+        self.assertEqual(table[('PMotive', 'DLiving')], '-')
+        self.assertEqual(table[('DMotive', 'DLiving')], '+')
+        self.assertEqual(table[('DMotive', 'Malice')], '-')
+    
+    def test_visualisation_without_case_does_not_evaluate(self):
+        """Test: graphs without a case are labelled without running evaluateTree"""
+        import WildAnimals
+        adf = WildAnimals.adf()
+        adf.evaluateTree = None
+        
+        G = adf.visualiseNetwork()
+        labels = {(edge.get_source(), edge.get_destination()): edge.get_label() for edge in G.get_edge_list()}
+        self.assertEqual(labels[('DMotive', 'Malice')], '-')
+
+class TestCollapsedView(unittest.TestCase):
+    """Unit tests for the level-of-detail view of large models"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        with redirect_stdout(io.StringIO()):
+            self.adf = inventive_step_ADM.adf()
+    
+    def test_depth_limits_nodes(self):
+        """Test: each extra level shows more nodes, and no limit shows them all"""
+        sizes = [len(self.adf.collapsedView(depth=depth)[0]) for depth in [0, 1, 2]]
+        self.assertEqual(sizes, sorted(sizes))
+        
+        shown, summaries = self.adf.collapsedView(depth=None)
+        self.assertEqual(shown, set(self.adf._graphNodeNames()))
+        self.assertEqual(summaries, {})
+    
+    def test_summaries_count_hidden_nodes(self):
+        """Test: a summary node counts the distinct nodes hidden beneath it"""
+        shown, summaries = self.adf.collapsedView(depth=1)
+        
+        for name, hidden in summaries.items():
+            self.assertEqual(hidden, len(self.adf._descendants(name) - shown))
+            self.assertGreater(hidden, 0)
+    
+    def test_node_budget(self):
+        """Test: the node budget is not exceeded unless a node is expanded"""
+        shown, _ = self.adf.collapsedView(max_nodes=20)
+        self.assertLessEqual(len(shown), 20)
+        
+        _, summaries = self.adf.collapsedView(depth=1)
+        collapsed = next(iter(summaries))
+        shown, summaries = self.adf.collapsedView(depth=1, expand=[collapsed])
+        self.assertNotIn(collapsed, summaries)
+        self.assertTrue(set(self.adf.nodes[collapsed].children).issubset(shown))
+    
+    def test_expand_subtree(self):
+        """Test: a subtree is drawn on its own, with only its nodes and edges"""
+        G = self.adf.visualiseNetworkCollapsed(root='Obvious', depth=None)
+        names = {node.get_name() for node in G.get_node_list()}
+        
+        self.assertEqual(names, self.adf._descendants('Obvious') | {'Obvious'})
+        for edge in G.get_edge_list():
+            self.assertIn(edge.get_source(), names)
+            self.assertIn(edge.get_destination(), names)
+    
+    def test_collapsed_dot(self):
+        """Test: summary nodes are drawn as folders with their hidden count"""
+        out = io.StringIO()
+        self.adf.writeCollapsedDot(out, root='Obvious', depth=1)
+        
+        self.assertIn('"SecondaryIndicator" [label="SecondaryIndicator\\n(+28 nodes)", color="black", '
+                      'shape="folder", style="dashed"];', out.getvalue())
+
+class TestSVGLayout(unittest.TestCase):
+    """Unit tests for the built-in layered layout and SVG writer"""
+    
+    def test_layers_and_spacing(self):
+        """Test: parents are above their children and nodes in a layer do not overlap"""
+        from svg_layout import layered_layout, NODE_GAP
+        with redirect_stdout(io.StringIO()):
+            adf = inventive_step_ADM.adf()
+        names = adf._graphNodeNames()
+        widths = {name: 60 + len(name) for name in names}
+        positions, routes, (width, height) = layered_layout(names, adf._childEdges(), widths)
+        
+        for parent, child in adf._childEdges():
+            self.assertLess(positions[parent][1], positions[child][1])
+        
+        rows = {}
+        for name, (x, y) in positions.items():
+            rows.setdefault(y, []).append((x - widths[name] / 2, x + widths[name] / 2))
+        for spans in rows.values():
+            spans.sort()
+            for (_, right), (left, _) in zip(spans, spans[1:]):
+                self.assertGreaterEqual(left - right, NODE_GAP - 1e-6)
+        
+        self.assertTrue(all(0 <= x <= width and 0 <= y <= height for x, y in positions.values()))
+    
+    def test_cycles_are_laid_out(self):
+        """Test: a cycle does not stop the layout"""
+        from svg_layout import layered_layout
+        positions, routes, _ = layered_layout(['a', 'b', 'c'], [('a', 'b'), ('b', 'c'), ('c', 'a')], {})
+        self.assertEqual(set(positions), {'a', 'b', 'c'})
+    
+    def test_svg_styles(self):
+        """Test: the SVG has case colours, polarity labels and dotted dependency edges"""
+        import xml.dom.minidom
+        import WildAnimals
+        out = io.StringIO()
+        WildAnimals.adf().writeSVG(out, ['Malice'])
+        svg = out.getvalue()
+        
+        xml.dom.minidom.parseString(svg)
+        self.assertIn('stroke="green"', svg)
+        self.assertIn('stroke="red"', svg)
+        self.assertIn('>-</text>', svg)
+        self.assertIn('>+</text>', svg)
+        
+        out = io.StringIO()
+        with redirect_stdout(io.StringIO()):
+            academic_research_ADM.adf().writeSVG(out)
+        self.assertIn('stroke-dasharray="2,4"', out.getvalue())
+    
+    def test_service_preview(self):
+        """Test: the service previews a session's case as SVG without changing it"""
+        from assessment_service import AssessmentService
+        service = AssessmentService()
+        session_id = service.create_session('academic_research')['session']
+        adf = service.sessions[session_id].adf
+        with redirect_stdout(io.StringIO()):
+            service.answer(session_id, "3")
+            statements = list(adf.statements)
+            svg = service.preview(session_id)
+        
+        self.assertTrue(svg.startswith('<svg'))
+        self.assertEqual(service.sessions[session_id].flow.case, ['QUANTITATIVE'])
+        self.assertEqual(adf.statements, statements)
+        self.assertFalse(hasattr(adf, 'nodeDone'))
+
+class TestGraphExport(unittest.TestCase):
+    """Unit tests for exporting the graph and its evaluation as JSON"""
+    
+    def test_structure(self):
+        """Test: nodes have their kind, edges their polarity or dependency flag"""
+        with redirect_stdout(io.StringIO()):
+            graph = academic_research_ADM.adf().exportGraph()
+        json.dumps(graph)
+        
+        kinds = {node['id']: node['kind'] for node in graph['nodes']}
+        self.assertEqual(kinds['PRIMARY_SOURCES'], 'sub_adm')
+        self.assertEqual(kinds['SECONDARY_SOURCES_EVALUATION'], 'evaluation')
+        self.assertEqual(kinds['DATA_ANALYSIS'], 'dependent')
+        self.assertEqual(kinds['MIXED_METHODS'], 'abstract')
+        self.assertTrue(all(node['accepted'] is None and node['statement'] is None for node in graph['nodes']))
+        
+        self.assertIn({'source': 'MIXED_METHODS', 'target': 'QUANTITATIVE', 'polarity': '+'}, graph['edges'])
+        self.assertTrue(any(edge.get('dependency') for edge in graph['edges']))
+    
+    def test_evaluation(self):
+        """Test: accepted states and statement indices match evaluateTree, and the case is left alone"""
+        import WildAnimals
+        adf = WildAnimals.adf()
+        adf.evaluateTree(['Capture'])
+        statements, statement_index = list(adf.statements), dict(adf.statementIndex)
+        case = ['Malice']
+        graph = adf.exportGraph(case)
+        self.assertEqual(case, ['Malice'])
+        #the ADF's own evaluation is left as it was
+        self.assertEqual(adf.statements, statements)
+        self.assertEqual(adf.statementIndex, statement_index)
+        adf.exportGraph()
+        self.assertEqual(adf.statementIndex, statement_index)
+        
+        nodes = {node['id']: node for node in graph['nodes']}
+        statements = WildAnimals.adf().evaluateTree(['Malice'])
+        for name, node in nodes.items():
+            if node['statement'] is not None:
+                self.assertIn(adf.nodes[name].statement[node['statement']], statements)
+        self.assertTrue(nodes['Malice']['accepted'])
+        self.assertFalse(nodes['HotPursuit']['accepted'])
+    
+    def test_session_clusters(self):
+        """Test: a finished service session exports a sub-ADM cluster for each item"""
+        from assessment_service import AssessmentService
+        service = AssessmentService()
+        with redirect_stdout(io.StringIO()):
+            session_id = service.create_session('academic_research')['session']
+            for answer in TestAssessmentService.ANSWERS:
+                service.answer(session_id, answer)
+            graph = service.graph(session_id)
+        json.dumps(graph)
+        
+        items = graph['clusters']['PRIMARY_SOURCES']
+        facts = service.sessions[session_id].adf.facts['PRIMARY_SOURCES']
+        self.assertEqual(set(items), set(facts['items']))
+        for sub_graph in items.values():
+            self.assertEqual(sub_graph['name'], 'Sub-ADM 1')
+            self.assertTrue(any(node['accepted'] for node in sub_graph['nodes']))
+    
+    def test_restored_clusters(self):
+        """Test: items restored from a checkpoint, which have no sub-ADM instance, are exported from their case"""
+        from assessment_service import AssessmentService
+        service = AssessmentService()
+        with redirect_stdout(io.StringIO()):
+            session_id = service.create_session('academic_research')['session']
+            for answer in TestAssessmentService.ANSWERS:
+                service.answer(session_id, answer)
+            adf = service.sessions[session_id].adf
+            facts = adf.facts['PRIMARY_SOURCES']
+            live = adf.exportGraph(list(adf.case))['clusters']['PRIMARY_SOURCES']
+            
+            #the resume path stores None for every item it restores
+            instances = [None] * len(facts['items'])
+            adf.nodes['PRIMARY_SOURCES'].storeResults(adf, facts['items'], facts['results'], facts['accepted_count'],
+                                                      facts['rejected_count'], instances)
+            restored = adf.exportGraph(list(adf.case))['clusters']['PRIMARY_SOURCES']
+        
+        self.assertTrue(restored)
+        self.assertEqual(set(restored), set(live))
+        for item, sub_graph in restored.items():
+            accepted = {node['id'] for node in sub_graph['nodes'] if node['accepted']}
+            self.assertEqual(accepted, {node['id'] for node in live[item]['nodes'] if node['accepted']})
+            self.assertEqual(sub_graph['root'], live[item]['root'])
+            self.assertTrue(all(node['statement'] is None for node in sub_graph['nodes']))
+
+class TestADMStatistics(unittest.TestCase):
+    """Unit tests for the structural metrics of adm_statistics"""
+    
+    def test_node_kinds(self):
+        """Test: SubADMBLF, EvaluationBLF and DependentBLF nodes are counted, with their sub-ADMs"""
+        from adm_statistics import analyze_adm_structure
+        with redirect_stdout(io.StringIO()):
+            stats = analyze_adm_structure(academic_research_ADM.adf())
+        self.assertEqual(stats['sub_adm_blf_nodes'], 1)
+        self.assertEqual(stats['evaluation_blf_nodes'], 1)
+        self.assertEqual(stats['dependent_blf_nodes'], 1)
+        self.assertEqual(stats['leaf_nodes'] + stats['non_leaf_nodes'], stats['total_nodes'])
+        self.assertEqual(stats['sub_adms']['PRIMARY_SOURCES']['total_nodes'], 4)
+    
+    def test_shape(self):
+        """Test: depth, fan-out, condition size and questions of a small ADF"""
+        from adm_statistics import analyze_adm_structure
+        adf = ADF('shape')
+        adf.addNodes('a', question='a?')
+        adf.addNodes('b', question='b?')
+        adf.addNodes('c', ['a and not b'], ['c accepted', 'c rejected'])
+        adf.addNodes('d', ['c'], ['d accepted', 'd rejected'])
+        stats = analyze_adm_structure(adf)
+        
+        self.assertEqual(stats['depth'], 2)
+        self.assertEqual(stats['fan_out'], {1: 1, 2: 1})
+        self.assertEqual(stats['condition_size']['c'], 4)
+        self.assertEqual(stats['questions_per_root'], {'d': 2})
+        self.assertFalse(stats['evaluation_cost']['stalls'])
+    
+    def test_cycle_stalls(self):
+        """Test: a cycle is reported as stalling evaluation rather than hanging the analysis"""
+        from adm_statistics import analyze_adm_structure
+        adf = ADF('cycle')
+        adf.addNodes('a', ['b'], ['a accepted', 'a rejected'])
+        adf.addNodes('b', ['a'], ['b accepted', 'b rejected'])
+        with redirect_stdout(io.StringIO()):
+            stats = analyze_adm_structure(adf)
+        self.assertTrue(stats['evaluation_cost']['stalls'])
+    
+    def test_shared_children(self):
+        """Test: depth and dependency chains are worked out once per node, and the ADF is left as it was"""
+        from adm_statistics import analyze_adm_structure
+        adf = ADF('layers')
+        #every path down is a different route through the same two nodes per layer
+        for layer in range(60):
+            adf.addNodes(f'a{layer}', [f'a{layer + 1} and b{layer + 1}'], ['a accepted', 'a rejected'])
+            adf.addNodes(f'b{layer}', [f'a{layer + 1} or b{layer + 1}'], ['b accepted', 'b rejected'])
+        stats = analyze_adm_structure(adf, sub_adms=False)
+        self.assertEqual(stats['depth'], 60)
+        self.assertEqual(adf.nonLeaf, {})
+
+class TestCompiledADF(unittest.TestCase):
+    """Unit tests for the compiled acceptance conditions"""
+    
+    def test_matches_evaluate_tree(self):
+        """Test: the compiled ADF gives the statements and final case of evaluateTree"""
+        import WildAnimals
+        from compiled_adf import CompiledADF
+        compiled = CompiledADF(WildAnimals.adf())
+        for name, case in WildAnimals.cases().items():
+            adf = WildAnimals.adf()
+            statements = adf.evaluateTree(list(case))
+            values = compiled.evaluate(case)
+            self.assertEqual([adf.nodes[node].statement[index] for node, (_, index) in values.items()],
+                             statements, name)
+            self.assertEqual(set(compiled.accepted(case, values)), set(adf.case), name)
+    
+    def test_reject_conditions(self):
+        """Test: a true reject condition rejects the node with its own statement"""
+        from compiled_adf import CompiledADF, compile_condition
+        adf = ADF('reject')
+        adf.addNodes('a', question='a?')
+        adf.addNodes('b', question='b?')
+        adf.addNodes('c', ['reject a', 'b'], ['c rejected by a', 'c accepted', 'c rejected'])
+        compiled = CompiledADF(adf)
+        
+        self.assertEqual(compile_condition('a reject'), (('var', 'a'), ('var', 'a')))
+        self.assertEqual(compiled.evaluate(['a', 'b'])['c'], (False, 0))
+        self.assertEqual(compiled.evaluate(['b'])['c'], (True, 1))
+        self.assertEqual(compiled.evaluate([])['c'], (False, 2))
+    
+    def test_cycle(self):
+        """Test: a cycle is reported rather than evaluated forever"""
+        from compiled_adf import CompiledADF
+        adf = ADF('cycle')
+        adf.addNodes('a', ['b'], ['a accepted', 'a rejected'])
+        adf.addNodes('b', ['a'], ['b accepted', 'b rejected'])
+        with self.assertRaises(ValueError):
+            CompiledADF(adf)
+
+class TestCounterfactual(unittest.TestCase):
+    """Unit tests for counterfactual flip analysis"""
+    
+    def test_flips_match_reevaluation(self):
+        """Test: exactly the factors whose flip changes the outcome on re-evaluation are reported"""
+        import WildAnimals
+        from compiled_adf import CompiledADF
+        from counterfactual import counterfactual_flips, relevant_factors
+        compiled = CompiledADF(WildAnimals.adf())
+        for name, case in WildAnimals.cases().items():
+            result = counterfactual_flips(compiled.adf, case, pairs=False, compiled=compiled)
+            expected = []
+            for factor in relevant_factors(compiled, 'Decide'):
+                flipped = [f for f in case if f != factor] if factor in case else case + [factor]
+                if compiled.evaluate(flipped)['Decide'] != result['outcome']:
+                    expected.append(factor)
+            self.assertEqual([list(flip['factors'])[0] for flip in result['flips']], expected, name)
+    
+    def test_sweep_is_incremental(self):
+        """Test: a sweep of the inventive step model costs less than one evaluation per factor"""
+        from compiled_adf import CompiledADF
+        from counterfactual import counterfactual_flips, relevant_factors
+        with redirect_stdout(io.StringIO()):
+            compiled = CompiledADF(inventive_step_ADM.adf())
+            counterfactual_flips(compiled.adf, ['DistinguishingFeatures'], pairs=False, compiled=compiled)
+        factors = len(relevant_factors(compiled, 'InvStep'))
+        self.assertLess(compiled.evaluations, factors * len(compiled.order) / 4)
+    
+    def test_minimal_pairs(self):
+        """Test: pairs are reported when no single factor changes the outcome"""
+        from counterfactual import counterfactual_flips
+        adf = ADF('pairs')
+        adf.addNodes('a', question='a?')
+        adf.addNodes('b', question='b?')
+        adf.addNodes('c', question='c?')
+        adf.addNodes('d', ['a and b and not c'], ['d accepted', 'd rejected'])
+        result = counterfactual_flips(adf, [])
+        
+        self.assertEqual(result['statement'], 'd rejected')
+        self.assertEqual(result['flips'], [])
+        self.assertEqual([pair['factors'] for pair in result['pairs']], [{'a': 'added', 'b': 'added'}])
+        self.assertEqual(result['pairs'][0]['outcome'], (True, 0))
+
+class TestExplanation(unittest.TestCase):
+    """Unit tests for minimal sufficient explanations"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        import WildAnimals
+        from compiled_adf import CompiledADF
+        self.cases = WildAnimals.cases()
+        self.compiled = CompiledADF(WildAnimals.adf())
+    
+    def completions(self, result, samples=100):
+        """Yields random cases agreeing with the factors of an explanation"""
+        import random
+        from counterfactual import relevant_factors
+        rng = random.Random(0)
+        free = [f for f in relevant_factors(self.compiled, result['target'])
+                if f not in result['present'] and f not in result['absent']]
+        for _ in range(samples):
+            yield list(result['present']) + [f for f in free if rng.random() < 0.5]
+    
+    def test_explanation_entails_outcome(self):
+        """Test: every case with the explanation's factors has the same outcome"""
+        from explanation import explain
+        for name, case in self.cases.items():
+            result = explain(self.compiled.adf, case, compiled=self.compiled)
+            self.assertEqual(result['statements'][-1], result['statement'], name)
+            for completion in self.completions(result):
+                self.assertEqual(self.compiled.evaluate(completion)['Decide'], result['outcome'], name)
+    
+    def test_explanation_is_minimal(self):
+        """Test: no factor can be dropped from an explanation, and it is shorter than the case"""
+        from explanation import explain
+        for name, case in self.cases.items():
+            result = explain(self.compiled.adf, case, compiled=self.compiled)
+            known = {n: n in case for n in self.compiled.closure('Decide')}
+            known.update({f: True for f in result['present']})
+            known.update({f: False for f in result['absent']})
+            for factor in result['present'] + result['absent']:
+                trial = {n: v for n, v in known.items() if n != factor}
+                outcomes = self.compiled.evaluateKleene(trial, {}, self.compiled.closure('Decide'))['Decide']
+                self.assertNotEqual(outcomes, {result['outcome']}, name)
+            self.assertLessEqual(len(result['present']), len(case))
+    
+    def test_why_not(self):
+        """Test: why not rules out the other acceptance and a named statement"""
+        from explanation import why_not
+        case = self.cases['Pierson v Post']
+        result = why_not(self.compiled.adf, case)
+        self.assertEqual(result['alternative'], 'accepted')
+        for completion in self.completions(result):
+            self.assertFalse(self.compiled.evaluate(completion)['Decide'][0])
+        
+        result = why_not(self.compiled.adf, case, alternative=1)
+        for completion in self.completions(result):
+            self.assertNotEqual(self.compiled.evaluate(completion)['Decide'][1], 1)
+        with self.assertRaises(ValueError):
+            why_not(self.compiled.adf, case, alternative=result['outcome'][1])
+
+class TestPrecedentIndex(unittest.TestCase):
+    """Unit tests for the precedent retrieval index"""
+    
+    def brute_force(self, index, case, k, weights=None):
+        """Returns the k smallest distances found by comparing every stored case"""
+        query = index.encode(case)
+        def distance(bits):
+            return sum((weights or {}).get(f, 1) for f, bit in index.factors.items() if (query ^ bits) & bit)
+        return sorted(distance(bits) for bits in index._bits)[:k]
+    
+    def test_matches_brute_force(self):
+        """Test: the blocked search finds the same distances as a full scan"""
+        import random
+        from precedent_index import PrecedentIndex
+        rng = random.Random(0)
+        factors = [f"f{i}" for i in range(40)]
+        index = PrecedentIndex()
+        for i in range(2000):
+            index.add(i, rng.sample(factors, rng.randint(0, 15)))
+        weights = {f: rng.uniform(0.5, 2) for f in factors}
+        
+        for _ in range(10):
+            case = rng.sample(factors, rng.randint(0, 15))
+            self.assertEqual([d for d, _, _ in index.nearest(case, 7)], self.brute_force(index, case, 7))
+            found = [d for d, _, _ in index.nearest(case, 7, weights=weights)]
+            for a, b in zip(found, self.brute_force(index, case, 7, weights)):
+                self.assertAlmostEqual(a, b)
+    
+    def test_precedents(self):
+        """Test: a stored precedent is its own nearest case, and queries can be restricted to a factor"""
+        import WildAnimals
+        from precedent_index import PrecedentIndex
+        index = PrecedentIndex(WildAnimals.adf())
+        index.addCases(WildAnimals.cases())
+        case = WildAnimals.cases()['Pierson v Post']
+        
+        self.assertEqual(index.nearest(case, 1)[0][:2], (0, 'Pierson v Post'))
+        restricted = index.nearest(case, 3, target='IllegalAct')
+        self.assertTrue(all(d <= full for (d, _, _), (full, _, _) in zip(restricted, index.nearest(case, 3))))
+        with self.assertRaises(ValueError):
+            PrecedentIndex().mask('IllegalAct')
+    
+    def test_load_transcripts(self):
+        """Test: the case and final statement of each eval transcript are read"""
+        from precedent_index import load_transcripts
+        cases, outcomes = load_transcripts(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'eval'))
+        #comvik_5 was saved without its Case: line
+        self.assertEqual(len(cases), 14)
+        self.assertNotIn('comvik_5', cases)
+        self.assertIn('DistinguishingFeatures', cases['T_0042_09'])
+        self.assertEqual(outcomes['T_0042_09'], 'there is no inventive step present')
+
+class TestCaseStore(unittest.TestCase):
+    """Unit tests for the SQLite case store"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        import WildAnimals
+        from case_store import CaseStore
+        self.store = CaseStore()
+        self.cases = WildAnimals.cases()
+        records = []
+        for name, case in self.cases.items():
+            adf = WildAnimals.adf()
+            adf.evaluateTree(list(case))
+            records.append(self.store.record(adf, case, name))
+        self.ids = self.store.insert(records)
+    
+    def tearDown(self):
+        self.store.close()
+    
+    def test_round_trip(self):
+        """Test: a stored case comes back with its factors, statement indices and outcome"""
+        import WildAnimals
+        adf = WildAnimals.adf()
+        statements = adf.evaluateTree(list(self.cases['Pierson v Post']))
+        stored = self.store.get(self.ids[list(self.cases).index('Pierson v Post')])
+        
+        self.assertEqual(stored['given'], self.cases['Pierson v Post'])
+        self.assertEqual(stored['outcome'], statements[-1])
+        self.assertEqual(stored['version'], adf.structuralHash())
+        self.assertEqual([adf.nodes[node].statement[index] for node, _, index in stored['nodes']], statements)
+        self.assertEqual({factor for factor, _ in stored['factors']}, set(adf.case))
+    
+    def test_find(self):
+        """Test: queries on accepted and rejected nodes and factors match the cases"""
+        import WildAnimals
+        expected = []
+        for case_id, (name, case) in zip(self.ids, self.cases.items()):
+            adf = WildAnimals.adf()
+            adf.evaluateTree(list(case))
+            if 'IllegalAct' in adf.case and 'Ownership' not in adf.case and 'NoBlame' not in case:
+                expected.append(case_id)
+        
+        self.assertEqual(self.store.find(accepted=['IllegalAct'], rejected=['Ownership'], absent=['NoBlame']),
+                         expected)
+        self.assertEqual(sum(self.store.outcomes().values()), len(self.cases))
+        self.assertEqual(self.store.find(model='nonexistent'), [])
+    
+    def test_insert_is_transactional(self):
+        """Test: a batch with a bad record stores nothing"""
+        records = [self.store.get(self.ids[0]), {'name': 'broken'}]
+        with self.assertRaises(KeyError):
+            self.store.insert(records)
+        self.assertEqual(len(self.store.find()), len(self.cases))
+    
+    def test_service_records_sessions(self):
+        """Test: a finished service session is stored with its sub-ADM items"""
+        from assessment_service import AssessmentService
+        service = AssessmentService(store=self.store)
+        with redirect_stdout(io.StringIO()):
+            session_id = service.create_session('academic_research')['session']
+            for answer in TestAssessmentService.ANSWERS:
+                service.answer(session_id, answer)
+        
+        stored = self.store.get(service.sessions[session_id].case_id)
+        self.assertEqual(stored['name'], session_id)
+        self.assertEqual([(blf, item) for blf, item, _ in stored['items']],
+                         [('PRIMARY_SOURCES', 'b'), ('PRIMARY_SOURCES', 'c')])
+        self.assertNotIn('sub_adf_instances', stored['facts'].get('PRIMARY_SOURCES', {}))
+
+class TestSQLCompiler(unittest.TestCase):
+    """Unit tests for evaluating a table of cases as generated SQL"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        import random
+        import sqlite3
+        from compiled_adf import CompiledADF
+        with redirect_stdout(io.StringIO()):
+            self.compiled = CompiledADF(inventive_step_ADM.adf())
+        self.factors = [name for name in self.compiled.adf._graphNodeNames()
+                        if name not in self.compiled.conditions and name not in self.compiled.evaluation_nodes]
+        rng = random.Random(0)
+        self.rows = [[i] + [int(rng.random() < 0.4) for _ in self.factors] for i in range(300)]
+        self.connection = sqlite3.connect(':memory:')
+        self.connection.execute('CREATE TABLE cases (id INTEGER, ' +
+                                ', '.join(f'"{factor}" INTEGER' for factor in self.factors) + ')')
+        self.connection.executemany(f"INSERT INTO cases VALUES ({', '.join('?' * (len(self.factors) + 1))})",
+                                    self.rows)
+    
+    def tearDown(self):
+        self.connection.close()
+    
+    def test_matches_compiled_evaluation(self):
+        """Test: every node's acceptance and statement index match evaluation in Python"""
+        from sql_compiler import evaluate_table
+        results = {name: False for name in self.compiled.evaluation_nodes}
+        evaluated = evaluate_table(self.connection, self.compiled.adf, 'cases', compiled=self.compiled)
+        
+        self.assertEqual(len(evaluated), len(self.rows))
+        for row, result in zip(self.rows, evaluated):
+            case = [factor for factor, value in zip(self.factors, row[1:]) if value]
+            for name, (accepted, index) in self.compiled.evaluate(case, results).items():
+                self.assertEqual((bool(result[name]), result[name + '__statement']), (accepted, index), name)
+    
+    def test_target_and_case_store(self):
+        """Test: a target only compiles what it depends on, and a case store can be the source"""
+        import WildAnimals
+        from case_store import CaseStore
+        from sql_compiler import compile_sql, evaluate_table, factor_table_sql
+        
+        sql = compile_sql(self.compiled.adf, 'cases', target='SkilledPerson', compiled=self.compiled)
+        self.assertNotIn('"InvStep"', sql)
+        
+        store = CaseStore()
+        for name, case in WildAnimals.cases().items():
+            adf = WildAnimals.adf()
+            adf.evaluateTree(list(case))
+            store.add(adf, case, name)
+        adf = WildAnimals.adf()
+        factors = [row[0] for row in store.connection.execute("SELECT DISTINCT factor FROM factors WHERE given = 1")]
+        evaluated = evaluate_table(store.connection, adf, factor_table_sql(factors), columns=factors)
+        for row in evaluated:
+            stored = store.get(row['id'])
+            self.assertEqual(dict((node, index) for node, _, index in stored['nodes'])['Decide'],
+                             row['Decide__statement'])
+        store.close()
+
+class TestCodegen(unittest.TestCase):
+    """Unit tests for the generated evaluator modules"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        import tempfile
+        self.directory = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def test_matches_evaluate_tree(self):
+        """Test: the generated module gives the statements and final case of evaluateTree"""
+        import WildAnimals
+        from codegen import load_evaluator
+        evaluator = load_evaluator(WildAnimals.adf(), self.directory)
+        for name, case in WildAnimals.cases().items():
+            adf = WildAnimals.adf()
+            statements = adf.evaluateTree(list(case))
+            final, generated = evaluator.evaluate_case(case)
+            self.assertEqual(generated, statements, name)
+            self.assertEqual(set(final), set(adf.case), name)
+    
+    def test_matches_compiled_evaluation(self):
+        """Test: every statement index of the inventive step model matches the compiled evaluation"""
+        import random
+        from codegen import load_evaluator
+        from compiled_adf import CompiledADF
+        with redirect_stdout(io.StringIO()):
+            compiled = CompiledADF(inventive_step_ADM.adf())
+        evaluator = load_evaluator(compiled.adf, self.directory, compiled)
+        results = {name: False for name in compiled.evaluation_nodes}
+        factors = [name for name in evaluator.NAMES if name not in compiled.conditions]
+        rng = random.Random(0)
+        for _ in range(200):
+            case = [factor for factor in factors if rng.random() < 0.4 and factor not in results]
+            _, indices = evaluator.evaluate(evaluator.encode(case))
+            self.assertEqual(indices, [index for _, index in compiled.evaluate(case, results).values()])
+    
+    def test_cached_by_version(self):
+        """Test: the module is only written again when the model changes"""
+        import WildAnimals
+        from codegen import load_evaluator
+        adf = WildAnimals.adf()
+        load_evaluator(adf, self.directory)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+        load_evaluator(WildAnimals.adf(), self.directory)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+        
+        adf.addNodes('Extra', ['Malice'], ['extra accepted', 'extra rejected'])
+        evaluator = load_evaluator(adf, self.directory)
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+        self.assertEqual(evaluator.VERSION, adf.structuralHash())
+
+class TestBDD(unittest.TestCase):
+    """Unit tests for compiling nodes into binary decision diagrams"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        import WildAnimals
+        from compiled_adf import CompiledADF
+        self.compiled = CompiledADF(WildAnimals.adf())
+    
+    def test_matches_compiled_evaluation(self):
+        """Test: the diagram gives the outcome of the compiled evaluation for every assignment"""
+        import itertools
+        from bdd import compile_bdd
+        diagram = compile_bdd(self.compiled.adf, compiled=self.compiled)
+        self.assertEqual(diagram.target, 'Decide')
+        counts = {}
+        variables = diagram.bdd.variables
+        for values in itertools.product([False, True], repeat=len(variables)):
+            case = [name for name, value in zip(variables, values) if value]
+            outcome = self.compiled.evaluate(case)['Decide']
+            self.assertEqual(diagram.evaluate(case), outcome)
+            counts[outcome[1]] = counts.get(outcome[1], 0) + 1
+            counts[str(outcome[0])] = counts.get(str(outcome[0]), 0) + 1
+        result = diagram.counts()
+        self.assertEqual(result['accepted'], counts['True'])
+        self.assertEqual(result['rejected'], counts['False'])
+        self.assertEqual({k: v for k, v in result.items() if isinstance(k, int)},
+                         {k: v for k, v in counts.items() if isinstance(k, int)})
+    
+    def test_probabilities(self):
+        """Test: outcome probabilities follow the factor priors"""
+        from bdd import compile_bdd
+        diagram = compile_bdd(self.compiled.adf, target='RightToPursue', compiled=self.compiled)
+        half = diagram.probabilities({})
+        self.assertAlmostEqual(half['accepted'], diagram.counts()['accepted'] / 2 ** len(diagram.bdd.variables))
+        certain = diagram.probabilities({name: 1.0 for name in diagram.bdd.variables})
+        self.assertEqual(certain['accepted'], float(diagram.evaluate(diagram.bdd.variables)[0]))
+        self.assertAlmostEqual(sum(v for k, v in half.items() if isinstance(k, int)), 1.0)
+    
+    def test_reduced(self):
+        """Test: equal functions share a node and the diagram has no redundant tests"""
+        from bdd import BDD, TRUE
+        bdd = BDD(['a', 'b'])
+        a, b = bdd.var('a'), bdd.var('b')
+        self.assertEqual(bdd.conjoin(a, b), bdd.negate(bdd.disjoin(bdd.negate(a), bdd.negate(b))))
+        self.assertEqual(bdd.disjoin(a, bdd.negate(a)), TRUE)
+        self.assertEqual(bdd.size(bdd.disjoin(bdd.conjoin(a, b), bdd.conjoin(a, bdd.negate(b)))), 1)
+        self.assertEqual(bdd.count(a), 2)
+    
+    def test_unknown_target(self):
+        """Test: compiling a base-level factor is an error"""
+        from bdd import compile_bdd
+        with self.assertRaises(ValueError):
+            compile_bdd(self.compiled.adf, target='Malice', compiled=self.compiled)
+
+class TestGoalSolver(unittest.TestCase):
+    """Unit tests for finding the factors which achieve an outcome"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        import WildAnimals
+        from compiled_adf import CompiledADF
+        self.compiled = CompiledADF(WildAnimals.adf())
+        self.factors = [name for name in self.compiled.adf.nodes if name not in self.compiled.conditions]
+    
+    def assertAchieves(self, solutions, check):
+        import random
+        rng = random.Random(0)
+        for solution in solutions:
+            free = [f for f in self.factors if f not in solution['present'] and f not in solution['absent']]
+            for _ in range(20):
+                case = solution['present'] + [f for f in free if rng.random() < 0.5]
+                self.assertTrue(check(self.compiled.evaluate(case)), (solution, case))
+    
+    def test_statement_goal(self):
+        """Test: every solution gives the statement whatever the other factors"""
+        from goal_solver import solve
+        for index in range(3):
+            solutions = solve(self.compiled.adf, statement=index, compiled=self.compiled)
+            self.assertTrue(solutions)
+            self.assertAchieves(solutions, lambda values: values['Decide'][1] == index)
+        self.assertEqual(solve(self.compiled.adf, statement=0, compiled=self.compiled)[0],
+                         {'present': [], 'absent': ['NotCaught']})
+    
+    def test_accepted_goal(self):
+        """Test: solutions for an abstract factor being accepted or rejected"""
+        from goal_solver import solve
+        for accepted in (True, False):
+            solutions = solve(self.compiled.adf, 'RightToPursue', accepted=accepted, compiled=self.compiled)
+            self.assertAchieves(solutions, lambda values: values['RightToPursue'][0] == accepted)
+        self.assertIn({'present': ['LegalOwner'], 'absent': []},
+                      solve(self.compiled.adf, 'RightToPursue', compiled=self.compiled))
+    
+    def test_minimal(self):
+        """Test: no solution contains another"""
+        from goal_solver import solve
+        solutions = solve(self.compiled.adf, statement=1, compiled=self.compiled)
+        terms = [set(s['present']) | {'not ' + f for f in s['absent']} for s in solutions]
+        for i, term in enumerate(terms):
+            for j, other in enumerate(terms):
+                if i != j:
+                    self.assertFalse(other <= term)
+    
+    def test_fixed_and_limit(self):
+        """Test: fixed factors are left out of the solutions and the limit bounds the present factors"""
+        from goal_solver import solve
+        solutions = solve(self.compiled.adf, statement=1, fixed={'NotCaught': True, 'Resident': False},
+                          compiled=self.compiled)
+        self.assertTrue(solutions)
+        for solution in solutions:
+            self.assertNotIn('NotCaught', solution['present'] + solution['absent'])
+            self.assertNotIn('Resident', solution['present'] + solution['absent'])
+        limited = solve(self.compiled.adf, statement=1, limit=4, compiled=self.compiled)
+        self.assertTrue(all(len(solution['present']) <= 4 for solution in limited))
+        self.assertEqual(solve(self.compiled.adf, statement=1, fixed=['Convention'], compiled=self.compiled), [])
+
+class TestDemandDrivenEvaluation(unittest.TestCase):
+    """Unit tests for evaluating a single target node"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        with redirect_stdout(io.StringIO()):
+            self.adf = adf()
+            self.compiled = self.adf.compiledADF()
+        self.results = {name: False for name in self.compiled.evaluation_nodes}
+    
+    def test_matches_full_evaluation(self):
+        """Test: the target and every node evaluated on the way match the full evaluation"""
+        import random
+        factors = [name for name in self.adf.nodes if name not in self.compiled.conditions]
+        rng = random.Random(0)
+        for _ in range(100):
+            case = [factor for factor in factors if rng.random() < 0.4 and factor not in self.results]
+            full = self.compiled.evaluate(case, self.results)
+            for target in ('SkilledPerson', 'CommonKnowledge', 'InvStep'):
+                values = self.compiled.evaluateTarget(target, case, self.results)
+                self.assertEqual(next(reversed(values)), target)
+                for name, value in values.items():
+                    self.assertEqual(value, full[name], (target, name, case))
+    
+    def test_only_needed_nodes(self):
+        """Test: nodes outside the target's closure are never evaluated"""
+        before = self.compiled.evaluations
+        values = self.compiled.evaluateTarget('CommonKnowledge', ['Contested', 'TechnicalSurvey'], self.results)
+        self.assertLessEqual(set(values), set(self.compiled.closure('CommonKnowledge')))
+        self.assertEqual(self.compiled.evaluations - before, len(values))
+        self.assertLess(len(values), len(self.compiled.order))
+    
+    def test_dependency_consistent_with_evaluate_tree(self):
+        """Test: a dependency is satisfied exactly when evaluateTree accepts the node"""
+        case = ['Contested', 'TechnicalSurvey']
+        with redirect_stdout(io.StringIO()):
+            satisfied = self.adf.evaluateDependency('CommonKnowledge', 'Access', case)
+            final = adf()
+            final.evaluateTree(['Contested', 'TechnicalSurvey'])
+        self.assertTrue(satisfied)
+        self.assertEqual('CommonKnowledge' in final.case, satisfied)
+        self.assertIn('DocumentaryEvidence', case)
+    
+    def test_compiled_cached(self):
+        """Test: the compiled plan is reused until the structure changes"""
+        with redirect_stdout(io.StringIO()):
+            self.assertIs(self.adf.compiledADF(), self.compiled)
+            self.adf.addNodes('ExtraNode', ['InvStep'], ['extra', 'no extra'])
+            self.assertIsNot(self.adf.compiledADF(), self.compiled)
+    
+    def test_unknown_target(self):
+        """Test: a base-level factor cannot be a target"""
+        with self.assertRaises(ValueError):
+            self.compiled.evaluateTarget('Contested', [], self.results)
+
+class TestSelectivity(unittest.TestCase):
+    """Unit tests for ordering conditions by observed selectivity"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        import random
+        import WildAnimals
+        from compiled_adf import CompiledADF
+        self.compiled = CompiledADF(WildAnimals.adf())
+        factors = [name for name in self.compiled.adf.nodes if name not in self.compiled.conditions]
+        rng = random.Random(0)
+        priors = {factor: rng.random() * 0.5 for factor in factors}
+        self.sample = [[f for f in factors if rng.random() < priors[f]] for _ in range(200)]
+        self.cases = [[f for f in factors if rng.random() < priors[f]] for _ in range(200)]
+    
+    def test_same_outcomes_fewer_operations(self):
+        """Test: the ordered conditions give the same outcomes with fewer lookups"""
+        import WildAnimals
+        from selectivity import OrderedADF, count_operations
+        ordered = OrderedADF(WildAnimals.adf(), self.sample)
+        for case in self.cases:
+            self.assertEqual(ordered.evaluate(case), self.compiled.evaluate(case))
+        self.assertLess(count_operations(ordered, self.cases), count_operations(self.compiled, self.cases))
+    
+    def test_exclusive_conditions_reordered(self):
+        """Test: mutually exclusive conditions are reordered but keep their statements"""
+        from compiled_adf import CompiledADF
+        from selectivity import OrderedADF
+        test_adf = ADF('Exclusive')
+        test_adf.addNodes('Outcome', ['A and B', 'not A and C', 'A or C'], ['first', 'second', 'third', 'none'])
+        for factor in ('A', 'B', 'C'):
+            test_adf.addNodes(factor, question=f'{factor}?')
+        sample = [['C']] * 9 + [['A', 'B']]
+        ordered = OrderedADF(test_adf, sample)
+        declared = CompiledADF(test_adf)
+        self.assertEqual([index for index, _, _ in ordered.attempts['Outcome']], [1, 0, 2])
+        for case in ([], ['A'], ['B'], ['C'], ['A', 'B'], ['A', 'C'], ['B', 'C'], ['A', 'B', 'C']):
+            self.assertEqual(ordered.evaluate(case), declared.evaluate(case))
+    
+    def test_overlapping_conditions_keep_order(self):
+        """Test: conditions which can hold together are never swapped"""
+        from selectivity import OrderedADF
+        test_adf = ADF('Overlapping')
+        test_adf.addNodes('Outcome', ['A', 'C'], ['first', 'second', 'none'])
+        for factor in ('A', 'C'):
+            test_adf.addNodes(factor, question=f'{factor}?')
+        ordered = OrderedADF(test_adf, [['C']] * 10)
+        self.assertEqual([index for index, _, _ in ordered.attempts['Outcome']], [0, 1])
+    
+    def test_store_cases(self):
+        """Test: the given factors of stored cases form a sample"""
+        import WildAnimals
+        from case_store import CaseStore
+        from selectivity import store_cases
+        with CaseStore() as store:
+            for case in self.sample[:5]:
+                model = WildAnimals.adf()
+                model.evaluateTree(list(case))
+                store.add(model, case)
+            self.assertEqual(store_cases(store), [list(dict.fromkeys(case)) for case in self.sample[:5]])
+
+class TestSharedExpressions(unittest.TestCase):
+    """Unit tests for sharing sub-expressions across acceptance conditions"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.test_adf = ADF('Shared')
+        self.test_adf.addNodes('P', ['A and B'], ['p', 'not p'])
+        self.test_adf.addNodes('Q', ['( B and A ) or C'], ['q', 'not q'])
+        self.test_adf.addNodes('R', ['not ( A and B )', 'P and Q'], ['r', 'pq', 'not r'])
+        for factor in ('A', 'B', 'C'):
+            self.test_adf.addNodes(factor, question=f'{factor}?')
+    
+    def test_identical_subexpressions_interned_once(self):
+        """Test: the same conjunction in any operand order is one entry of the pool"""
+        from shared_expressions import SharedADF
+        shared = SharedADF(self.test_adf)
+        conjunction = shared.shared_conditions['P'][0][0]
+        self.assertEqual(shared.pool.shared()[0], conjunction)
+        self.assertEqual(shared.pool.uses[conjunction], 3)
+        self.assertEqual(shared.pool.text(conjunction), '(A and B)')
+        rows = {row['id']: row for row in shared.pool.table()}
+        self.assertEqual(rows[conjunction]['op'], 'and')
+        self.assertEqual(shared.pool.expression(conjunction)[0], 'and')
+    
+    def test_evaluated_once_per_case(self):
+        """Test: a shared sub-expression is evaluated once per case and the outcomes are unchanged"""
+        from compiled_adf import CompiledADF
+        from shared_expressions import SharedADF
+        shared = SharedADF(self.test_adf)
+        declared = CompiledADF(self.test_adf)
+        for case in ([], ['A'], ['A', 'B'], ['C'], ['A', 'B', 'C']):
+            self.assertEqual(shared.evaluate(case), declared.evaluate(case))
+        shared.pool.evaluations = shared.pool.hits = 0
+        shared.evaluate(['A', 'B'])
+        self.assertGreaterEqual(shared.pool.hits, 2)
+        #A, B, A and B, Q's or, not, P, P and Q, Q
+        self.assertEqual(shared.pool.evaluations, 8)
+    
+    def test_model_and_sub_adms(self):
+        """Test: the model and its sub-ADMs share one pool and evaluate as compiled"""
+        import random
+        from compiled_adf import CompiledADF
+        from shared_expressions import share_model
+        with redirect_stdout(io.StringIO()):
+            pool, models = share_model(adf())
+        self.assertEqual(set(models), {'Inventive Step', 'ReliableTechnicalEffect', 'OTPObvious'})
+        self.assertTrue(all(model.pool is pool for model in models.values()))
+        rng = random.Random(0)
+        for model in models.values():
+            compiled = CompiledADF(model.adf)
+            results = {name: False for name in compiled.evaluation_nodes}
+            factors = [name for name in model.adf.nodes if name not in compiled.conditions and name not in results]
+            for _ in range(50):
+                case = [factor for factor in factors if rng.random() < 0.4]
+                self.assertEqual(model.evaluate(case, results), compiled.evaluate(case, results))
+
+class TestGroundedEvaluation(unittest.TestCase):
+    """Unit tests for cycle detection and grounded evaluation"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.cyclic = ADF('Cyclic')
+        with redirect_stdout(io.StringIO()) as self.output:
+            self.cyclic.addNodes('A', ['B'], ['a', 'not a'])
+            self.cyclic.addNodes('B', ['A or C'], ['b', 'not b'])
+            self.cyclic.addNodes('D', ['not A and E'], ['d', 'not d'])
+            self.cyclic.addNodes('X', ['not Y'], ['x', 'not x'])
+            self.cyclic.addNodes('Y', ['not X'], ['y', 'not y'])
+            for factor in ('C', 'E'):
+                self.cyclic.addNodes(factor, question=f'{factor}?')
+    
+    def test_cycles_reported(self):
+        """Test: cycles are reported as strongly connected components when they are made"""
+        self.assertEqual(self.cyclic.cycles(), [['A', 'B'], ['X', 'Y']])
+        #cycles are only looked for once the structure is read, not on every addNodes
+        self.assertNotIn('cycle', self.output.getvalue())
+        with redirect_stdout(io.StringIO()) as output:
+            self.cyclic.nonLeafGen()
+            self.cyclic.nonLeafGen()
+        self.assertEqual(output.getvalue().count('A -> B depend on each other in a cycle'), 1)
+        components = self.cyclic.stronglyConnectedComponents()
+        self.assertLess(components.index(['A', 'B']), components.index(['D']))
+        import WildAnimals
+        self.assertEqual(WildAnimals.adf().cycles(), [])
+    
+    def test_evaluate_tree_does_not_hang(self):
+        """Test: evaluateTree raises on a cycle rather than looping forever"""
+        with self.assertRaises(ValueError):
+            self.cyclic.evaluateTree(['C'])
+    
+    def test_grounded_semantics(self):
+        """Test: a cycle is decided when an input outside it decides it and is otherwise left undecided"""
+        from grounded import GroundedADF
+        grounded = GroundedADF(self.cyclic)
+        self.assertEqual(grounded.cycles, [['A', 'B'], ['X', 'Y']])
+        values = grounded.evaluate([])
+        self.assertEqual(values['A'], (None, None))
+        self.assertEqual(values['X'], (None, None))
+        self.assertEqual(values['D'], (False, 1))
+        values = grounded.evaluate(['C', 'E'])
+        self.assertEqual(values['A'], (True, 0))
+        self.assertEqual(values['B'], (True, 0))
+        self.assertEqual(values['D'], (False, 1))
+        self.assertEqual(grounded.evaluate(['X'])['Y'], (False, 1))
+    
+    def test_grounded_is_exact(self):
+        """Test: a condition true whatever an undecided node is, e.g. 'a or not a', is accepted"""
+        from grounded import GroundedADF
+        cyclic = ADF('Tautology')
+        with redirect_stdout(io.StringIO()):
+            cyclic.addNodes('P', ['Q or not Q'], ['p', 'not p'])
+            cyclic.addNodes('Q', ['P and not R'], ['q', 'not q'])
+            cyclic.addNodes('S', ['T and not T'], ['s', 'not s'])
+            cyclic.addNodes('T', ['S or R'], ['t', 'not t'])
+            cyclic.addNodes('R', question='R?')
+            grounded = GroundedADF(cyclic)
+        values = grounded.evaluate([])
+        self.assertEqual(values['P'], (True, 0))
+        self.assertEqual(values['Q'], (True, 0))
+        self.assertEqual(values['S'], (False, 1))
+        self.assertEqual(values['T'], (False, 1))
+        self.assertEqual(grounded.evaluate(['R'])['Q'], (False, 1))
+    
+    def test_acyclic_matches_compiled(self):
+        """Test: on an acyclic ADF the grounded evaluation decides every node as evaluate does"""
+        import random
+        from compiled_adf import CompiledADF
+        from grounded import GroundedADF
+        with redirect_stdout(io.StringIO()):
+            compiled = CompiledADF(adf())
+            grounded = GroundedADF(adf())
+        results = {name: False for name in compiled.evaluation_nodes}
+        factors = [name for name in compiled.adf.nodes if name not in compiled.conditions and name not in results]
+        rng = random.Random(0)
+        for _ in range(100):
+            case = [factor for factor in factors if rng.random() < 0.4]
+            self.assertEqual(grounded.evaluate(case, results), compiled.evaluate(case, results))
+    
+    def test_tarjan(self):
+        """Test: components of a graph with nested cycles"""
+        from compiled_adf import strongly_connected_components
+        graph = {1: [2], 2: [3], 3: [1, 4], 4: [5], 5: [4], 6: [6]}
+        components = strongly_connected_components(graph)
+        self.assertEqual(sorted(sorted(c) for c in components), [[1, 2, 3], [4, 5], [6]])
+        self.assertLess([sorted(c) for c in components].index([4, 5]), [sorted(c) for c in components].index([1, 2, 3]))
+
+class TestNodeTable(unittest.TestCase):
+    """Unit tests for the per-model node metadata table"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        with redirect_stdout(io.StringIO()):
+            self.adf = inventive_step_ADM.adf()
+    
+    def test_kinds_match_node_classes(self):
+        """Test: each node's kind agrees with its class and nodeKind"""
+        table = self.adf.nodeTable()
+        self.assertEqual(set(table), set(self.adf.nodes))
+        self.assertEqual(table['ReliableTechnicalEffect']['kind'], 'sub_adm')
+        self.assertEqual(table['DistinguishingFeatures']['kind'], 'evaluation')
+        self.assertEqual(table['SkilledIn']['kind'], 'dependent')
+        self.assertEqual(table['InvStep']['kind'], 'abstract')
+        self.assertEqual(table['Contested']['kind'], 'blf')
+        self.assertEqual(self.adf.nodeKind('InvStep'), 'root')
+        self.assertEqual(self.adf.nodeKind('SkilledIn'), 'dependent')
+    
+    def test_metadata(self):
+        """Test: reject flags, parents, depth and statement counts are recorded"""
+        table = self.adf.nodeTable()
+        self.assertTrue(table['InvStep']['has_reject'])
+        self.assertFalse(table['Contested']['has_reject'])
+        self.assertEqual(table['InvStep']['parents'], [])
+        self.assertEqual(table['InvStep']['statements'], len(self.adf.nodes['InvStep'].statement))
+        for name, row in table.items():
+            self.assertEqual(row['depth'] == 0, not self.adf.nodes[name].children)
+            for parent in row['parents']:
+                self.assertIn(name, self.adf.nodes[parent].children)
+                self.assertGreater(table[parent]['depth'], row['depth'])
+    
+    def test_cached_until_nodes_added(self):
+        """Test: the table is built once and rebuilt when a node is added"""
+        table = self.adf.nodeTable()
+        self.assertIs(self.adf.nodeTable(), table)
+        with redirect_stdout(io.StringIO()):
+            self.adf.addNodes('Extra', ['Contested'], ['extra', 'not extra'])
+        table = self.adf.nodeTable()
+        self.assertEqual(table['Extra']['kind'], 'abstract')
+        self.assertEqual(table['Extra']['depth'], 1)
+        self.assertIn('Extra', table['Contested']['parents'])
+    
+    def test_rebuilt_when_node_replaced(self):
+        """Test: replacing a node or changing it directly, which keeps the node count, rebuilds the table"""
+        self.assertEqual(self.adf.nodeTable()['Contested']['kind'], 'blf')
+        with redirect_stdout(io.StringIO()):
+            self.adf.addNodes('Contested', ['Average'], ['contested', 'not contested'])
+        self.assertEqual(self.adf.nodeTable()['Contested']['kind'], 'abstract')
+        self.assertIn('Contested', self.adf.nodeTable()['Average']['parents'])
+        
+        node = self.adf.nodes['Contested']
+        node.acceptance = ['Average reject']
+        self.adf.structureChanged()
+        self.assertTrue(self.adf.nodeTable()['Contested']['has_reject'])
+
 def run_all_tests():
     """Run all unit tests (sub-ADM, main ADM, and CLI UI)"""
     print("Running All ADM Unit Tests...")
@@ -2611,6 +4211,58 @@ def run_all_tests():
     dependency_suite = unittest.TestLoader().loadTestsFromTestCase(TestDependencyEvaluation)
     suite.addTest(dependency_suite)
     
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestSessionCheckpoint))
+    
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestAssessmentService))
+    
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestAsyncQuestionFlow))
+    
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestVisualiseNetwork))
+    
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestDotWriter))
+    
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestRenderPipeline))
+    
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestLayoutCache))
+    
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestEdgePolarity))
+    
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestCollapsedView))
+    
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestSVGLayout))
+    
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestGraphExport))
+    
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestADMStatistics))
+    
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestCompiledADF))
+    
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestCounterfactual))
+    
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestExplanation))
+    
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestPrecedentIndex))
+    
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestCaseStore))
+    
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestSQLCompiler))
+    
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestCodegen))
+    
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestBDD))
+    
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestGoalSolver))
+    
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestDemandDrivenEvaluation))
+    
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestSelectivity))
+    
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestSharedExpressions))
+    
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestGroundedEvaluation))
+    
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestNodeTable))
+    
     # Run tests with minimal verbosity
     runner = unittest.TextTestRunner(verbosity=1)
     result = runner.run(suite)